@@ -0,0 +1,111 @@
+"""
+Times the optimized parsers against the implementations they replaced (see `benchmarks.reference`) on the synthetic
+responses of a workload size, after checking that both give the same output.
+Usage:
+>>> python -m benchmarks.compare --size medium --repeat 5
+>>> python -m benchmarks.compare --size large --only data  # Only the comparisons whose name starts with "data"
+>>> python -m benchmarks.compare --only structure --recorded ~/.cache/imf_data_fetcher --dataflow CPI  # Recorded structure responses
+"""
+
+import argparse
+import asyncio
+import json
+import httpx
+import pandas as pd
+from typing import Callable, Optional
+
+from package import queries, utils
+from . import reference
+from .fixtures import SIZES, Fixtures
+from .run import measure
+from .server import StandInServer
+
+
+def same_frames(old: dict, new: dict) -> None:
+    """
+    Asserts that two dictionaries of DataFrames hold the same frames, whatever the resolution of their datetime indexes.
+    """
+    assert old.keys() == new.keys(), "different keys"
+    for name in old:
+        left, right = old[name], new[name]
+        if isinstance(left.index, pd.DatetimeIndex) and isinstance(right.index, pd.DatetimeIndex):
+            left, right = left.set_axis(left.index.as_unit("ns")), right.set_axis(right.index.as_unit("ns"))
+        pd.testing.assert_frame_equal(left, right, obj=name)
+
+
+def same_frame(old: pd.DataFrame, new: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(old, new, check_dtype=False)
+
+
+def same_value(old, new) -> None:
+    assert old == new, "different outputs"
+
+
+def structure_response(fixtures: Fixtures, dataflow_id: Optional[str] = None) -> dict:
+    """
+    Returns the structure response of a dataflow (the first of the catalog by default), as gathered by `queries.queries`
+    from the stand-in server, so that recorded responses are split and completed like live ones.
+    """
+
+    async def gather(server, dataflow_dict):
+        async with httpx.AsyncClient(transport=server.async_transport()) as client:
+            return await queries.queries(dataflow_dict, client=client)
+
+    with StandInServer(fixtures.route) as server:
+        with httpx.Client(transport=server.transport()) as client:
+            dataflows = queries.get_all_dataflows(client=client)
+        if dataflow_id is not None:
+            dataflows = dataflows[dataflows["DataflowID"] == dataflow_id]
+            if dataflows.empty:
+                raise ValueError(f"Dataflow '{dataflow_id}' is not in the catalog served.")
+        return asyncio.run(gather(server, dataflows.iloc[0].to_dict()))
+
+
+def comparisons(fixtures: Fixtures, response: dict) -> list:
+    """
+    Returns the (name, old, new, check, units, unit) tuple of each comparison: `old()` and `new()` compute the same output,
+    which `check(old(), new())` asserts.
+    """
+    data_json = json.loads(fixtures.bodies["data"])
+    n_obs = fixtures.n_observations
+
+    dimensions = utils.process_dataflow_dimensions(response)
+    n_concepts = sum(len(scheme["concepts"]) for res in {id(r): r for r in response["dimension_details"].values() if r}.values() for scheme in res["data"]["conceptSchemes"])
+    n_codes = sum(len(blob["data"]["codelists"][0]["codes"]) for blob in response["codelists"].values() if blob)
+
+    return [
+        ("data.process_queried_data", lambda: reference.process_queried_data(data_json), lambda: utils.process_queried_data(data_json), same_frames, n_obs, "observations"),
+        ("structure.process_dataflow_dimensions", lambda: reference.process_dataflow_dimensions(response), lambda: utils.process_dataflow_dimensions(response), same_frame, n_concepts, "concepts"),
+        # Both add their columns to the frame they are given:
+        ("structure.process_dimension_details", lambda: reference.process_dimension_details(response, dimensions.copy()), lambda: utils.process_dimension_details(response, dimensions.copy()), same_frame, n_concepts, "concepts"),
+        ("structure.process_codelists", lambda: reference.process_codelists(response, dimensions), lambda: utils.process_codelists(response, dimensions), same_value, n_codes, "codes"),
+    ]
+
+
+def compare(name: str, old: Callable, new: Callable, check: Callable, units: float, unit: str, repeat: int) -> dict:
+    check(old(), new())
+    before, after = measure(f"{name}.reference", old, units, unit, repeat), measure(name, new, units, unit, repeat)
+    return {"name": name, "old_ms": before["p50_ms"], "new_ms": after["p50_ms"], "speedup": before["p50_ms"] / after["p50_ms"], "old_peak_mb": before["peak_mb"], "new_peak_mb": after["peak_mb"]}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="Runs only the comparisons whose name starts with this prefix")
+    parser.add_argument("--recorded", help="StructureCache directory whose entries are served instead of the synthetic structure responses")
+    parser.add_argument("--dataflow", help="Dataflow whose structure is processed. Defaults to the first of the catalog")
+    args = parser.parse_args(argv)
+
+    fixtures = Fixtures(args.size, args.recorded)
+    response = structure_response(fixtures, args.dataflow)
+    print(f"{'comparison':<40} {'old ms':>10} {'new ms':>10} {'speedup':>8} {'old MB':>8} {'new MB':>8}")
+    for name, old, new, check, units, unit in comparisons(fixtures, response):
+        if args.only and not name.startswith(args.only):
+            continue
+        r = compare(name, old, new, check, units, unit, args.repeat)
+        print(f"{r['name']:<40} {r['old_ms']:>10.1f} {r['new_ms']:>10.1f} {r['speedup']:>7.1f}x {r['old_peak_mb']:>8.1f} {r['new_peak_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
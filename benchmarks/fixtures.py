@@ -0,0 +1,214 @@
+import json
+import math
+import os
+import random
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+SIZES = {
+    "small": dict(n_dataflows=50, n_dims=3, n_codes=20, n_concepts=50, n_series=100, n_periods=50),
+    "medium": dict(n_dataflows=200, n_dims=5, n_codes=200, n_concepts=500, n_series=10_000, n_periods=60),
+    "large": dict(n_dataflows=500, n_dims=6, n_codes=2_000, n_concepts=3_000, n_series=50_000, n_periods=60),
+}
+"""
+Synthetic workload sizes. "large" is a 3,000,000-observation data message.
+"""
+
+AGENCY = "IMF.STA"
+DATAFLOW = "BENCH"
+
+
+def dimension_sizes(n_dims: int, n_codes: int, n_series: int) -> list[int]:
+    """
+    Returns the number of codes of each dimension: `n_codes` entities, and just enough codes in the other dimensions to hold `n_series` distinct keys.
+    """
+    if n_dims == 1:
+        return [max(n_codes, n_series)]
+    other = max(math.ceil((n_series / n_codes) ** (1 / (n_dims - 1))), 1)
+    return [n_codes] + [other] * (n_dims - 1)
+
+
+def catalog(n_dataflows: int, **_) -> dict:
+    flows = [
+        {
+            "id": DATAFLOW if i == 0 else f"FLOW{i}",
+            "name": f"Benchmark dataflow {i}",
+            "version": "1.0.0",
+            "agencyID": AGENCY,
+            "structure": f"urn:sdmx:org.sdmx.infomodel.datastructure.DataStructure={AGENCY}:DSD_FLOW{i}(1.0+.0)",
+        }
+        for i in range(n_dataflows)
+    ]
+    return {"data": {"dataflows": flows}}
+
+
+def structure(n_dims: int, n_codes: int, n_concepts: int, n_series: int, **_) -> dict:
+    """
+    Returns a datastructure response with its concept scheme and codelists included, as fetched with references=descendants.
+    The concept scheme holds `n_concepts` unrelated concepts besides the dimensions, like the IMF master concept schemes.
+    """
+    sizes = dimension_sizes(n_dims, n_codes, n_series)
+    dims = [f"DIM{i}" for i in range(n_dims)]
+
+    rng = random.Random(0)
+    concepts = [{"id": f"C{j}", "name": {"en": f"Concept {j}"}, "description": {"en": f"Description of concept {j}"}} for j in range(n_concepts)]
+    for dim in dims:
+        concept = {
+            "id": dim,
+            "name": {"en": f"Dimension {dim}"},
+            "description": {"en": f"Description of {dim}"},
+            "coreRepresentation": {"enumeration": f"urn:sdmx:org.sdmx.infomodel.codelist.Codelist=IMF:CL_{dim}(1.0+.0)"},
+        }
+        concepts.insert(rng.randrange(len(concepts) + 1), concept)
+
+    return {
+        "data": {
+            "dataStructures": [
+                {
+                    "dataStructureComponents": {
+                        "dimensionList": {
+                            "dimensions": [
+                                {"id": dim, "position": i, "conceptIdentity": f"urn:sdmx:org.sdmx.infomodel.conceptscheme.Concept=IMF:CS_MASTER(1.0+.0).{dim}"}
+                                for i, dim in enumerate(dims)
+                            ]
+                        }
+                    }
+                }
+            ],
+            "conceptSchemes": [{"agencyID": "IMF", "id": "CS_MASTER", "concepts": concepts}],
+            "codelists": [
+                {"agencyID": "IMF", "id": f"CL_{dim}", "codes": [{"id": f"{dim}_{k}", "name": {"en": f"Code {k} of {dim}"}} for k in range(size)]}
+                for dim, size in zip(dims, sizes)
+            ],
+        }
+    }
+
+
+def availability(n_dims: int, n_codes: int, n_series: int, n_periods: int, **_) -> dict:
+    sizes = dimension_sizes(n_dims, n_codes, n_series)
+    components = [
+        {"id": f"DIM{i}", "include": True, "removePrefix": False, "values": [{"value": f"DIM{i}_{k}"} for k in range(size)]}
+        for i, size in enumerate(sizes)
+    ]
+    last = n_periods - 1
+    components.append({"id": "TIME_PERIOD", "include": True, "timeRange": {"startPeriod": {"period": "2000-01-01T00:00:00", "isInclusive": True}, "endPeriod": {"period": f"{2000 + last // 12}-{last % 12 + 1:02d}-01T00:00:00", "isInclusive": True}}})
+    return {"data": {"dataConstraints": [{"cubeRegions": [{"components": components}]}]}}
+
+
+def data_message(n_dims: int, n_codes: int, n_series: int, n_periods: int, last_n: Optional[int] = None, **_) -> bytes:
+    """
+    Returns the body of an SDMX-JSON data message with `n_series` series of `n_periods` monthly observations,
+    or of their last `last_n` observations (the answer to a `lastNObservations` query).
+    The body is assembled as text, so multi-million-observation messages are built without holding their JSON tree.
+    """
+    sizes = dimension_sizes(n_dims, n_codes, n_series)
+    periods = [f"{2000 + p // 12}-M{p % 12 + 1:02d}" for p in range(n_periods)][-last_n if last_n else None :]
+    n_periods = len(periods)
+
+    rng = random.Random(0)
+    series = []
+    for s in range(n_series):
+        codes, rest = [], s
+        for size in reversed(sizes):
+            codes.append(rest % size)
+            rest //= size
+        key = ":".join(map(str, reversed(codes)))
+        observations = ",".join(f'"{p}":["{rng.uniform(50, 150):.3f}"]' for p in range(n_periods))
+        series.append(f'"{key}":{{"observations":{{{observations}}}}}')
+
+    struct = {
+        "dimensions": {
+            "series": [{"id": f"DIM{i}", "values": [{"id": f"DIM{i}_{k}"} for k in range(size)]} for i, size in enumerate(sizes)],
+            "observation": [{"id": "TIME_PERIOD", "values": [{"value": p} for p in periods]}],
+        }
+    }
+    return f'{{"data":{{"dataSets":[{{"series":{{{",".join(series)}}}}}],"structures":[{json.dumps(struct)}]}}}}'.encode("utf-8")
+
+
+def data_csv_message(n_dims: int, n_codes: int, n_series: int, n_periods: int, last_n: Optional[int] = None, **_) -> bytes:
+    """
+    Returns the body of the SDMX-CSV 2.0 data message holding the same observations as `data_message`.
+    """
+    sizes = dimension_sizes(n_dims, n_codes, n_series)
+    periods = [f"{2000 + p // 12}-M{p % 12 + 1:02d}" for p in range(n_periods)][-last_n if last_n else None :]
+
+    rng = random.Random(0)
+    lines = [",".join(["STRUCTURE", "STRUCTURE_ID", "ACTION", *(f"DIM{i}" for i in range(n_dims)), "TIME_PERIOD", "OBS_VALUE"])]
+    for s in range(n_series):
+        codes, rest = [], s
+        for size in reversed(sizes):
+            codes.append(rest % size)
+            rest //= size
+        prefix = ",".join(["dataflow", f"{AGENCY}:{DATAFLOW}(1.0.0)", "I", *(f"DIM{i}_{c}" for i, c in enumerate(reversed(codes)))])
+        lines.extend(f"{prefix},{period},{rng.uniform(50, 150):.3f}" for period in periods)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class Fixtures:
+    """
+    Response bodies of one workload size, keyed by the kind of request they answer.
+    Recorded structure responses (the entries of a `StructureCache` directory) can replace the synthetic ones.
+    """
+
+    def __init__(self, size: str = "small", recorded: Optional[str] = None):
+
+        self.size = size
+        self.params = SIZES[size]
+
+        self.bodies = {
+            "catalog": json.dumps(catalog(**self.params)).encode("utf-8"),
+            "structure": json.dumps(structure(**self.params)).encode("utf-8"),
+            "availability": json.dumps(availability(**self.params)).encode("utf-8"),
+            "data": data_message(**self.params),
+            "data_csv": data_csv_message(**self.params),
+        }
+
+        self.recorded = load_recorded(recorded) if recorded else {}
+
+    @property
+    def n_observations(self) -> int:
+        return self.params["n_series"] * self.params["n_periods"]
+
+    def data_body(self, csv: bool = False, last_n: Optional[int] = None) -> bytes:
+        """
+        Returns the data message, or the message of its last `last_n` observations per series (built on first use).
+        """
+        name = ("data_csv" if csv else "data") + (f".last{last_n}" if last_n and last_n < self.params["n_periods"] else "")
+        if name not in self.bodies:
+            self.bodies[name] = (data_csv_message if csv else data_message)(**self.params, last_n=last_n)
+        return self.bodies[name]
+
+    def route(self, path: str, accept: str = "application/json") -> Optional[bytes]:
+        """
+        Returns the body served for a request path relative to the API base (e.g. "/structure/codelist/IMF/CL_FREQ/+"), or None.
+        Data requests accepting SDMX-CSV are answered with the CSV message, and `lastNObservations` is honoured.
+        """
+        if path in self.recorded:
+            return self.recorded[path]
+        if path.startswith("/structure/dataflow"):
+            return self.bodies["catalog"]
+        if path.startswith("/structure/datastructure"):
+            return self.bodies["structure"]
+        if path.startswith("/availability"):
+            return self.bodies["availability"]
+        if path.startswith("/data/"):
+            last_n = parse_qs(urlsplit(path).query).get("lastNObservations")
+            return self.data_body("csv" in accept, int(last_n[0]) if last_n else None)
+        return None
+
+
+def load_recorded(directory: str) -> dict:
+    """
+    Returns the bodies of the entries of a `StructureCache` directory, keyed by their request path relative to the API base.
+    """
+    from package.consts import BASE
+
+    recorded = {}
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        if entry.get("url", "").startswith(BASE):
+            recorded[entry["url"][len(BASE) :]] = json.dumps(entry["body"]).encode("utf-8")
+    return recorded
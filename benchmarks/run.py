@@ -0,0 +1,199 @@
+"""
+Offline benchmark suite. Runs the catalog, structure and data code paths against a local stand-in server
+serving synthetic (or recorded) SDMX 3.0 responses, end to end and in isolation.
+Usage:
+>>> python -m benchmarks.run --size medium --repeat 10 --output results.json
+>>> python -m benchmarks.run --size medium --compare baseline.json  # Prints the change against a previous run
+>>> python -m benchmarks.run --size medium --compress  # Responses gzip-encoded by the stand-in server
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+import httpx
+from typing import Callable, Optional
+
+from package import queries, utils
+from package.parsing import ParsePool
+from .fixtures import AGENCY, DATAFLOW, SIZES, Fixtures, dimension_sizes
+from .server import StandInServer
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def measure(name: str, fn: Callable, units: float, unit: str, repeat: int) -> dict:
+    """
+    Runs `fn()` once to warm up, `repeat` times to time it, and once more under tracemalloc for its peak memory.
+    Returns latency percentiles (ms), throughput (`units` per second) and peak traced memory (MB).
+    """
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = percentile(timings, 50)
+    return {
+        "name": name,
+        "repeat": repeat,
+        "p50_ms": p50 * 1e3,
+        "p90_ms": percentile(timings, 90) * 1e3,
+        "p99_ms": percentile(timings, 99) * 1e3,
+        "mean_ms": statistics.mean(timings) * 1e3,
+        "throughput": units / p50 if p50 else float("inf"),
+        "unit": f"{unit}/s",
+        "peak_mb": peak / 2**20,
+    }
+
+
+def run_suite(fixtures: Fixtures, server: StandInServer, repeat: int, workers: int = 4) -> list:
+    params = fixtures.params
+    dataflow_dict = queries.process_dataflows(json.loads(fixtures.bodies["catalog"])).iloc[0].to_dict()
+    n_codes = sum(dimension_sizes(params["n_dims"], params["n_codes"], params["n_series"]))
+    n_obs = fixtures.n_observations
+    key = ".".join(["*"] * params["n_dims"])
+
+    client = httpx.Client(transport=server.transport())
+
+    def new_async_client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=server.async_transport())
+
+    async def structure_queries():
+        async with new_async_client() as async_client:
+            return await queries.queries(dataflow_dict, client=async_client)
+
+    response = asyncio.run(structure_queries())
+    dimensions = utils.process_dataflow_dimensions(response)
+    codelists = utils.process_codelists(response, dimensions)
+    code_tables = utils.process_codelists(response, dimensions, compact=True)
+    data_json = json.loads(fixtures.bodies["data"])
+    last12 = queries.filter_params(last_n_observations=12)
+
+    results = [
+        # Catalog:
+        measure("catalog.get_all_dataflows", lambda: queries.get_all_dataflows(client=client), params["n_dataflows"], "dataflows", repeat),
+        measure("catalog.process_dataflows", lambda: queries.process_dataflows(json.loads(fixtures.bodies["catalog"])), params["n_dataflows"], "dataflows", repeat),
+        # Structure:
+        measure("structure.queries", lambda: asyncio.run(structure_queries()), n_codes, "codes", repeat),
+        measure("structure.process_dataflow_dimensions", lambda: utils.process_dataflow_dimensions(response), params["n_concepts"], "concepts", repeat),
+        measure("structure.process_codelists", lambda: utils.process_codelists(response, dimensions), n_codes, "codes", repeat),
+        measure("structure.process_availability", lambda: utils.process_availability(response, codelists), n_codes, "codes", repeat),
+        measure("structure.process_codelists.compact", lambda: utils.process_codelists(response, dimensions, compact=True), n_codes, "codes", repeat),
+        measure("structure.process_availability.compact", lambda: utils.process_availability(response, code_tables, compact=True), n_codes, "codes", repeat),
+        # Data:
+        measure("data.query_data", lambda: utils.process_queried_data(queries.query_data(AGENCY, DATAFLOW, key, client=client)), n_obs, "observations", repeat),
+        measure("data.query_data.csv", lambda: utils.process_queried_data(queries.query_data(AGENCY, DATAFLOW, key, client=client, data_format="csv")), n_obs, "observations", repeat),
+        # Only the last 12 observations of each series, filtered by the server:
+        measure("data.query_data.last12", lambda: utils.process_queried_data(queries.query_data(AGENCY, DATAFLOW, key, client=client, params=last12)), params["n_series"] * min(12, params["n_periods"]), "observations", repeat),
+        measure("data.json_decode", lambda: json.loads(fixtures.bodies["data"]), n_obs, "observations", repeat),
+        measure("data.csv_decode", lambda: utils.decode_csv(fixtures.bodies["data_csv"]), n_obs, "observations", repeat),
+        measure("data.process_queried_data", lambda: utils.process_queried_data(data_json), n_obs, "observations", repeat),
+        measure("data.process_queried_data.csv", lambda: utils.process_queried_data(fixtures.bodies["data_csv"]), n_obs, "observations", repeat),
+        measure("data.process_queried_data.long", lambda: utils.process_queried_data(data_json, "long"), n_obs, "observations", repeat),
+        measure("data.process_queried_data.numpy", lambda: utils.process_queried_data(data_json, "numpy"), n_obs, "observations", repeat),
+    ]
+
+    if utils.pa is not None:
+        results.append(measure("data.process_queried_data.arrow", lambda: utils.process_queried_data(data_json, "arrow"), n_obs, "observations", repeat))
+
+    if utils.ijson is not None:
+        results.append(
+            measure(
+                "data.query_data_stream",
+                lambda: utils.build_queried_frames(*queries.query_data_stream(AGENCY, DATAFLOW, key, client=client)),  # type: ignore
+                n_obs,
+                "observations",
+                repeat,
+            )
+        )
+
+    # Several data messages parsed one after the other, then by a pool of worker processes:
+    bodies = [fixtures.bodies["data"]] * workers
+    results.append(measure(f"data.parse.sequential.x{workers}", lambda: [utils.process_queried_data(json.loads(body)) for body in bodies], workers * n_obs, "observations", repeat))
+    with ParsePool(max_workers=workers, min_bytes=0) as pool:
+        results.append(measure(f"data.parse.pool.x{workers}", lambda: pool.map(bodies), workers * n_obs, "observations", repeat))
+
+    client.close()
+    return results
+
+
+def wire_sizes(fixtures: Fixtures) -> dict:
+    """
+    Returns the size in bytes of the data message in each representation, as sent and gzip-compressed.
+    """
+    sizes = {}
+    for name, body in [("json", fixtures.bodies["data"]), ("csv", fixtures.bodies["data_csv"]), ("json.last12", fixtures.data_body(last_n=12))]:
+        sizes[name] = len(body)
+        sizes[f"{name}+gzip"] = len(gzip.compress(body, compresslevel=6))
+    return sizes
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def print_results(results: list, baseline: Optional[dict] = None) -> None:
+    previous = {r["name"]: r for r in baseline["results"]} if baseline else {}
+    print(f"{'benchmark':<40} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'throughput':>22} {'peak MB':>9}" + (f" {'vs base':>8}" if previous else ""))
+    for r in results:
+        line = f"{r['name']:<40} {r['p50_ms']:>10.2f} {r['p90_ms']:>10.2f} {r['p99_ms']:>10.2f} {r['throughput']:>12.4g} {r['unit']:<9} {r['peak_mb']:>9.1f}"
+        if r["name"] in previous:
+            line += f" {previous[r['name']]['p50_ms'] / r['p50_ms']:>7.2f}x"
+        print(line)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay added by the stand-in server before each response, in milliseconds")
+    parser.add_argument("--workers", type=int, default=4, help="Number of data messages parsed by the worker processes of a ParsePool")
+    parser.add_argument("--compress", action="store_true", help="Makes the stand-in server gzip-encode its responses")
+    parser.add_argument("--recorded", help="StructureCache directory whose entries are served instead of the synthetic structure responses")
+    parser.add_argument("--output", help="Writes the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare the median latencies with")
+    args = parser.parse_args(argv)
+
+    fixtures = Fixtures(args.size, args.recorded)
+    with StandInServer(fixtures.route, latency=args.latency / 1e3, compress=args.compress) as server:
+        results = run_suite(fixtures, server, args.repeat, args.workers)
+
+    wire = wire_sizes(fixtures)
+    report = {"environment": environment(), "size": args.size, "params": fixtures.params, "latency_ms": args.latency, "workers": args.workers, "compress": args.compress, "wire_bytes": wire, "results": results}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("size") != args.size:
+            print(f"Warning: the baseline was run with size '{baseline.get('size')}'")
+    print_results(results, baseline)
+    print("data message bytes: " + ", ".join(f"{name} {size:,}" for name, size in wire.items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import gzip
+import threading
+import time
+import httpx
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+from package.consts import BASE
+
+API_PATH = urlsplit(BASE).path
+
+
+class StandInServer:
+    """
+    Local HTTP server standing in for the IMF API. Each request is answered with the body returned by `route(path, accept)`,
+    where `path` is relative to the API base and includes the query string and `accept` is the Accept header of the request,
+    or with a 404 if it returns None. With `compress`, bodies are gzip-encoded for requests accepting it (compressed once per body).
+    Usage:
+    >>> with StandInServer(fixtures.route) as server:
+    >>>     client = httpx.Client(transport=server.transport())  # Requests to api.imf.org go to the server
+
+    Parameters:
+    route (callable): Returns the response body of a request path.
+    latency (float): Delay added before each response, in seconds, to simulate a round trip to the real API.
+    compress (bool): Whether to gzip-encode the bodies of requests accepting it.
+    """
+
+    def __init__(self, route: Callable[[str, str], Optional[bytes]], latency: float = 0.0, compress: bool = False):
+
+        self.route = route
+        self.latency = latency
+        self.compress = compress
+        self._compressed: dict = {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                path = self.path[len(API_PATH) :] if self.path.startswith(API_PATH) else self.path
+                accept = self.headers.get("Accept", "application/json")
+                body = server.route(path, accept)
+                gzipped = body is not None and server.compress and "gzip" in self.headers.get("Accept-Encoding", "")
+                if gzipped:
+                    body = server.gzipped(body)  # type: ignore
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body or b"")
+
+                self.send_response(200 if body is not None else 404)
+                self.send_header("Content-Type", "text/csv" if "csv" in accept else "application/json")
+                if gzipped:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                self.wfile.write(body or b"")
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def gzipped(self, body: bytes) -> bytes:
+        with self._lock:
+            compressed = self._compressed.get(id(body))
+        if compressed is None:
+            compressed = gzip.compress(body, compresslevel=6)
+            with self._lock:
+                self._compressed[id(body)] = compressed
+        return compressed
+
+    def __enter__(self) -> "StandInServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def rewrite(self, request: httpx.Request) -> None:
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        request.headers["Host"] = f"127.0.0.1:{self.port}"
+
+    def transport(self) -> httpx.BaseTransport:
+        """
+        Returns a synchronous transport sending every request to the server.
+        """
+        server, inner = self, httpx.HTTPTransport()
+
+        class Transport(httpx.BaseTransport):
+            def handle_request(self, request):
+                server.rewrite(request)
+                return inner.handle_request(request)
+
+            def close(self):
+                inner.close()
+
+        return Transport()
+
+    def async_transport(self) -> httpx.AsyncBaseTransport:
+        """
+        Returns an asynchronous transport sending every request to the server.
+        """
+        server, inner = self, httpx.AsyncHTTPTransport()
+
+        class AsyncTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                server.rewrite(request)
+                return await inner.handle_async_request(request)
+
+            async def aclose(self):
+                await inner.aclose()
+
+        return AsyncTransport()
@@ -1 +1,10 @@
 from .main import IMFInstance
+from .aio import AsyncIMFInstance
+from .cache import StructureCache, DataCache
+from .store import DataStore
+from .retry import RetryPolicy, AdaptiveConcurrency
+from .parsing import ParsePool
+from .catalog import CatalogIndex
+from .scheduler import RefreshScheduler, AsyncRefreshScheduler
+from .mirror import DataflowMirror
+from .instrumentation import add_hook, remove_hook, instrument, EventRecorder, LoggingHook, SpanHook, PrometheusHook
@@ -0,0 +1,865 @@
+from .utils import *
+from .queries import *
+from .planner import *
+from .cache import DataCache, default_directory
+from .store import DataStore
+from .instrumentation import emit
+from .parsing import ParsePool
+from .catalog import CatalogIndex
+from .scheduler import AsyncRefreshScheduler
+from .mirror import DataflowMirror
+from .retry import DEFAULT_RETRY, AdaptiveConcurrency, RateControl, RetryPolicy, set_rate_control
+from typing import Optional, List
+import functools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+"""
+Logger of the progress details of queries (batches, splits, deltas, store reads), at DEBUG level.
+"""
+
+METADATA_STAGES = ["dimensions", "codelists", "availability"]
+"""
+Metadata stages of a dataflow object, in loading order. Each stage depends on the previous ones.
+"""
+
+
+class AsyncIMFInstance:
+    """
+    Asynchronous instance of the IMF Data API.
+    Every request runs on the caller's event loop, so the instance can be used from asyncio services and notebooks.
+    Usage:
+    >>> async with AsyncIMFInstance() as imf_instance:
+    >>>     dataflow = await imf_instance.Dataflow('CPI')
+    >>>     result = await dataflow.query({'COUNTRY': 'USA', ...})
+    >>>     results = await imf_instance.fetch_many([('CPI', query_params), ('ER', er_params)])
+
+    Entering the context manager (or awaiting `open()`) loads the dataflow catalog; leaving it (or awaiting `aclose()`)
+    closes the HTTP client if the instance created it. `IMFInstance` is a synchronous wrapper around this class.
+
+    Parameters:
+    cache (StructureCache): Optional persistent cache for the dataflow catalog and the structure metadata of each dataflow.
+    data_cache (DataCache): Optional persistent store of query results, required by incremental queries.
+    store (DataStore): Optional local columnar store that queries are served from and written to.
+    http2 (bool): Whether to negotiate HTTP/2 (requires the `h2` package).
+    timeout (float): Timeout of each request, in seconds.
+    max_connections (int): Maximum number of open connections in the pool.
+    max_keepalive_connections (int): Maximum number of idle connections kept alive in the pool.
+    keepalive_expiry (float): Number of seconds an idle connection is kept alive.
+    proxy (str): Optional proxy URL.
+    retry (RetryPolicy): Retries of throttled, unavailable and failed requests. None disables them.
+    adaptive_concurrency (bool): Whether the number of requests in flight adapts to the server's pushback, between 1 and `max_connections`.
+    parse_pool (ParsePool): Optional pool of workers parsing the data responses, so that concurrent responses are parsed on several cores.
+    compact (bool): Whether dataflow objects keep their metadata in compact form: codelists as `CodeTable`s shared between the dataflow
+    objects using them, available values as `AvailableCodes` (array-backed positions in the code tables), and raw structure responses
+    released once all the metadata is processed.
+    client (httpx.AsyncClient): Optional preconfigured client, used instead of building one from the settings above.
+
+    """
+
+    def __init__(
+        self,
+        cache: Optional[StructureCache] = None,
+        http2: bool = True,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        proxy: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        data_cache: Optional[DataCache] = None,
+        store: Optional[DataStore] = None,
+        retry: Optional[RetryPolicy] = DEFAULT_RETRY,
+        adaptive_concurrency: bool = True,
+        parse_pool: Optional[ParsePool] = None,
+        compact: bool = False,
+    ):
+
+        self.cache = cache
+        """
+        Persistent structure cache shared by the instance and its dataflow objects, if any.
+        """
+
+        self.data_cache = data_cache
+        """
+        Persistent store of query results used by incremental queries, if any.
+        """
+
+        self.store = store
+        """
+        Local columnar store that queries are served from and written to, if any.
+        """
+
+        settings = dict(http2=http2, timeout=timeout, max_connections=max_connections, max_keepalive_connections=max_keepalive_connections, keepalive_expiry=keepalive_expiry, proxy=proxy)
+        self._owns_client = client is None
+
+        self.client: httpx.AsyncClient = client if client is not None else make_async_client(**settings)
+        """
+        HTTP client shared by the catalog, structure and data queries of the instance.
+        """
+
+        self.concurrency: Optional[AdaptiveConcurrency] = AdaptiveConcurrency(maximum=max_connections) if adaptive_concurrency else None
+        """
+        Adaptive limit on the number of requests in flight on the client, if any.
+        """
+
+        set_rate_control(self.client, RateControl(retry, self.concurrency))
+
+        self.parse_pool = parse_pool
+        """
+        Pool of workers parsing the data responses, if any. The pool is owned by the caller, who closes it.
+        """
+
+        self.compact = compact
+        """
+        Whether dataflow objects keep their metadata in compact form.
+        """
+
+        self.dataflows: Optional[pd.DataFrame] = None
+        """
+        DataFrame containing all dataflows available in the IMF Data API, loaded by `open()`.
+        Each row corresponds to a dataflow with its properties such as ID, name, version, and agency ID.
+        """
+
+        self.dataflows_ids: Optional[list[str]] = None
+        """
+        List of dataflow IDs available in the IMF Data API, loaded by `open()`.
+        """
+
+        self.dataflows_index: Optional[dict] = None
+        """
+        Dictionary mapping each dataflow ID to the dictionary of its catalog row, loaded by `open()`.
+        """
+
+        self._open_lock = asyncio.Lock()
+        self._schedulers: List[AsyncRefreshScheduler] = []
+
+    async def open(self) -> "AsyncIMFInstance":
+        """
+        Loads the dataflow catalog, once, and returns the instance.
+        """
+        async with self._open_lock:
+            if self.dataflows is None:
+                self.dataflows = await get_all_dataflows_async(self.client, self.cache)
+                self.dataflows_ids = self.dataflows["DataflowID"].tolist()
+                self.dataflows_index = {row["DataflowID"]: row for row in self.dataflows.to_dict(orient="records")}
+        return self
+
+    async def aclose(self) -> None:
+        """
+        Stops the refresh schedulers of the instance, and closes the HTTP client if it is owned by the instance.
+        """
+        for scheduler in self._schedulers:
+            await scheduler.stop()
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncIMFInstance":
+        try:
+            return await self.open()
+        except BaseException:
+            # `__aexit__` is not called when entering fails:
+            await self.aclose()
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def dataflow_dictionary(self, dataflow_id: str) -> dict:
+        """
+        Returns a dictionary of the dataflow with the given ID.
+        """
+        if self.dataflows_index is None:
+            raise ValueError("The dataflow catalog is not loaded. Await `open()` or use the instance as an async context manager.")
+
+        try:
+            return dict(self.dataflows_index[dataflow_id])
+        except KeyError:
+            raise ValueError(f"Dataflow ID '{dataflow_id}' not found. Available IDs: {self.dataflows_ids}")
+
+    async def Dataflow(self, dataflow_id: str, lazy: bool = False) -> "AsyncIMFInstance.DataflowObject":
+        """
+        Returns the DataflowObject for the specified dataflow ID, with all its metadata loaded.
+
+         Parameters:
+        dataflow_id (str): The ID of the dataflow to be accessed.
+        lazy (bool): If True, the object is built from the catalog row alone and its metadata is loaded by `load()`
+        (or by the queries that need it).
+
+        """
+        await self.open()
+        dataflow = AsyncIMFInstance.DataflowObject(self, dataflow_id)
+        if not lazy:
+            await dataflow.load()
+        return dataflow
+
+    async def fetch_many(self, requests: List[tuple], max_concurrency: int = 8, data_format: str = "json") -> dict:
+        """
+        Queries several dataflows concurrently.
+        Takes a list of (dataflow_id, query_params) tuples and returns a dictionary keyed by (dataflow_id, SDMX key).
+        Each value is the queried data, or the exception raised for that request, so one bad request does not abort the batch.
+        Requests that cannot be resolved to a key (unknown dataflow, invalid parameters) are keyed by (dataflow_id, position in `requests`).
+        Requests building the same key (e.g. "usa" and ["USA"]) are sent once and share one entry.
+
+         Parameters:
+        requests (list): List of (dataflow_id, query_params) tuples.
+        max_concurrency (int): Maximum number of requests in flight.
+        data_format (str): Representation requested from the API, "json" (SDMX-JSON) or "csv" (SDMX-CSV).
+
+        """
+        await self.open()
+
+        results, keys = {}, {}
+
+        # The metadata of all the dataflows is loaded concurrently:
+        dataflow_ids = list(dict.fromkeys(dataflow_id for dataflow_id, _ in requests))
+        dataflow_objects = dict(zip(dataflow_ids, await asyncio.gather(*(self.Dataflow(dataflow_id) for dataflow_id in dataflow_ids), return_exceptions=True)))
+
+        for i, (dataflow_id, query_params) in enumerate(requests):
+            dataflow = dataflow_objects[dataflow_id]
+            if isinstance(dataflow, Exception):
+                results[(dataflow_id, i)] = dataflow
+                continue
+            try:
+                key, key_name = dataflow.query_key(query_params)
+            except (TypeError, ValueError) as e:
+                results[(dataflow_id, i)] = e
+                continue
+            # A key built by several requests is fetched once:
+            keys.setdefault((dataflow.dataflow_agency_id, dataflow_id, key), key_name)
+        batch, names = list(keys), list(keys.values())
+
+        logger.debug("Querying %d keys across %d dataflows", len(batch), len(dataflow_objects))
+        responses = await query_data_many(batch, max_concurrency=max_concurrency, client=self.client, data_format=data_format, pool=self.parse_pool)
+
+        for (_, dataflow_id, key), key_name, data in zip(batch, names, responses):
+            results[(dataflow_id, key)] = data if isinstance(data, Exception) else AsyncIMFInstance.DataflowObject.format_result(data, key_name)
+        return results
+
+    def scheduler(self, max_concurrency: int = 4, retry_after: float = 60.0) -> AsyncRefreshScheduler:
+        """
+        Returns a scheduler keeping registered queries and dataflow metadata warm in the background, and serving their last
+        good result while revalidating it (see `AsyncRefreshScheduler`). It is stopped when the instance is closed.
+
+         Parameters:
+        max_concurrency (int): Maximum number of refreshes running at once.
+        retry_after (float): Delay before retrying a failed refresh, in seconds.
+
+        """
+        scheduler = AsyncRefreshScheduler(self, max_concurrency, retry_after)
+        self._schedulers.append(scheduler)
+        return scheduler
+
+    async def mirror(
+        self,
+        dataflow_id: str,
+        directory: Optional[str] = None,
+        max_series: int = MAX_SERIES_PER_REQUEST,
+        max_key_length: int = MAX_KEY_LENGTH,
+        max_concurrency: int = 8,
+        data_format: str = "csv",
+        restart: bool = False,
+        **filters,
+    ) -> DataflowMirror:
+        """
+        Mirrors all the data of a dataflow to a directory (see `DataflowMirror`) and returns the mirror.
+        The availability cube is partitioned into units of at most `max_series` estimated series, fetched concurrently and streamed
+        to one file each. Calling it again resumes an interrupted mirror: only the units that are not done are fetched.
+
+         Parameters:
+        dataflow_id (str): The ID of the dataflow to mirror.
+        directory (str): Directory of the mirror. Defaults to "$XDG_CACHE_HOME/imf_data_fetcher/mirror/<dataflow_id>".
+        max_series (int): Maximum number of estimated series per unit.
+        max_key_length (int): Maximum length of the SDMX key of a unit.
+        max_concurrency (int): Maximum number of units fetched at once.
+        data_format (str): Representation of the unit files, "csv" (SDMX-CSV) or "json" (SDMX-JSON).
+        restart (bool): Whether to delete the mirror and start it over.
+        filters: Period and observation filters applied to every unit (`start_period`, `end_period`, ..., see `filter_params`).
+
+        """
+        params = filter_params(**filters)
+        mirror = DataflowMirror(directory or default_directory("mirror", dataflow_id))
+        # Resuming a mirror only needs the catalog row of the dataflow, planning it needs its availability:
+        dataflow = await self.Dataflow(dataflow_id, lazy=True)
+        if restart or mirror.manifest is None:
+            await dataflow.load()
+        mirror.plan(dataflow, max_series=max_series, max_key_length=max_key_length, data_format=data_format, params=params, restart=restart)
+        await mirror.run(self.client, max_concurrency=max_concurrency)
+        return mirror
+
+    async def index_catalog(self, index: Optional[CatalogIndex] = None, dataflow_ids: Optional[List[str]] = None, refresh: bool = False, max_concurrency: int = 8) -> CatalogIndex:
+        """
+        Adds dataflows to a search index of the catalog (see `CatalogIndex`), saves it and returns it.
+        By default, indexes every dataflow of the catalog that is not indexed yet, or was indexed at another version, and removes the
+        dataflows that left the catalog. The metadata of the dataflows is loaded concurrently, through the structure cache if any.
+        Dataflows whose metadata fails to load are left out: their errors are kept in the `failures` of the index and logged as warnings.
+
+         Parameters:
+        index (CatalogIndex): Index to fill. Defaults to the index saved in the default directory.
+        dataflow_ids (list): Dataflows to index, instead of the whole catalog.
+        refresh (bool): Whether to re-index the dataflows that are already indexed at their current version.
+        max_concurrency (int): Maximum number of dataflows loaded at once.
+
+        """
+        await self.open()
+        index = index if index is not None else CatalogIndex()
+
+        if dataflow_ids is None:
+            catalog = self.dataflows
+            for dataflow_id in set(index.dataflows) - set(self.dataflows_index):  # type: ignore
+                index.remove(dataflow_id)
+        else:
+            unknown = [dataflow_id for dataflow_id in dataflow_ids if dataflow_id not in self.dataflows_index]  # type: ignore
+            if unknown:
+                raise ValueError(f"Dataflow IDs {unknown} not found. Available IDs: {self.dataflows_ids}")
+            catalog = self.dataflows[self.dataflows["DataflowID"].isin(dataflow_ids)]  # type: ignore
+        pending = catalog["DataflowID"].tolist() if refresh else index.outdated(catalog)  # type: ignore
+
+        logger.debug("Indexing %d dataflows", len(pending))
+        index.failures = {}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def load(dataflow_id):
+            async with semaphore:
+                return await self.Dataflow(dataflow_id)
+
+        for dataflow_id, dataflow in zip(pending, await asyncio.gather(*(load(dataflow_id) for dataflow_id in pending), return_exceptions=True)):
+            if isinstance(dataflow, Exception):
+                logger.warning("Dataflow '%s' is not indexed: %r", dataflow_id, dataflow)
+                index.failures[dataflow_id] = dataflow
+                continue
+            index.add(dataflow)
+
+        index.save()
+        return index
+
+    class DataflowObject:
+        """
+        Asynchronous dataflow object, returned by `AsyncIMFInstance.Dataflow`.
+        Metadata attributes are None until their stage is loaded by `load()` or by a query that needs it.
+        """
+
+        instance: "AsyncIMFInstance"
+
+        dataflow_id: str
+        dataflow_dictionary: Optional[dict]
+        dataflow_name: Optional[str]
+        dataflow_version: Optional[str]
+        dataflow_agency_id: Optional[str]
+
+        structure_id: Optional[str]
+        structure_version: Optional[str]
+        structure_agency_id: Optional[str]
+
+        queries_response: Optional[dict]
+
+        dimensions: Optional[pd.DataFrame] = None
+        dimensions_codelists: Optional[dict] = None
+        dimensions_available_values: Optional[pd.DataFrame] = None
+        _dimensions_available_values: Optional[dict] = None
+        available_values_index: Optional[dict] = None
+        available_time_range: Optional[tuple] = None
+        dimensions_ordered: Optional[List[str]] = None
+
+        query_params_dict_template: Optional[dict] = None
+
+        def __init__(self, parent: "AsyncIMFInstance", dataflow_id: str):
+
+            self.instance = parent
+
+            self.dataflow_id = dataflow_id
+
+            """
+            ID of the dataflow.
+            """
+
+            self.dataflow_dictionary = parent.dataflow_dictionary(dataflow_id)
+            """
+            Dictionary containing the dataflow information.
+            """
+
+            self.dataflow_name = self.dataflow_dictionary.get("DataflowName")
+            """
+            Name of the dataflow.
+            """
+
+            self.dataflow_version = self.dataflow_dictionary.get("DataflowVersion")
+            """
+            Version of the dataflow. Always corresponds to the latest version.
+            """
+
+            self.dataflow_agency_id = self.dataflow_dictionary.get("DataflowAgencyID")
+            """
+            Agency ID of the dataflow.
+            """
+
+            self.structure_id = self.dataflow_dictionary.get("StructureID")
+            """
+            ID of the datastructure associated with the dataflow.
+            """
+
+            self.structure_version = self.dataflow_dictionary.get("StructureVersion")
+            """
+            Version of the datastructure associated with the dataflow. Always corresponds to the latest version.
+            """
+
+            self.structure_agency_id = self.dataflow_dictionary.get("StructureAgencyID")
+            """
+            Agency ID of the datastructure associated with the dataflow.
+            """
+
+            self._lock = asyncio.Lock()
+            self._loaded: set = set()
+
+            self.queries_response = {}
+            """
+            Raw structure responses of the dataflow, filled as metadata is loaded.
+            """
+
+        def is_loaded(self, stage: str) -> bool:
+            return stage in self._loaded
+
+        async def load(self, stage: str = METADATA_STAGES[-1]) -> None:
+            """
+            Fetches and processes a metadata stage ("dimensions", "codelists" or "availability") and the stages it depends on, once.
+            By default, loads all the metadata of the dataflow.
+            """
+            async with self._lock:
+                pending = [dependency for dependency in METADATA_STAGES[: METADATA_STAGES.index(stage) + 1] if dependency not in self._loaded]
+
+                # Availability does not depend on the structure responses, so it is requested alongside them:
+                availability = asyncio.ensure_future(self._query_stage("availability")) if len(pending) > 1 and "availability" in pending else None
+
+                try:
+                    for dependency in pending:
+                        if dependency == "availability" and availability is not None:
+                            response = await self._query_early_availability(availability)
+                        else:
+                            response = await self._query_stage(dependency)
+                        self.queries_response.update(response)
+                        getattr(self, f"_process_{dependency}")()
+                        self._loaded.add(dependency)
+                finally:
+                    if availability is not None and not availability.done():
+                        availability.cancel()
+
+                # Once every stage is processed, the raw responses are no longer needed:
+                if self.instance.compact and len(self._loaded) == len(METADATA_STAGES):
+                    self.queries_response = {}
+
+        async def _query_stage(self, stage: str) -> dict:
+            cache, client = self.instance.cache, self.instance.client
+            if stage == "dimensions":
+                return await query_dimensions(client, self.dataflow_dictionary, cache)
+            if stage == "codelists":
+                return await query_codelists(client, response_dimensions(self.queries_response), cache, self.queries_response["dimensions"])
+            n_dims = len(self.dimensions) if self.dimensions is not None else None
+            return await query_availability(client, self.dataflow_dictionary, n_dims, cache)
+
+        async def _query_early_availability(self, availability: asyncio.Future) -> dict:
+            try:
+                return await availability
+            except httpx.HTTPStatusError as e:
+                if not rejected_key(e):
+                    raise
+                # The single wildcard key was rejected, retry with one wildcard per dimension:
+                return await self._query_stage("availability")
+
+        def prefetch(self) -> asyncio.Task:
+            """
+            Loads all the metadata of the dataflow in a background task on the running loop and returns the task.
+            """
+            return asyncio.ensure_future(self.load())
+
+        def _process_dimensions(self) -> None:
+
+            self.dimensions = process_dataflow_dimensions(self.queries_response)
+            """
+            DataFrame containing the dimensions (query parameters) of the dataflow.
+            Each row corresponds to a dimension with its properties.
+            """
+
+            self.dimensions_ordered = self.dimensions.sort_values(by="ConceptPosition")["ConceptName"].to_list()
+            """
+            List of dimension names in the order they appear in the dataflow.
+            This is used to ensure that query parameters are provided in the correct order when querying the dataflow.
+            """
+
+            self.query_params_dict_template = {dimension: "*" for dimension in self.dimensions_ordered}
+            """
+            Dictionary template for query parameters.
+            The keys are dimension names, and the values are "Value", indicating that these are the expected parameters for querying the dataflow.
+            """
+
+        def _process_codelists(self) -> None:
+
+            self.dimensions_codelists = process_codelists(self.queries_response, self.dimensions, compact=self.instance.compact)
+            """
+            Dictionary containing the codelists for each dimension.
+            The keys are dimension concept IDs, and the values are lists of dictionaries with "ID" and "Name" (`CodeTable`s in compact mode).
+            """
+
+        def _process_availability(self) -> None:
+
+            self.dimensions_available_values, self._dimensions_available_values = process_availability(self.queries_response, self.dimensions_codelists, compact=self.instance.compact)
+            """
+            DataFrame containing the available values for each dimension in the dataflow.
+            Each row corresponds to a dimension value with its properties.
+            The DataFrame has columns "DimensionID", "Value", and "Name".
+            "_dimensions_available_values" is a dictionary mapping dimension names to their available values.
+            """
+
+            if self.instance.compact:
+                self.available_values_index = self._dimensions_available_values
+            else:
+                self.available_values_index = {dim: {value["ID"]: value["Name"] for value in values} for dim, values in self._dimensions_available_values.items()}
+            """
+            Dictionary mapping each dimension to a dictionary of its available values (code -> name), in availability order.
+            Used to validate and name query values in constant time. In compact mode, the values are `AvailableCodes`,
+            the same objects as in "_dimensions_available_values".
+            """
+
+            self.available_time_range = availability_time_range(self.queries_response)
+            """
+            First day of the first period and last day of the last period with available data, or None if the availability
+            cube has no time range. Used to reject period filters outside of it before sending the query.
+            """
+
+        def dimension_codelist(self, dimension_concept_id: Optional[str] = None):
+            """
+            Returns a dictionary of codelist for specified dimension.
+            """
+            if self.dimensions_codelists is None:
+                raise ValueError("No codelists available for this dataflow.")
+            try:
+                return self.dimensions_codelists[dimension_concept_id]
+            except KeyError:
+                raise ValueError(f"Dimension ID '{dimension_concept_id}' not found. Available IDs: {list(self.dimensions_codelists.keys())}")
+
+        def dimension_available_values(self, dimension_concept_name: Optional[str] = None):
+            """
+            Returns a dictionary of available values for specified dimension.
+            """
+            if self._dimensions_available_values is None:
+                raise ValueError("No available values for dimensions. The dataflow may not be initialized properly.")
+            try:
+                if dimension_concept_name is None:
+                    raise ValueError("dimension_concept_name cannot be None.")
+                dimension_concept_name = dimension_concept_name.upper()
+                values = self._dimensions_available_values[dimension_concept_name]
+                return values.records() if isinstance(values, AvailableCodes) else values
+            except KeyError:
+                raise ValueError(f"Dimension ID '{dimension_concept_name}' not found. Available IDs: {list(self._dimensions_available_values.keys())}")
+
+        def memory_usage(self) -> pd.Series:
+            """
+            Returns the memory held by the metadata of the dataflow object, in bytes, per attribute.
+            Objects shared between attributes are counted once, in the first of them; code tables shared with other dataflow objects
+            (compact mode) are counted in full.
+            """
+            attributes = ["queries_response", "dimensions", "dimensions_codelists", "dimensions_available_values", "_dimensions_available_values", "available_values_index"]
+            seen: set = set()
+            return pd.Series({name: deep_sizeof(getattr(self, name), seen) for name in attributes}, name="bytes")
+
+        @staticmethod
+        def required_stage(query_params, validate: bool = True) -> Optional[str]:
+            """
+            Returns the metadata stage needed to build the key of a query, or None if the key can be sent without metadata.
+            """
+            if isinstance(query_params, str):
+                return None
+            return "availability" if validate else "dimensions"
+
+        async def query(
+            self,
+            query_params,
+            validate: bool = True,
+            stream: bool = False,
+            max_series: Optional[int] = MAX_SERIES_PER_REQUEST,
+            max_key_length: int = MAX_KEY_LENGTH,
+            max_concurrency: int = 8,
+            incremental: bool = False,
+            delta: str = "updatedAfter",
+            use_store: bool = True,
+            output: str = "pivot",
+            data_format: str = "json",
+            value_dtype: str = "float64",
+            start_period=None,
+            end_period=None,
+            first_n_observations: Optional[int] = None,
+            last_n_observations: Optional[int] = None,
+            attributes=None,
+            measures=None,
+            detail: Optional[str] = None,
+        ):
+            """
+            Queries the dataflow with the provided query parameters.
+            The query parameters must match the template defined in `query_params_dict_template`.
+            The keys of the query parameters must match the dimension names in the dataflow.
+            The values can be a single value or a list of values for each dimension.
+            If a value is not provided for a dimension, it defaults to "*", which means all values for that dimension.
+            The method returns a DataFrame or a dict of DataFrames containing the queried data if the query is successful.
+            If the query fails, it raises an exception with a descriptive error message.
+            With `stream=True`, the response body is decoded incrementally into column buffers (requires `ijson`),
+            so peak memory grows with the output rather than with the raw payload and its parsed JSON tree.
+            Keys matching more than `max_series` series (estimated from the availability cube) or longer than `max_key_length`
+            characters are split along their largest dimension into sub-queries, fetched concurrently (at most `max_concurrency`
+            in flight) and merged into a single result. Pass `max_series=None` to always send the key as is.
+            With `validate=False`, or when `query_params` is already an SDMX key string (e.g. "USA.CPI._T.IX.M"), the key is sent
+            without checking it against the available values, so a lazy dataflow object does not load codelists or availability.
+            Splitting only applies to validated queries.
+            With `incremental=True`, the result is kept in the instance's `data_cache`. When the key was fetched before, only the
+            observations changed since are requested (see `delta_params` for the `delta` modes) and merged into the stored result,
+            new and revised values replacing the stored ones. Observations deleted at the source are not removed.
+            When the instance has a `store`, the key is split into one sub-key per entity (first dimension): the sub-keys the store
+            holds are read from it, the others are fetched in one query and written to it. Pass `use_store=False` to bypass the store.
+            Incremental queries do not use the store.
+            `output` selects the format of the result (see `OUTPUT_FORMATS`): "pivot" (the DataFrame, or dictionary of DataFrames,
+            of each indicator), "long" (a single tidy DataFrame with categorical dimension columns), "numpy" (a dictionary of column arrays)
+            or "arrow" (an Arrow table). Incremental queries and queries served from the store only return the "pivot" format.
+            `data_format` selects the representation requested from the API: "json" (SDMX-JSON) or "csv" (SDMX-CSV, more compact and
+            faster to decode). Both give the same result.
+            `value_dtype` selects the data type of the values (see `VALUE_DTYPES`): "float32" halves their memory, with about
+            7 significant digits. Incremental queries and queries served from the store only return "float64" values.
+            `start_period`, `end_period`, `first_n_observations`, `last_n_observations`, `attributes`, `measures` and `detail` are sent
+            to the API (see `filter_params`), which then returns only that part of the data: the payload and the parsing time scale
+            with the requested window rather than with the full history. When availability is loaded, a period range outside of the
+            available one raises a ValueError without querying. Filtered queries are neither incremental nor served from the store.
+            """
+
+            if incremental and self.instance.data_cache is None:
+                raise ValueError("Incremental queries require a DataCache: pass `data_cache=DataCache()` to the instance.")
+            if delta not in DELTA_MODES:
+                raise ValueError(f"Unknown delta mode '{delta}'. Expected one of {DELTA_MODES}.")
+            check_output(output, value_dtype)
+            if (output, value_dtype) != ("pivot", "float64") and (incremental or (use_store and self.instance.store is not None)):
+                raise ValueError("Incremental queries and queries served from the data store only return the 'pivot' output with 'float64' values. Pass `use_store=False` to bypass the store.")
+            filters = filter_params(start_period, end_period, first_n_observations, last_n_observations, attributes, measures, detail)
+            if filters and (incremental or (use_store and self.instance.store is not None)):
+                raise ValueError("Filtered queries cannot be incremental or served from the data store. Pass `use_store=False` to bypass the store.")
+
+            stage = self.required_stage(query_params, validate)
+            if stage is not None:
+                await self.load(stage)
+
+            key, key_name = self.query_key(query_params, validate=validate)
+            self.check_period_range(start_period, end_period)
+            print(f"Querying: {key_name}")
+
+            # Splitting needs the availability cube, so it only applies to validated queries:
+            split = max_series is not None and validate and not isinstance(query_params, str)
+            fetch_options = dict(split=split, stream=stream, max_series=max_series, max_key_length=max_key_length, max_concurrency=max_concurrency, output=output, data_format=data_format, value_dtype=value_dtype)
+
+            store = self.instance.store if use_store and not incremental else None
+            if store is not None:
+                return self.format_result(await self._query_through_store(store, key, **fetch_options), key_name)
+
+            url = f"{BASE}/data/dataflow/{self.dataflow_agency_id}/{self.dataflow_id}/+/{key}"
+            stored = self.instance.data_cache.get(url) if incremental else None  # type: ignore
+            params = merge_params(filters, delta_params(stored["fetched_at"], stored["last_period"], delta) if stored is not None else None)
+            if stored is not None:
+                logger.debug("Requesting changes of %s since %s", key, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stored["fetched_at"])))
+            fetched_at = time.time()
+
+            data = await self._fetch(key, params=params, **fetch_options)
+
+            if stored is not None:
+                # Changed observations come first, so they replace the stored values:
+                data = merge_results([data, stored["frames"]])
+            if incremental:
+                self.instance.data_cache.put(url, data, fetched_at)  # type: ignore
+
+            return self.format_result(data, key_name) if output == "pivot" else data
+
+        async def _fetch(self, key: str, split: bool, stream: bool, max_series: Optional[int], max_key_length: int, max_concurrency: int, params: Optional[dict] = None, output: str = "pivot", data_format: str = "json", value_dtype: str = "float64"):
+            """
+            Fetches and parses the data of a key in an output format, split into concurrent sub-queries if it is oversized.
+            """
+            plan = [key.split(".")]
+            if split:
+                plan = plan_query(key.split("."), self.dimensions_ordered, self.available_codes(), max_series, max_key_length)  # type: ignore
+
+            client, pool = self.instance.client, self.instance.parse_pool
+            parse = functools.partial(process_queried_data, output=output, value_dtype=value_dtype)
+            if len(plan) > 1:
+                logger.debug("Splitting %s into %d requests", key, len(plan))
+                requests = [(self.dataflow_agency_id, self.dataflow_id, ".".join(tokens)) for tokens in plan]
+                parts = await query_data_many(requests, max_concurrency=max_concurrency, parse=parse, client=client, params=params, data_format=data_format, pool=pool)
+                for part in parts:
+                    if isinstance(part, Exception):
+                        raise part
+                return combine_results(parts, output)
+            if stream:
+                streamed = await query_data_stream_async(client, self.dataflow_agency_id, self.dataflow_id, key, params=params, data_format=data_format)
+                # None when a filtered or delta query found no observation:
+                return build_queried_output(*streamed, output=output, value_dtype=value_dtype) if streamed is not None else empty_output(output)
+            data = await query_data_async(client, self.dataflow_agency_id, self.dataflow_id, key, params, data_format, raw=pool is not None)
+            return await pool.aparse(data, data_format, parse) if pool is not None else parse(data)
+
+        def check_period_range(self, start_period=None, end_period=None) -> None:
+            """
+            Raises a ValueError if a period range does not overlap the time range of the available data.
+            Does nothing if availability is not loaded or has no time range.
+            """
+            if self.available_time_range is None or (start_period is None and end_period is None):
+                return
+            available_start, available_end = self.available_time_range
+            start = parse_time_period(str(start_period)) if start_period is not None else pd.NaT
+            end = parse_time_period_end(str(end_period)) if end_period is not None else pd.NaT
+            if (pd.notna(start) and pd.notna(available_end) and start > available_end) or (pd.notna(end) and pd.notna(available_start) and end < available_start):
+                # Either bound of the available range may be open (NaT):
+                available_from = f"{available_start:%Y-%m-%d}" if pd.notna(available_start) else "the start"
+                available_to = f"{available_end:%Y-%m-%d}" if pd.notna(available_end) else "the end"
+                raise ValueError(
+                    f"No data for the periods from {start_period or 'the start'} to {end_period or 'the end'}: "
+                    f"data for dataflow '{self.dataflow_id}' is available from {available_from} to {available_to}."
+                )
+
+        def store_sub_keys(self, key: str) -> List[str]:
+            """
+            Splits a key into one sub-key per entity (value of the first dimension), the unit in which results are kept in a `DataStore`.
+            A wildcard entity is expanded to the available entities when availability is loaded, and kept as is otherwise.
+            """
+            tokens = key.split(".")
+            if tokens[0] != "*":
+                entities = tokens[0].split("+")
+            elif self.available_values_index is not None and self.dimensions_ordered:
+                entities = list(self.available_values_index.get(self.dimensions_ordered[0], {}))
+            else:
+                entities = []
+            if not entities:
+                return [key]
+            return [".".join([entity, *tokens[1:]]) for entity in entities]
+
+        async def _query_through_store(self, store, key: str, **fetch_options) -> dict:
+            """
+            Serves a key from a `DataStore`, fetching the sub-keys it does not hold (in one query) and writing them to it.
+            """
+            sub_keys = self.store_sub_keys(key)
+            missing = store.missing(self.dataflow_id, sub_keys)
+            emit({"event": "store", "dataflow": self.dataflow_id, "held": len(sub_keys) - len(missing), "missing": len(missing)})
+
+            # In offline mode, reading the missing sub-keys raises a LookupError:
+            if missing and not store.offline:
+                tokens = missing[0].split(".")
+                tokens[0] = "+".join(sub_key.split(".")[0] for sub_key in missing)
+                fetched = await self._fetch(".".join(tokens), **fetch_options)
+                store.write(self.dataflow_id, fetched, missing)
+
+            return store.read(self.dataflow_id, sub_keys)
+
+        def available_codes(self) -> dict:
+            """
+            Returns a dictionary mapping each dimension to the list of its available values.
+            """
+            if self.available_values_index is None:
+                raise ValueError("No available values for dimensions. The dataflow may not be initialized properly.")
+            return {dim: list(values) for dim, values in self.available_values_index.items()}
+
+        def query_key(self, query_params, validate: bool = True) -> tuple[str, str]:
+            """
+            Validates query parameters against the template and the available values of the dataflow.
+            Returns the SDMX key (e.g. "USA+CAN.CPI.*") and a readable name built from the names of the selected values.
+            An SDMX key string is returned as is. With `validate=False`, only the dimension names are checked and the key is its own name.
+            The metadata stage given by `required_stage` must be loaded.
+            """
+
+            if isinstance(query_params, str):
+                return query_params, query_params
+
+            if self.query_params_dict_template is None:
+                raise ValueError("Query parameter template is not initialized. Please check the dataflow initialization.")
+
+            if not isinstance(query_params, dict):
+                raise TypeError(f"Query parameters must be a dict matching {list(self.query_params_dict_template.keys())}")
+
+            template_keys = list(self.query_params_dict_template.keys())
+            provided_keys = list(query_params.keys())
+            if set(provided_keys) != set(template_keys):
+                missing = set(template_keys) - set(provided_keys)
+                extra = set(provided_keys) - set(template_keys)
+                msgs = []
+                if missing:
+                    msgs.append(f"missing {missing}")
+                if extra:
+                    msgs.append(f"unexpected {extra}")
+                raise ValueError(f"Expected keys {template_keys}, but got {provided_keys} ({'; '.join(msgs)})")
+
+            formatted = []
+            for key in template_keys:
+                val = query_params.get(key, "*")
+                if val is None or val == "*":
+                    formatted.append("*")
+                elif isinstance(val, list):
+                    formatted.append("+".join(str(v).upper() for v in val))
+                else:
+                    formatted.append(str(val).upper())
+
+            if not validate:
+                return ".".join(formatted), ".".join(formatted)
+
+            if self.available_values_index is None:
+                raise ValueError("No available values for dimensions. The dataflow may not be initialized properly.")
+
+            value_names = []
+            for dim_key, token in zip(template_keys, formatted):
+                if token == "*":
+                    continue
+                available = self.available_values_index.get(dim_key, {})
+                for part in token.split("+"):
+                    if part not in available:
+                        raise ValueError(f"Value '{part}' for dimension '{dim_key}' not in available values")
+                    value_name = available[part]
+                    if value_name is None:
+                        value_name = str(part)
+                    value_names.append(value_name)
+
+            key = ".".join(formatted)
+            key_name = ", ".join(value_names)
+            return key, key_name
+
+        @staticmethod
+        def format_result(data: dict, key_name: str):
+            """
+            Returns the single DataFrame of a query result (named after the query), or the dictionary of DataFrames if there are several.
+            """
+            if len(data.keys()) == 1:
+                data = data[list(data.keys())[0]]
+                data.name = key_name
+                return data
+
+            return data  # type: ignore
+
+        async def query_many(self, query_params_list: List[dict], max_concurrency: int = 8, output: str = "pivot", data_format: str = "json", value_dtype: str = "float64") -> dict:
+            """
+            Queries the dataflow for several sets of query parameters concurrently.
+            Requests are sent over the shared HTTP/2 client with at most `max_concurrency` requests in flight,
+            and each response is parsed as soon as it arrives.
+            Returns a dictionary keyed by the SDMX key of each request. Each value is the result `query` would return,
+            or the exception raised for that request (invalid parameters, HTTP error, ...), so one bad request does not abort the batch.
+            Requests whose parameters do not match the template are keyed by their position in `query_params_list`.
+            Requests building the same key (e.g. "usa" and ["USA"]) are sent once and share one entry.
+            Results are in the `output` format with `value_dtype` values, fetched in the `data_format` representation, see `query`.
+            """
+            check_output(output, value_dtype)
+            await self.load()
+
+            results, keys = {}, {}
+            for i, query_params in enumerate(query_params_list):
+                try:
+                    key, key_name = self.query_key(query_params)
+                except (TypeError, ValueError) as e:
+                    results[i] = e
+                    continue
+                # A key built by several requests is fetched once:
+                keys.setdefault(key, key_name)
+            requests, names = [(self.dataflow_agency_id, self.dataflow_id, key) for key in keys], list(keys.values())
+
+            logger.debug("Querying %d keys of %s", len(requests), self.dataflow_id)
+            parse = functools.partial(process_queried_data, output=output, value_dtype=value_dtype)
+            responses = await query_data_many(requests, max_concurrency=max_concurrency, parse=parse, client=self.instance.client, data_format=data_format, pool=self.instance.parse_pool)
+
+            for (_, _, key), key_name, data in zip(requests, names, responses):
+                results[key] = data if isinstance(data, Exception) or output != "pivot" else self.format_result(data, key_name)
+            return results
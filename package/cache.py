@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import time
+from typing import Optional
+
+from .consts import *
+
+
+def default_directory(*parts: str) -> str:
+    """
+    Returns "$XDG_CACHE_HOME/imf_data_fetcher/..." (or "~/.cache/imf_data_fetcher/...").
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "imf_data_fetcher", *parts)
+
+
+def cache_key(url: str) -> str:
+    """
+    Returns the cache key of a URL: its path relative to the API base (e.g. "structure_codelist_IMF_CL_FREQ_+"),
+    suffixed with a short hash to keep distinct query strings apart.
+    """
+    path = url[len(BASE) :] if url.startswith(BASE) else url
+    readable = re.sub(r"[^A-Za-z0-9.+-]+", "_", path.split("?")[0]).strip("_")[:150]
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    return f"{readable}-{digest}"
+
+
+class StructureCache:
+    """
+    Persistent on-disk cache for SDMX structure responses (dataflows, datastructures, concept schemes, codelists, availability).
+    Entries are keyed by the request path, which carries the agency, resource ID and version of the structure.
+    Usage:
+    >>> cache = StructureCache(ttl=6 * 3600)
+    >>> imf_instance = IMFInstance(cache=cache)  # First start fills the cache, warm starts read from disk
+    >>> offline_instance = IMFInstance(cache=StructureCache(offline=True))  # Never touches the network
+
+    Parameters:
+    directory (str): Directory holding the cache files. Defaults to "$XDG_CACHE_HOME/imf_data_fetcher" (or "~/.cache/imf_data_fetcher").
+    ttl (float): Number of seconds an entry is served without revalidation. Expired entries are revalidated with ETag/Last-Modified.
+    max_size (int): Maximum total size of the cache in bytes. Least recently used entries are evicted beyond it.
+    offline (bool): Cache-only mode. Entries are served regardless of their age and a missing entry raises a LookupError.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: float = 24 * 3600, max_size: int = 256 * 1024 * 1024, offline: bool = False):
+
+        if directory is None:
+            directory = default_directory()
+
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, url: str) -> str:
+        return cache_key(url)
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{self.key(url)}.json")
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        Returns the cache entry for a URL, or None if there is none.
+        An entry is a dictionary with the keys "url", "fetched_at", "etag", "last_modified" and "body".
+        """
+        path = self.path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Reads count as use for the LRU eviction:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry.get("fetched_at", 0) < self.ttl
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """
+        Returns the cache entry for a URL if it can be served without a network call, None otherwise.
+        In offline mode, a missing entry raises a LookupError.
+        """
+        entry = self.get(url)
+        if entry is not None and (self.offline or self.is_fresh(entry)):
+            return entry
+        if self.offline:
+            raise LookupError(f"'{url}' is not in the structure cache ({self.directory}) and the cache is in offline mode.")
+        return None
+
+    def conditional_headers(self, entry: Optional[dict]) -> dict:
+        """
+        Returns the request headers used to revalidate a stale entry.
+        """
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, body: dict, headers=None) -> None:
+        """
+        Stores a response body and its validators, then evicts entries if the cache exceeds `max_size`.
+        """
+        headers = headers or {}
+        entry = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "body": body,
+        }
+        self._write(url, entry)
+        self.evict()
+
+    def revalidated(self, url: str, entry: dict, headers=None) -> None:
+        """
+        Marks a stale entry as fresh again after a "304 Not Modified" response.
+        """
+        headers = headers or {}
+        entry["fetched_at"] = time.time()
+        entry["etag"] = headers.get("etag") or entry.get("etag")
+        entry["last_modified"] = headers.get("last-modified") or entry.get("last_modified")
+        self._write(url, entry)
+
+    def _write(self, url: str, entry: dict) -> None:
+        path = self.path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def size(self) -> int:
+        """
+        Returns the total size of the cache in bytes.
+        """
+        return sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache fits in `max_size`.
+        """
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            files.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        """
+        Removes every entry from the cache.
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+
+class DataCache:
+    """
+    Persistent on-disk store of query results, used to refresh them incrementally.
+    Each entry holds the DataFrames of a data query, the time they were fetched and the last period they cover, so a later
+    `query(..., incremental=True)` only requests the observations added or revised since, and merges them in.
+    Usage:
+    >>> imf_instance = IMFInstance(data_cache=DataCache())
+    >>> data = imf_instance.Dataflow('CPI').query(query_params, incremental=True)  # Full history the first time, deltas afterwards
+
+    Parameters:
+    directory (str): Directory holding the cache files. Defaults to "$XDG_CACHE_HOME/imf_data_fetcher/data" (or "~/.cache/imf_data_fetcher/data").
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+
+        if directory is None:
+            directory = default_directory("data")
+
+        self.directory = directory
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{cache_key(url)}.pkl")
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        Returns the entry for the URL of a data query, or None if there is none.
+        An entry is a dictionary with the keys "url", "fetched_at", "last_period" and "frames" (the dictionary of DataFrames of the result).
+        """
+        try:
+            with open(self.path(url), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def put(self, url: str, frames: dict, fetched_at: float) -> None:
+        """
+        Stores the DataFrames of a query result fetched at `fetched_at` (a POSIX timestamp).
+        """
+        last_periods = [frame.index.max() for frame in frames.values() if len(frame)]
+        entry = {
+            "url": url,
+            "fetched_at": fetched_at,
+            "last_period": max(last_periods) if last_periods else None,
+            "frames": frames,
+        }
+
+        path = self.path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def clear(self) -> None:
+        """
+        Removes every entry from the cache.
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,289 @@
+import bisect
+import os
+import pickle
+import re
+import time
+import pandas as pd
+from typing import Optional, List
+
+from .cache import default_directory
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text) -> list[str]:
+    """
+    Returns the lowercase words of a text, the unit in which a `CatalogIndex` is searched.
+    """
+    return TOKEN.findall(str(text).casefold()) if text else []
+
+
+def discard(postings: dict, word: str, key) -> None:
+    """
+    Removes a key from the postings of a word, and the word once it has no posting left.
+    """
+    keys = postings.get(word)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del postings[word]
+
+
+class CatalogIndex:
+    """
+    Persistent search index over the dataflow catalog: dataflow names, dimension names and the labels of the available values
+    of every dimension, across all dataflows. Once built, searches run in memory without any network call.
+    Values are indexed once per (dimension, code), with the set of dataflows offering them, so a codelist shared by many dataflows
+    (countries, frequencies) is stored once.
+    Usage:
+    >>> index = imf_instance.index_catalog()  # Loads the metadata of every dataflow not indexed yet (or outdated), then saves the index
+    >>> index.search("consumer price")  # Values whose label or code contains these words, with the dataflows offering them
+    >>> index.flows("CPI", COUNTRY="ARG", FREQUENCY="M")  # Dataflows matching "CPI" with monthly data for Argentina
+
+    Parameters:
+    directory (str): Directory holding the index file. Defaults to "$XDG_CACHE_HOME/imf_data_fetcher/catalog" (or "~/.cache/imf_data_fetcher/catalog").
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+
+        if directory is None:
+            directory = default_directory("catalog")
+
+        self.directory = directory
+
+        self.dataflows: dict = {}
+        """
+        Indexed dataflows: dataflow ID -> dictionary of its catalog fields, "Dimensions" (dimension ID -> name) and "IndexedAt".
+        """
+
+        self.codes: dict = {}
+        """
+        Indexed values: (dimension ID, code) -> {"Name": label, "Flows": set of the dataflow IDs offering the value}.
+        """
+
+        self.postings: dict = {}
+        """
+        Inverted index of the values: word -> set of (dimension ID, code) whose label or code contains the word.
+        """
+
+        self.flow_postings: dict = {}
+        """
+        Inverted index of the dataflows: word -> set of the dataflow IDs whose ID, name or dimension names contain the word.
+        """
+
+        self.flow_terms: dict = {}
+        """
+        Entries of each dataflow in the index, so that it is removed without scanning the whole index:
+        dataflow ID -> {"Words": its words in `flow_postings`, "Values": the (dimension ID, code) of its values in `codes`}.
+        """
+
+        self.failures: dict = {}
+        """
+        Dataflows whose metadata failed to load during the last `AsyncIMFInstance.index_catalog` run: dataflow ID -> exception.
+        Not saved with the index.
+        """
+
+        self._vocabulary: Optional[list] = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.load()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, "index.pkl")
+
+    def load(self) -> None:
+        """
+        Reads the index saved in `directory`, if any.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        self.dataflows, self.codes, self.postings, self.flow_postings = state["dataflows"], state["codes"], state["postings"], state["flow_postings"]
+        self.flow_terms = state["flow_terms"] if "flow_terms" in state else self._collect_terms()
+        self._vocabulary = None
+
+    def _collect_terms(self) -> dict:
+        """
+        Rebuilds `flow_terms` from the postings, for an index saved without it.
+        """
+        terms: dict = {dataflow_id: {"Words": set(), "Values": set()} for dataflow_id in self.dataflows}
+        for word, flows in self.flow_postings.items():
+            for dataflow_id in flows:
+                terms[dataflow_id]["Words"].add(word)
+        for key, entry in self.codes.items():
+            for dataflow_id in entry["Flows"]:
+                terms[dataflow_id]["Values"].add(key)
+        return terms
+
+    def save(self) -> None:
+        """
+        Writes the index to `directory`.
+        """
+        state = {"dataflows": self.dataflows, "codes": self.codes, "postings": self.postings, "flow_postings": self.flow_postings, "flow_terms": self.flow_terms}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.dataflows)
+
+    def __contains__(self, dataflow_id: str) -> bool:
+        return dataflow_id in self.dataflows
+
+    def outdated(self, dataflows: pd.DataFrame) -> List[str]:
+        """
+        Returns the IDs of the dataflows of a catalog (see `AsyncIMFInstance.dataflows`) that are not indexed, or indexed at another version.
+        """
+        return [
+            dataflow_id
+            for dataflow_id, version in zip(dataflows["DataflowID"], dataflows["DataflowVersion"])
+            if dataflow_id not in self.dataflows or self.dataflows[dataflow_id].get("DataflowVersion") != version
+        ]
+
+    def add(self, dataflow) -> None:
+        """
+        Indexes (or re-indexes) a dataflow object whose availability is loaded.
+        """
+        if dataflow.available_values_index is None or dataflow.dimensions is None:
+            raise ValueError(f"The availability of dataflow '{dataflow.dataflow_id}' is not loaded.")
+
+        self.remove(dataflow.dataflow_id)
+        dataflow_id = dataflow.dataflow_id
+
+        dimensions = {str(dim): name or str(dim) for dim, name in zip(dataflow.dimensions["ConceptName"], dataflow.dimensions["DimensionName"])}
+        self.dataflows[dataflow_id] = {
+            "DataflowID": dataflow_id,
+            "DataflowName": dataflow.dataflow_name,
+            "DataflowVersion": dataflow.dataflow_version,
+            "DataflowAgencyID": dataflow.dataflow_agency_id,
+            "Dimensions": dimensions,
+            "IndexedAt": time.time(),
+        }
+        terms = self.flow_terms[dataflow_id] = {"Words": set(), "Values": set()}
+        terms["Words"].update(tokenize(dataflow_id), tokenize(dataflow.dataflow_name), *(tokenize(name) for name in dimensions.values()))
+        for word in terms["Words"]:
+            self.flow_postings.setdefault(word, set()).add(dataflow_id)
+
+        for dim, values in dataflow.available_values_index.items():
+            for code, name in values.items():
+                key = (dim, code)
+                entry = self.codes.get(key)
+                if entry is None:
+                    entry = self.codes[key] = {"Name": name, "Flows": set()}
+                    for word in {*tokenize(code), *tokenize(name)}:
+                        self.postings.setdefault(word, set()).add(key)
+                entry["Flows"].add(dataflow_id)
+                terms["Values"].add(key)
+        self._vocabulary = None
+
+    def remove(self, dataflow_id: str) -> None:
+        """
+        Removes a dataflow from the index, and the values no other dataflow offers.
+        Only the postings of the words and values of the dataflow (see `flow_terms`) are updated.
+        """
+        if self.dataflows.pop(dataflow_id, None) is None:
+            return
+        terms = self.flow_terms.pop(dataflow_id)
+
+        for word in terms["Words"]:
+            discard(self.flow_postings, word, dataflow_id)
+        for key in terms["Values"]:
+            entry = self.codes[key]
+            entry["Flows"].discard(dataflow_id)
+            if entry["Flows"]:
+                continue
+            del self.codes[key]
+            for word in {*tokenize(key[1]), *tokenize(entry["Name"])}:
+                discard(self.postings, word, key)
+        self._vocabulary = None
+
+    def _expand(self, word: str, postings: dict) -> set:
+        """
+        Returns the postings of a word, and of every indexed word it is a prefix of.
+        """
+        if self._vocabulary is None:
+            self._vocabulary = sorted({*self.postings, *self.flow_postings})
+        matches = set()
+        for i in range(bisect.bisect_left(self._vocabulary, word), len(self._vocabulary)):
+            if not self._vocabulary[i].startswith(word):
+                break
+            matches |= postings.get(self._vocabulary[i], set())
+        return matches
+
+    def _match(self, text: str, postings: dict) -> Optional[set]:
+        """
+        Returns the keys of `postings` matching every word of a text (the last one as a prefix), or None for an empty text.
+        """
+        words = tokenize(text)
+        if not words:
+            return None
+        matches = None
+        for i, word in enumerate(words):
+            keys = self._expand(word, postings) if i == len(words) - 1 else postings.get(word, set())
+            matches = set(keys) if matches is None else matches & keys
+            if not matches:
+                break
+        return matches
+
+    def search(self, text: str, dimension: Optional[str] = None, dataflows: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Returns the values whose label or code contains every word of `text` (the last word may be incomplete), one row per
+        dataflow offering the value, with the columns "DataflowID", "DimensionID", "Code" and "Name".
+        Rows are ordered by label length, so exact matches come first. `dimension` and `dataflows` restrict the search,
+        and `limit` caps the number of rows.
+        """
+        keys = self._match(text, self.postings) or set()
+        if dimension is not None:
+            keys = {key for key in keys if key[0].upper() == dimension.upper()}
+
+        allowed = set(dataflows) if dataflows is not None else None
+        rows = []
+        for dim, code in sorted(keys, key=lambda key: (len(self.codes[key]["Name"] or ""), key)):
+            entry = self.codes[(dim, code)]
+            for dataflow_id in sorted(entry["Flows"]):
+                if allowed is None or dataflow_id in allowed:
+                    rows.append({"DataflowID": dataflow_id, "DimensionID": dim, "Code": code, "Name": entry["Name"]})
+            if limit is not None and len(rows) >= limit:
+                rows = rows[:limit]
+                break
+        return pd.DataFrame(rows, columns=["DataflowID", "DimensionID", "Code", "Name"])
+
+    def flows(self, text: Optional[str] = None, **codes) -> pd.DataFrame:
+        """
+        Returns the catalog rows of the dataflows offering, for each keyword dimension, one of the given codes
+        (e.g. `COUNTRY="ARG"` or `COUNTRY=["ARG", "BRA"]`, the dimension ID being matched case-insensitively),
+        and matching `text` in their ID, name or dimension names, or in the label or code of one of their values.
+        """
+        matches = set(self.dataflows)
+
+        if text:
+            by_flow = self._match(text, self.flow_postings) or set()
+            by_value = {dataflow_id for key in self._match(text, self.postings) or set() for dataflow_id in self.codes[key]["Flows"]}
+            matches &= by_flow | by_value
+
+        for dimension, values in codes.items():
+            values = [values] if isinstance(values, str) else values
+            offering = set()
+            for flow_id in matches:
+                for dim in self.dataflows[flow_id]["Dimensions"]:
+                    if dim.upper() == dimension.upper() and any(flow_id in self.codes.get((dim, str(value).upper()), {}).get("Flows", ()) for value in values):
+                        offering.add(flow_id)
+            matches = offering
+
+        rows = [{key: value for key, value in self.dataflows[dataflow_id].items() if key != "Dimensions"} for dataflow_id in sorted(matches)]
+        return pd.DataFrame(rows, columns=["DataflowID", "DataflowName", "DataflowVersion", "DataflowAgencyID", "IndexedAt"])
+
+    def clear(self) -> None:
+        """
+        Removes every dataflow from the index and its file.
+        """
+        self.dataflows, self.codes, self.postings, self.flow_postings, self.flow_terms = {}, {}, {}, {}, {}
+        self._vocabulary = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -1,2 +1,10 @@
 BASE = "https://api.imf.org/external/sdmx/3.0"
 HEADERS = {"Accept": "application/json"}
+
+DATA_FORMATS = {
+    "json": "application/json",
+    "csv": "application/vnd.sdmx.data+csv;version=2.0.0",
+}
+"""
+Media types of the representations of data messages, keyed by the `data_format` of data queries.
+"""
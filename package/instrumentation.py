@@ -0,0 +1,359 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+HOOKS: list = []
+"""
+Callbacks receiving every instrumentation event, see `add_hook`. Nothing is measured while the list is empty.
+"""
+
+
+PHASES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "send_request_headers": "send",
+    "send_request_body": "send",
+    "receive_response_headers": "wait",
+    "receive_response_body": "receive",
+}
+"""
+Phases of a request timed from the trace events of the HTTP transport: "connect" (DNS lookup and TCP connection),
+"tls" (TLS handshake), "send" (request), "wait" (time to the response headers, mostly server time) and "receive" (response body).
+"""
+
+
+def add_hook(hook: Callable[[dict], None]) -> Callable[[dict], None]:
+    """
+    Registers a callback receiving every instrumentation event, a dictionary whose "event" key is one of:
+    - "request": an HTTP request, with "method", "url", "status", "bytes" (response body size as transferred), "duration",
+      "phases" (seconds spent in each of `PHASES`, for the phases that happened), "retries" and "error" if it failed,
+    - "retry": a failed attempt of a request about to be retried, with "url", "attempt", "delay" (seconds) and "status" or "error",
+    - "cache": a structure cache lookup, with "url" and "result" ("hit", "miss", "stale" or "revalidated"),
+    - "coalesced": a structure request joining an identical request already in flight, with "url",
+    - "store": a query served from the data store, with "dataflow", "held" and "missing" (numbers of sub-keys),
+    - "stage": a processing stage, with "name", "duration" and "size" (rows, codes or observations produced),
+    - "refresh": a refresh of a query or dataflow metadata by a scheduler, with "name" ("refresh"), "dataflow", "key" (None for
+      metadata), "duration", "age" (seconds since the previous good result) and "error" if it failed,
+    - "served": a result read from a scheduler, with "dataflow", "key", "result" ("fresh", "stale" or "miss") and "age",
+    - "mirror": a unit of a dataflow mirror, with "dataflow", "unit", "key", "status" ("done" or "failed"), and "name" ("mirror"),
+      "bytes" and "duration" or "error".
+    Timed events also have "start", the POSIX time they started at. Hooks run synchronously, on the thread of the event loop for
+    the asynchronous API, so they should return quickly. Returns the hook, so it can be used as a decorator.
+    Usage:
+    >>> add_hook(print)
+    >>> add_hook(LoggingHook())
+    """
+    HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook: Callable[[dict], None]) -> None:
+    """
+    Unregisters a callback registered with `add_hook`.
+    """
+    try:
+        HOOKS.remove(hook)
+    except ValueError:
+        pass
+
+
+@contextmanager
+def instrument(*hooks: Callable[[dict], None]):
+    """
+    Registers callbacks for the duration of a block.
+    Usage:
+    >>> with instrument(recorder := EventRecorder()):
+    >>>     data = imf_instance.Dataflow('CPI').query(query_params)
+    >>> recorder.summary()
+    """
+    for hook in hooks:
+        add_hook(hook)
+    try:
+        yield
+    finally:
+        for hook in hooks:
+            remove_hook(hook)
+
+
+def emit(event: dict) -> None:
+    """
+    Sends an event to every hook. A failing hook is logged and does not interrupt the instrumented code.
+    """
+    for hook in list(HOOKS):
+        try:
+            hook(event)
+        except Exception:
+            logging.getLogger(__name__).exception("Instrumentation hook %r failed", hook)
+
+
+@contextmanager
+def span(name: str, **fields):
+    """
+    Times a block as a "stage" event. The yielded dictionary is the event, so the block can add fields to it (e.g. its "size").
+    """
+    if not HOOKS:
+        yield {}
+        return
+    event = {"event": "stage", "name": name, "start": time.time(), **fields}
+    start = time.perf_counter()
+    try:
+        yield event
+    finally:
+        event["duration"] = time.perf_counter() - start
+        emit(event)
+
+
+def instrumented(name: str, size: Optional[Callable] = None):
+    """
+    Decorator timing each call of a processing function as a "stage" event. `size(result)` gives the "size" of the event.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not HOOKS:
+                return fn(*args, **kwargs)
+            with span(name) as event:
+                result = fn(*args, **kwargs)
+                if size is not None:
+                    event["size"] = size(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class RequestTrace:
+    """
+    Times an HTTP request from the trace events of the HTTP transport and emits it as a "request" event.
+    Created with `RequestTrace.start`, which returns None while no hook is registered.
+    """
+
+    def __init__(self, method: str, url: str, asynchronous: bool = False):
+
+        self.event = {"event": "request", "method": method, "url": url, "start": time.time(), "phases": {}}
+        self._start = time.perf_counter()
+        self._phase_starts: dict = {}
+
+        # The asynchronous transport awaits its trace callback:
+        self.extensions = {"trace": self.atrace if asynchronous else self.trace}
+
+    @classmethod
+    def start(cls, method: str, url: str, asynchronous: bool = False) -> Optional["RequestTrace"]:
+        return cls(method, url, asynchronous) if HOOKS else None
+
+    def trace(self, name: str, info: dict) -> None:
+        # Transport events are named "<scope>.<step>.<started|complete|failed>", e.g. "http11.receive_response_headers.started":
+        step, _, state = name.rpartition(".")
+        phase = PHASES.get(step.rpartition(".")[2])
+        if phase is None:
+            return
+        now = time.perf_counter()
+        if state == "started":
+            self._phase_starts[step] = now
+        elif step in self._phase_starts:
+            phases = self.event["phases"]
+            phases[phase] = phases.get(phase, 0.0) + now - self._phase_starts.pop(step)
+
+    async def atrace(self, name: str, info: dict) -> None:
+        self.trace(name, info)
+
+    def finish(self, response=None, error: Optional[BaseException] = None, **fields) -> None:
+        self.event["duration"] = time.perf_counter() - self._start
+        if response is not None:
+            self.event["status"] = response.status_code
+            self.event["bytes"] = response.num_bytes_downloaded
+        if error is not None:
+            self.event["error"] = repr(error)
+        self.event.update(fields)
+        emit(self.event)
+
+
+class EventRecorder:
+    """
+    Hook keeping every event in memory, e.g. to inspect what a query did.
+    Usage:
+    >>> recorder = add_hook(EventRecorder())
+    >>> data = imf_instance.Dataflow('CPI').query(query_params)
+    >>> recorder.summary()  # {"requests": 3, "bytes": 182934, "request_seconds": 1.2, "cache": {"hit": 2}, "stages": {...}}
+    """
+
+    def __init__(self):
+
+        self.events: list = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self) -> dict:
+        """
+        Returns the number of requests and retries, bytes and seconds spent in requests, the count of each cache result,
+        and the number of calls and seconds spent in each processing stage.
+        """
+        summary = {"requests": 0, "retries": 0, "bytes": 0, "request_seconds": 0.0, "cache": {}, "stages": {}}
+        for event in list(self.events):
+            if event["event"] == "request":
+                summary["requests"] += 1
+                summary["bytes"] += event.get("bytes", 0)
+                summary["request_seconds"] += event["duration"]
+            elif event["event"] == "retry":
+                summary["retries"] += 1
+            elif event["event"] == "cache":
+                summary["cache"][event["result"]] = summary["cache"].get(event["result"], 0) + 1
+            elif event["event"] == "stage":
+                stage = summary["stages"].setdefault(event["name"], {"calls": 0, "seconds": 0.0})
+                stage["calls"] += 1
+                stage["seconds"] += event["duration"]
+        return summary
+
+    def clear(self) -> None:
+        with self._lock:
+            self.events.clear()
+
+
+class LoggingHook:
+    """
+    Hook logging every event as one line.
+    Usage:
+    >>> logging.basicConfig(level=logging.DEBUG)
+    >>> add_hook(LoggingHook())
+
+    Parameters:
+    logger (logging.Logger): Logger to write to. Defaults to the "imf_data_fetcher" logger.
+    level (int): Level of the log records.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG):
+
+        self.logger = logger or logging.getLogger("imf_data_fetcher")
+        self.level = level
+
+    def __call__(self, event: dict) -> None:
+        if not self.logger.isEnabledFor(self.level):
+            return
+        kind = event["event"]
+        if kind == "request":
+            phases = " ".join(f"{phase}={seconds * 1e3:.1f}ms" for phase, seconds in event["phases"].items())
+            outcome = event.get("error") or event.get("status")
+            self.logger.log(self.level, "%s %s -> %s, %d bytes in %.1fms %s", event["method"], event["url"], outcome, event.get("bytes", 0), event["duration"] * 1e3, phases)
+        elif kind == "stage":
+            fields = {k: v for k, v in event.items() if k not in ("event", "name", "start", "duration")}
+            self.logger.log(self.level, "%s: %.1fms %s", event["name"], event["duration"] * 1e3, fields)
+        else:
+            self.logger.log(self.level, "%s %s", kind, {k: v for k, v in event.items() if k != "event"})
+
+
+class SpanHook:
+    """
+    Hook recording timed events ("request" and "stage") as OpenTelemetry-style spans, and the others as events of the current span.
+    Spans are created after the fact with the start and end times of the event.
+    Usage:
+    >>> add_hook(SpanHook())  # Uses the tracer of the globally configured OpenTelemetry tracer provider
+
+    Parameters:
+    tracer: Object with a `start_span(name, start_time=..., attributes=...)` method returning spans with an `end(end_time=...)` method,
+            times being in nanoseconds. Defaults to an OpenTelemetry tracer, which requires the optional `opentelemetry-api` package.
+    """
+
+    def __init__(self, tracer=None):
+
+        if tracer is None:
+            if otel_trace is None:
+                raise ImportError("The default tracer requires the 'opentelemetry-api' package: pip install opentelemetry-api")
+            tracer = otel_trace.get_tracer("imf_data_fetcher")
+
+        self.tracer = tracer
+
+    @staticmethod
+    def attributes(event: dict) -> dict:
+        # Span attributes are flat and primitive:
+        attributes = {}
+        for key, value in event.items():
+            if key in ("event", "start", "duration", "name"):
+                continue
+            if isinstance(value, dict):
+                attributes.update({f"{key}.{k}": v for k, v in value.items()})
+            elif value is not None:
+                attributes[key] = value
+        return attributes
+
+    def __call__(self, event: dict) -> None:
+        if "duration" not in event:
+            if otel_trace is not None:
+                otel_trace.get_current_span().add_event(f"imf.{event['event']}", self.attributes(event))
+            return
+        name = f"HTTP {event['method']}" if event["event"] == "request" else event["name"]
+        start = int(event["start"] * 1e9)
+        span = self.tracer.start_span(name, start_time=start, attributes=self.attributes(event))
+        span.end(end_time=start + int(event["duration"] * 1e9))
+
+
+class PrometheusHook:
+    """
+    Hook updating Prometheus metrics:
+    - imf_requests_total (counter, by status), imf_request_seconds (histogram), imf_response_bytes_total (counter),
+    - imf_retries_total (counter, by status), imf_cache_total (counter, by result), imf_coalesced_requests_total (counter),
+    - imf_stage_seconds (histogram, by stage),
+    - imf_refreshes_total (counter, by result), imf_refresh_seconds (histogram), imf_served_total (counter, by result).
+    Requires the optional `prometheus_client` package.
+    Usage:
+    >>> add_hook(PrometheusHook())
+    >>> prometheus_client.start_http_server(8000)
+
+    Parameters:
+    registry: Prometheus registry the metrics are registered with. Defaults to the global registry.
+    """
+
+    def __init__(self, registry=None):
+
+        if prometheus_client is None:
+            raise ImportError("The Prometheus hook requires the 'prometheus_client' package: pip install prometheus_client")
+
+        registry = registry if registry is not None else prometheus_client.REGISTRY
+        self.requests = prometheus_client.Counter("imf_requests", "HTTP requests to the IMF API.", ["status"], registry=registry)
+        self.request_seconds = prometheus_client.Histogram("imf_request_seconds", "Duration of HTTP requests to the IMF API.", registry=registry)
+        self.response_bytes = prometheus_client.Counter("imf_response_bytes", "Bytes received from the IMF API.", registry=registry)
+        self.retries = prometheus_client.Counter("imf_retries", "Retried attempts of HTTP requests to the IMF API.", ["status"], registry=registry)
+        self.cache = prometheus_client.Counter("imf_cache", "Structure cache lookups.", ["result"], registry=registry)
+        self.coalesced = prometheus_client.Counter("imf_coalesced_requests", "Structure requests joining an identical request in flight.", registry=registry)
+        self.stage_seconds = prometheus_client.Histogram("imf_stage_seconds", "Duration of processing stages.", ["stage"], registry=registry)
+        self.refreshes = prometheus_client.Counter("imf_refreshes", "Refreshes of scheduled queries and metadata.", ["result"], registry=registry)
+        self.refresh_seconds = prometheus_client.Histogram("imf_refresh_seconds", "Duration of refreshes of scheduled queries and metadata.", registry=registry)
+        self.served = prometheus_client.Counter("imf_served", "Results read from refresh schedulers.", ["result"], registry=registry)
+
+    def __call__(self, event: dict) -> None:
+        kind = event["event"]
+        if kind == "request":
+            self.requests.labels(status=str(event.get("status", "error"))).inc()
+            self.request_seconds.observe(event["duration"])
+            self.response_bytes.inc(event.get("bytes", 0))
+        elif kind == "retry":
+            self.retries.labels(status=str(event.get("status", "error"))).inc()
+        elif kind == "cache":
+            self.cache.labels(result=event["result"]).inc()
+        elif kind == "coalesced":
+            self.coalesced.inc()
+        elif kind == "stage":
+            self.stage_seconds.labels(stage=event["name"]).observe(event["duration"])
+        elif kind == "refresh":
+            self.refreshes.labels(result="error" if "error" in event else "ok").inc()
+            self.refresh_seconds.observe(event["duration"])
+        elif kind == "served":
+            self.served.labels(result=event["result"]).inc()
@@ -1,6 +1,37 @@
 from .utils import *
 from .queries import *
+from .planner import *
+from .aio import AsyncIMFInstance, METADATA_STAGES
+from .cache import DataCache
+from .store import DataStore
+from .retry import DEFAULT_RETRY, RetryPolicy
+from .parsing import ParsePool
+from .catalog import CatalogIndex
+from .scheduler import RefreshScheduler
+from .mirror import DataflowMirror
 from typing import Optional, List
+import threading
+
+
+class LazyMetadata:
+    """
+    Attribute of a synchronous dataflow object that is loaded with its metadata stage on first access.
+    Once loaded, the value is copied from the wrapped asynchronous object to the instance and shadows the descriptor,
+    so later accesses are plain attribute reads.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        obj._load(self.stage)
+        value = obj.__dict__[self.name] = getattr(obj.aio, self.name)
+        return value
 
 
 class IMFInstance:
@@ -18,241 +49,334 @@ class IMFInstance:
     >>> result = dataflow.query(query_params)  # Queries the dataflow with specified parameters
     >>> print(result)  # Prints the queried data as a DataFrame/ a dictionary of DataFrames
 
+    The instance is a blocking wrapper around `AsyncIMFInstance`, whose coroutines run on an event loop owned by the instance.
+    It owns the HTTP connection pool used by all its dataflow objects and queries. Use it as a context manager
+    (or call `close()`) to release it:
+    >>> with IMFInstance(max_connections=50, timeout=60.0) as imf_instance:
+    >>>     data = imf_instance.Dataflow('CPI').query(query_params)
+
+    Parameters:
+    cache (StructureCache): Optional persistent cache for the dataflow catalog and the structure metadata of each dataflow.
+    With a warm cache, creating the instance and its dataflow objects makes no network call.
+    data_cache (DataCache): Optional persistent store of query results, required by incremental queries.
+    store (DataStore): Optional local columnar store that queries are served from and written to.
+    http2 (bool): Whether to negotiate HTTP/2 (requires the `h2` package).
+    timeout (float): Timeout of each request, in seconds.
+    max_connections (int): Maximum number of open connections in the pool.
+    max_keepalive_connections (int): Maximum number of idle connections kept alive in the pool.
+    keepalive_expiry (float): Number of seconds an idle connection is kept alive.
+    proxy (str): Optional proxy URL.
+    retry (RetryPolicy): Retries of throttled, unavailable and failed requests. None disables them.
+    adaptive_concurrency (bool): Whether the number of requests in flight adapts to the server's pushback, between 1 and `max_connections`.
+    parse_pool (ParsePool): Optional pool of workers parsing the data responses, so that concurrent responses are parsed on several cores.
+    compact (bool): Whether dataflow objects keep their metadata in compact form (shared code tables, array-backed available values),
+    see `AsyncIMFInstance`.
+    async_client (httpx.AsyncClient): Optional preconfigured client, used instead of building one from the settings above.
+
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[StructureCache] = None,
+        http2: bool = True,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        proxy: Optional[str] = None,
+        async_client: Optional[httpx.AsyncClient] = None,
+        data_cache: Optional[DataCache] = None,
+        store: Optional[DataStore] = None,
+        retry: Optional[RetryPolicy] = DEFAULT_RETRY,
+        adaptive_concurrency: bool = True,
+        parse_pool: Optional[ParsePool] = None,
+        compact: bool = False,
+    ):
+
+        self.aio = AsyncIMFInstance(cache, http2, timeout, max_connections, max_keepalive_connections, keepalive_expiry, proxy, client=async_client, data_cache=data_cache, store=store, retry=retry, adaptive_concurrency=adaptive_concurrency, parse_pool=parse_pool, compact=compact)
+        """
+        Asynchronous instance wrapped by this one. Its methods can be awaited on the caller's own event loop.
+        """
+
+        # The asynchronous client is bound to one event loop, run forever in a background thread. Blocking calls submit
+        # their coroutines to it, which also works from a thread whose own loop is already running (e.g. a notebook):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+        try:
+            self.run(self.aio.open())
+        except BaseException:
+            # The caller gets no instance to close, so the client and the event loop are released here:
+            self.close()
+            raise
 
-        self.dataflows: pd.DataFrame = get_all_dataflows()
+        self.cache = self.aio.cache
         """
-        DataFrame containing all dataflows available in the IMF Data API.
-        Each row corresponds to a dataflow with its properties such as ID, name, version, and agency ID.
+        Persistent structure cache shared by the instance and its dataflow objects, if any.
         """
 
-        self.dataflows_ids: list[str] = self.dataflows["DataflowID"].tolist()
+        self.data_cache = self.aio.data_cache
         """
-        List of dataflow IDs available in the IMF Data API.
-        This is used to quickly check if a dataflow with a given ID exists.
+        Persistent store of query results used by incremental queries, if any.
         """
 
-    def dataflow_dictionary(self, dataflow_id: str) -> dict:
+        self.store = self.aio.store
         """
-        Returns a dictionary of the dataflow with the given ID.
+        Local columnar store that queries are served from and written to, if any.
         """
-        ids = self.dataflows_ids
-        dicts = self.dataflows.to_dict(orient="records")
 
-        if dataflow_id not in ids:
-            raise ValueError(f"Dataflow ID '{dataflow_id}' not found. Available IDs: {ids}")
+        self.async_client: httpx.AsyncClient = self.aio.client
+        """
+        HTTP client shared by the catalog, structure and data queries of the instance.
+        """
 
-        for dictionary in dicts:
-            if dictionary["DataflowID"] == dataflow_id:
-                return dictionary
+        self.concurrency = self.aio.concurrency
+        """
+        Adaptive limit on the number of requests in flight on the client, if any.
+        """
 
-        raise ValueError(f"Dataflow ID '{dataflow_id}' not found in dataflow dictionaries.")
+        self.parse_pool = self.aio.parse_pool
+        """
+        Pool of workers parsing the data responses, if any.
+        """
 
-    def Dataflow(self, dataflow_id: str) -> "IMFInstance.DataflowObject":
+        self.dataflows: pd.DataFrame = self.aio.dataflows  # type: ignore
+        """
+        DataFrame containing all dataflows available in the IMF Data API.
+        Each row corresponds to a dataflow with its properties such as ID, name, version, and agency ID.
         """
-        Returns an instance of the DataflowObject for the specified dataflow ID.
-        This object provides methods to query the dataflow and access its dimensions and available values.
 
-         Parameters:
-        dataflow_id (str): The ID of the dataflow to be accessed.
+        self.dataflows_ids: list[str] = self.aio.dataflows_ids  # type: ignore
+        """
+        List of dataflow IDs available in the IMF Data API.
+        This is used to quickly check if a dataflow with a given ID exists.
+        """
 
+        self.dataflows_index: dict = self.aio.dataflows_index  # type: ignore
+        """
+        Dictionary mapping each dataflow ID to the dictionary of its catalog row.
         """
-        return IMFInstance.DataflowObject(self, dataflow_id)
 
-    class DataflowObject:
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the event loop of the instance, to which the asynchronous client is bound, and waits for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
 
-        instance: Optional["IMFInstance"]
+    def close(self) -> None:
+        """
+        Closes the HTTP client owned by the instance and stops its event loop.
+        """
+        self.run(self.aio.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
 
-        dataflow_id: str
-        dataflow_dictionary: Optional[dict]
-        dataflow_name: Optional[str]
-        dataflow_version: Optional[str]
-        dataflow_agency_id: Optional[str]
+    def __enter__(self) -> "IMFInstance":
+        return self
 
-        structure_id: Optional[str]
-        structure_version: Optional[str]
-        structure_agency_id: Optional[str]
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
-        queries_response: Optional[dict]
+    def dataflow_dictionary(self, dataflow_id: str) -> dict:
+        """
+        Returns a dictionary of the dataflow with the given ID.
+        """
+        return self.aio.dataflow_dictionary(dataflow_id)
 
-        dimensions: Optional[pd.DataFrame]
-        dimensions_codelists: Optional[dict]
-        dimensions_available_values: Optional[pd.DataFrame]
-        _dimensions_available_values: Optional[dict]
-        dimensions_ordered: Optional[List[str]]
+    def fetch_many(self, requests: List[tuple], max_concurrency: int = 8, data_format: str = "json") -> dict:
+        """
+        Queries several dataflows concurrently.
+        Takes a list of (dataflow_id, query_params) tuples and returns a dictionary keyed by (dataflow_id, SDMX key).
+        Each value is the queried data, or the exception raised for that request, so one bad request does not abort the batch.
+        Requests that cannot be resolved to a key (unknown dataflow, invalid parameters) are keyed by (dataflow_id, position in `requests`).
+        Requests building the same key (e.g. "usa" and ["USA"]) are sent once and share one entry.
 
-        query_params_dict_template: Optional[dict]
+         Parameters:
+        requests (list): List of (dataflow_id, query_params) tuples.
+        max_concurrency (int): Maximum number of requests in flight.
+        data_format (str): Representation requested from the API, "json" (SDMX-JSON) or "csv" (SDMX-CSV).
 
-        def __init__(self, parent: "IMFInstance", dataflow_id: str):
+        """
+        return self.run(self.aio.fetch_many(requests, max_concurrency=max_concurrency, data_format=data_format))
 
-            self.instance = parent
+    def scheduler(self, max_concurrency: int = 4, retry_after: float = 60.0) -> RefreshScheduler:
+        """
+        Returns a scheduler keeping registered queries and dataflow metadata warm in the background, and serving their last
+        good result while revalidating it. See `AsyncIMFInstance.scheduler`.
+        """
+        return RefreshScheduler(self, max_concurrency, retry_after)
+
+    def mirror(
+        self,
+        dataflow_id: str,
+        directory: Optional[str] = None,
+        max_series: int = MAX_SERIES_PER_REQUEST,
+        max_key_length: int = MAX_KEY_LENGTH,
+        max_concurrency: int = 8,
+        data_format: str = "csv",
+        restart: bool = False,
+        **filters,
+    ) -> DataflowMirror:
+        """
+        Mirrors all the data of a dataflow to a directory, resuming an interrupted mirror, and returns the mirror. See `AsyncIMFInstance.mirror`.
+        """
+        return self.run(self.aio.mirror(dataflow_id, directory, max_series, max_key_length, max_concurrency, data_format, restart, **filters))
 
-            self.dataflow_id = dataflow_id
+    def index_catalog(self, index: Optional[CatalogIndex] = None, dataflow_ids: Optional[List[str]] = None, refresh: bool = False, max_concurrency: int = 8) -> CatalogIndex:
+        """
+        Adds dataflows to a search index of the catalog, saves it and returns it. See `AsyncIMFInstance.index_catalog`.
+        """
+        return self.run(self.aio.index_catalog(index, dataflow_ids=dataflow_ids, refresh=refresh, max_concurrency=max_concurrency))
 
-            """
-            ID of the dataflow.
-            """
+    def Dataflow(self, dataflow_id: str, lazy: bool = False) -> "IMFInstance.DataflowObject":
+        """
+        Returns an instance of the DataflowObject for the specified dataflow ID.
+        This object provides methods to query the dataflow and access its dimensions and available values.
 
-            self.dataflow_dictionary = parent.dataflow_dictionary(dataflow_id)
-            """
-            Dictionary containing the dataflow information.
-            """
+         Parameters:
+        dataflow_id (str): The ID of the dataflow to be accessed.
+        lazy (bool): If True, the object is built from the catalog row alone. Dimensions, codelists and available values
+        are each fetched on first access (or in the background with `prefetch()`).
 
-            self.dataflow_name = self.dataflow_dictionary.get("DataflowName")
-            """
-            Name of the dataflow.
-            """
+        """
+        return IMFInstance.DataflowObject(self, dataflow_id, lazy=lazy)
 
-            self.dataflow_version = self.dataflow_dictionary.get("DataflowVersion")
-            """
-            Version of the dataflow. Always corresponds to the latest version.
-            """
+    class DataflowObject:
+        """
+        Synchronous wrapper around `AsyncIMFInstance.DataflowObject`. Attributes not defined here are read from the wrapped object.
+        """
 
-            self.dataflow_agency_id = self.dataflow_dictionary.get("DataflowAgencyID")
-            """
-            Agency ID of the dataflow.
-            """
+        instance: "IMFInstance"
 
-            self.structure_id = self.dataflow_dictionary.get("StructureID")
-            """
-            ID of the datastructure associated with the dataflow.
-            """
+        dimensions: Optional[pd.DataFrame] = LazyMetadata("dimensions")  # type: ignore
+        dimensions_codelists: Optional[dict] = LazyMetadata("codelists")  # type: ignore
+        dimensions_available_values: Optional[pd.DataFrame] = LazyMetadata("availability")  # type: ignore
+        _dimensions_available_values: Optional[dict] = LazyMetadata("availability")  # type: ignore
+        available_values_index: Optional[dict] = LazyMetadata("availability")  # type: ignore
+        available_time_range: Optional[tuple] = LazyMetadata("availability")  # type: ignore
+        dimensions_ordered: Optional[List[str]] = LazyMetadata("dimensions")  # type: ignore
 
-            self.structure_version = self.dataflow_dictionary.get("StructureVersion")
-            """
-            Version of the datastructure associated with the dataflow. Always corresponds to the latest version.
-            """
+        query_params_dict_template: Optional[dict] = LazyMetadata("dimensions")  # type: ignore
 
-            self.structure_agency_id = self.dataflow_dictionary.get("StructureAgencyID")
-            """
-            Agency ID of the datastructure associated with the dataflow.
-            """
+        format_result = staticmethod(AsyncIMFInstance.DataflowObject.format_result)
 
-            self.queries_response = asyncio.run(queries(self.dataflow_dictionary))
+        def __init__(self, parent: "IMFInstance", dataflow_id: str, lazy: bool = False):
 
-            self.dimensions = process_dataflow_dimensions(self.queries_response)
-            """
-            DataFrame containing the dimensions (query parameters) of the dataflow.
-            Each row corresponds to a dimension with its properties.
-            """
+            self.instance = parent
 
-            self.dimensions_codelists = process_codelists(self.queries_response, self.dimensions)
+            self.aio = AsyncIMFInstance.DataflowObject(parent.aio, dataflow_id)
             """
-            Dictionary containing the codelists for each dimension.
-            The keys are dimension concept IDs, and the values are lists of dictionaries with "ID" and "Name".
+            Asynchronous dataflow object wrapped by this one.
             """
 
-            self.dimensions_available_values, self._dimensions_available_values = process_availability(self.queries_response, self.dimensions_codelists)
-            """
-            DataFrame containing the available values for each dimension in the dataflow.
-            Each row corresponds to a dimension value with its properties.
-            The DataFrame has columns "DimensionID", "Value", and "Name".
-            "_dimensions_available_values" is a dictionary mapping dimension names to their available values.
-            """
+            if not lazy:
+                self._load(METADATA_STAGES[-1])
+
+        def __getattr__(self, name: str):
+            if name == "aio":
+                raise AttributeError(name)
+            return getattr(self.aio, name)
 
-            self.dimensions_ordered = self.dimensions.sort_values(by="ConceptPosition")["ConceptName"].to_list()
+        def _load(self, stage: str) -> None:
             """
-            List of dimension names in the order they appear in the dataflow.
-            This is used to ensure that query parameters are provided in the correct order when querying the dataflow.
+            Fetches and processes a metadata stage ("dimensions", "codelists" or "availability") and the stages it depends on, once.
             """
+            if not self.aio.is_loaded(stage):
+                self.instance.run(self.aio.load(stage))
 
-            self.query_params_dict_template = {dimension: "*" for dimension in self.dimensions_ordered}
+        def prefetch(self) -> threading.Thread:
             """
-            Dictionary template for query parameters.
-            The keys are dimension names, and the values are "Value", indicating that these are the expected parameters for querying the dataflow.
+            Loads all the metadata of a lazy dataflow object in a background thread and returns the thread.
+            Accessing an attribute that is still loading waits for it.
             """
+            thread = threading.Thread(target=self._load, args=(METADATA_STAGES[-1],), daemon=True)
+            thread.start()
+            return thread
 
         def dimension_codelist(self, dimension_concept_id: Optional[str] = None):
             """
             Returns a dictionary of codelist for specified dimension.
             """
-            if self.dimensions_codelists is None:
-                raise ValueError("No codelists available for this dataflow.")
-            try:
-                return self.dimensions_codelists[dimension_concept_id]
-            except KeyError:
-                raise ValueError(f"Dimension ID '{dimension_concept_id}' not found. Available IDs: {list(self.dimensions_codelists.keys())}")
+            self._load("codelists")
+            return self.aio.dimension_codelist(dimension_concept_id)
 
         def dimension_available_values(self, dimension_concept_name: Optional[str] = None):
             """
             Returns a dictionary of available values for specified dimension.
             """
-            if self._dimensions_available_values is None:
-                raise ValueError("No available values for dimensions. The dataflow may not be initialized properly.")
-            try:
-                if dimension_concept_name is None:
-                    raise ValueError("dimension_concept_name cannot be None.")
-                dimension_concept_name = dimension_concept_name.upper()
-                return self._dimensions_available_values[dimension_concept_name]
-            except KeyError:
-                raise ValueError(f"Dimension ID '{dimension_concept_name}' not found. Available IDs: {list(self._dimensions_available_values.keys())}")
-
-        def query(self, query_params: dict) -> pd.DataFrame:
-            """
-            Queries the dataflow with the provided query parameters.
-            The query parameters must match the template defined in `query_params_dict_template`.
-            The keys of the query parameters must match the dimension names in the dataflow.
-            The values can be a single value or a list of values for each dimension.
-            If a value is not provided for a dimension, it defaults to "*", which means all values for that dimension.
-            The method returns a DataFrame or a dict of DataFrames containing the queried data if the query is successful.
-            If the query fails, it raises an exception with a descriptive error message.
-            """
-
-            if not isinstance(query_params, dict):
-                raise TypeError(f"Query parameters must be a dict matching {list(self.query_params_dict_template.keys())}")
-
-            if self.query_params_dict_template is None:
-                raise ValueError("Query parameter template is not initialized. Please check the dataflow initialization.")
-            template_keys = list(self.query_params_dict_template.keys())
-            provided_keys = list(query_params.keys())
-            if set(provided_keys) != set(template_keys):
-                missing = set(template_keys) - set(provided_keys)
-                extra = set(provided_keys) - set(template_keys)
-                msgs = []
-                if missing:
-                    msgs.append(f"missing {missing}")
-                if extra:
-                    msgs.append(f"unexpected {extra}")
-                raise ValueError(f"Expected keys {template_keys}, but got {provided_keys} ({'; '.join(msgs)})")
-
-            formatted = []
-            for key in template_keys:
-                val = query_params.get(key, "*")
-                if val is None or val == "*":
-                    formatted.append("*")
-                elif isinstance(val, list):
-                    formatted.append("+".join(str(v).upper() for v in val))
-                else:
-                    formatted.append(str(val).upper())
-
-            if self.dimensions_available_values is None:
-                raise ValueError("No available values for dimensions. The dataflow may not be initialized properly.")
-
-            available = self.dimensions_available_values.groupby("DimensionID")["Value"].apply(list).to_dict()
-
-            value_names = []
-            for dim_key, token in zip(template_keys, formatted):
-                if token == "*":
-                    continue
-                for part in token.split("+"):
-                    if part not in available.get(dim_key, []):
-                        raise ValueError(f"Value '{part}' for dimension '{dim_key}' not in available values")
-                    value_row = self.dimensions_available_values.loc[self.dimensions_available_values["Value"] == part, "Name"]
-                    value_name = value_row.values[0] if not value_row.empty else str(part)  # type: ignore
-                    if value_name is None:
-                        value_name = str(part)
-                    value_names.append(value_name)
-
-            key = ".".join(formatted)
-            key_name = ", ".join(value_names)
-            print(f"Querying: {key_name}")
-            data = process_queried_data(query_data(self.dataflow_agency_id, self.dataflow_id, key))
-
-            if len(data.keys()) == 1:
-                data = data[list(data.keys())[0]]
-                data.name = key_name
-                return data
-
-            return data  # type: ignore
+            self._load("availability")
+            return self.aio.dimension_available_values(dimension_concept_name)
+
+        def query(
+            self,
+            query_params,
+            validate: bool = True,
+            stream: bool = False,
+            max_series: Optional[int] = MAX_SERIES_PER_REQUEST,
+            max_key_length: int = MAX_KEY_LENGTH,
+            max_concurrency: int = 8,
+            incremental: bool = False,
+            delta: str = "updatedAfter",
+            use_store: bool = True,
+            output: str = "pivot",
+            data_format: str = "json",
+            value_dtype: str = "float64",
+            start_period=None,
+            end_period=None,
+            first_n_observations: Optional[int] = None,
+            last_n_observations: Optional[int] = None,
+            attributes=None,
+            measures=None,
+            detail: Optional[str] = None,
+        ):
+            """
+            Queries the dataflow with the provided query parameters. See `AsyncIMFInstance.DataflowObject.query`.
+            """
+            return self.instance.run(
+                self.aio.query(
+                    query_params,
+                    validate=validate,
+                    stream=stream,
+                    max_series=max_series,
+                    max_key_length=max_key_length,
+                    max_concurrency=max_concurrency,
+                    incremental=incremental,
+                    delta=delta,
+                    use_store=use_store,
+                    output=output,
+                    data_format=data_format,
+                    value_dtype=value_dtype,
+                    start_period=start_period,
+                    end_period=end_period,
+                    first_n_observations=first_n_observations,
+                    last_n_observations=last_n_observations,
+                    attributes=attributes,
+                    measures=measures,
+                    detail=detail,
+                )
+            )
+
+        def available_codes(self) -> dict:
+            """
+            Returns a dictionary mapping each dimension to the list of its available values.
+            """
+            self._load("availability")
+            return self.aio.available_codes()
+
+        def query_key(self, query_params, validate: bool = True) -> tuple[str, str]:
+            """
+            Validates query parameters against the template and the available values of the dataflow.
+            Returns the SDMX key (e.g. "USA+CAN.CPI.*") and a readable name built from the names of the selected values.
+            """
+            stage = self.aio.required_stage(query_params, validate)
+            if stage is not None:
+                self._load(stage)
+            return self.aio.query_key(query_params, validate=validate)
+
+        def query_many(self, query_params_list: List[dict], max_concurrency: int = 8, output: str = "pivot", data_format: str = "json", value_dtype: str = "float64") -> dict:
+            """
+            Queries the dataflow for several sets of query parameters concurrently. See `AsyncIMFInstance.DataflowObject.query_many`.
+            """
+            return self.instance.run(self.aio.query_many(query_params_list, max_concurrency=max_concurrency, output=output, data_format=data_format, value_dtype=value_dtype))
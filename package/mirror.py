@@ -0,0 +1,299 @@
+"""
+Resumable bulk mirror of a dataflow.
+Usage:
+>>> python -m imf_data_fetcher.mirror CPI --directory ./cpi --max-series 5000 --max-concurrency 8
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+import httpx
+import pandas as pd
+from typing import List, Optional
+
+from .consts import BASE
+from .cache import default_directory
+from .instrumentation import emit
+from .parsing import parse_message
+from .planner import MAX_KEY_LENGTH, MAX_SERIES_PER_REQUEST, combine_results, estimate_series, plan_query
+from .queries import astream, data_headers
+from .utils import empty_output, process_queried_data
+
+FILE_EXTENSIONS = {"json": "json", "csv": "csv"}
+"""
+Extension of the unit files of each of the `DATA_FORMATS`.
+"""
+
+
+class DataflowMirror:
+    """
+    Local copy of all the data of a dataflow, fetched as bounded work units that can be resumed after an interruption.
+    The availability cube is partitioned into sub-keys of at most `max_series` estimated series (see `plan_query`), which are
+    fetched concurrently. Each response body is streamed to its own file as it arrives, so memory does not grow with the unit size.
+    The plan is saved in "manifest.json" before the first request, and each finished unit is appended to "progress.jsonl".
+    Running the mirror again skips the units that are done and retries the failed and pending ones.
+    Usage:
+    >>> mirror = imf_instance.mirror('CPI', directory='./cpi', max_series=5000)  # Plans, then fetches every unit not done yet
+    >>> mirror.status()  # One row per unit: key, status, bytes and error
+    >>> data = mirror.read(output="long")  # Parses the unit files into a single result
+
+    Parameters:
+    directory (str): Directory holding the manifest, the progress journal and the unit files.
+    """
+
+    def __init__(self, directory: str):
+
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.manifest: Optional[dict] = self._read_manifest()
+        """
+        Plan of the mirror: dataflow, data format, query parameters and the SDMX key of each unit. None before `plan()`.
+        """
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, "manifest.json")
+
+    @property
+    def progress_path(self) -> str:
+        return os.path.join(self.directory, "progress.jsonl")
+
+    def unit_path(self, unit: int) -> str:
+        return os.path.join(self.directory, f"unit-{unit:06d}.{FILE_EXTENSIONS[self.manifest['data_format']]}")  # type: ignore
+
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def plan(self, dataflow, max_series: int = MAX_SERIES_PER_REQUEST, max_key_length: int = MAX_KEY_LENGTH, data_format: str = "csv", params: Optional[dict] = None, restart: bool = False) -> dict:
+        """
+        Partitions the availability cube of a dataflow object (with its availability loaded) into units and saves the plan.
+        An existing plan is kept, so that an interrupted mirror resumes with the same units, unless `restart` is set (which
+        also deletes the fetched units). A plan made for another dataflow, version, data format or parameters raises a ValueError.
+        """
+        data_headers(data_format)
+        settings = {
+            "dataflow_id": dataflow.dataflow_id,
+            "agency_id": dataflow.dataflow_agency_id,
+            "version": dataflow.dataflow_version,
+            "data_format": data_format,
+            "params": params or {},
+        }
+        if restart:
+            self.clear()
+        if self.manifest is not None:
+            changed = [name for name, value in settings.items() if self.manifest.get(name) != value]
+            if changed:
+                raise ValueError(f"The mirror in {self.directory} was planned with other {', '.join(changed)}. Pass `restart=True` to start it over.")
+            return self.manifest
+
+        available = dataflow.available_codes()
+        tokens = ["*"] * len(dataflow.dimensions_ordered)
+        keys = plan_query(tokens, dataflow.dimensions_ordered, available, max_series, max_key_length)
+        manifest = {
+            **settings,
+            "max_series": max_series,
+            "planned_at": time.time(),
+            "units": [{"key": ".".join(key), "series": estimate_series(key, dataflow.dimensions_ordered, available)} for key in keys],
+        }
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self.manifest = manifest
+        return manifest
+
+    def progress(self) -> dict:
+        """
+        Returns the last record of each unit in the progress journal: unit index -> {"status": "done" or "failed", ...}.
+        """
+        records: dict = {}
+        try:
+            with open(self.progress_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Line cut short by an interruption
+                    records[record["unit"]] = record
+        except OSError:
+            pass
+        return records
+
+    def pending(self) -> List[int]:
+        """
+        Returns the indices of the units that are not done (never fetched, interrupted or failed).
+        """
+        if self.manifest is None:
+            return []
+        progress = self.progress()
+        return [unit for unit in range(len(self.manifest["units"])) if progress.get(unit, {}).get("status") != "done"]
+
+    def _record(self, record: dict) -> None:
+        # One line per finished unit: appending is atomic enough for a checkpoint, and costs the same for the last unit as for the first:
+        with open(self.progress_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    async def _fetch_unit(self, client: httpx.AsyncClient, unit: int) -> dict:
+        """
+        Streams the response of a unit to its file, then records it as done. A unit without data (404) is done with no file.
+        """
+        manifest = self.manifest
+        key = manifest["units"][unit]["key"]  # type: ignore
+        url = f"{BASE}/data/dataflow/{manifest['agency_id']}/{manifest['dataflow_id']}/+/{key}"  # type: ignore
+        path = self.unit_path(unit)
+        start = time.time()
+
+        async with astream(client, url, params=manifest["params"] or None, headers=data_headers(manifest["data_format"])) as response:  # type: ignore
+            if response.status_code == 404:
+                await response.aread()
+                size, file = 0, None
+            elif response.status_code != 200:
+                await response.aread()
+                raise httpx.HTTPStatusError(f"GET {url} – {response.status_code}", request=response.request, response=response)
+            else:
+                size, file = 0, os.path.basename(path)
+                with open(f"{path}.tmp", "wb") as f:
+                    async for chunk in response.aiter_bytes():
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(f"{path}.tmp", path)
+
+        record = {"unit": unit, "status": "done", "key": key, "file": file, "bytes": size, "fetched_at": time.time(), "duration": time.time() - start}
+        self._record(record)
+        return record
+
+    async def run(self, client: httpx.AsyncClient, max_concurrency: int = 8) -> dict:
+        """
+        Fetches the pending units, at most `max_concurrency` at once, and returns the number of units "fetched" by this run
+        (done or failed), and the number of units "done", "failed" and "total" of the mirror.
+        A failed unit is recorded and left for the next run, without stopping the others.
+        """
+        if self.manifest is None:
+            raise ValueError(f"The mirror in {self.directory} has no plan. Call `plan()` first.")
+
+        pending = self.pending()
+        total = len(self.manifest["units"])
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(unit):
+            async with semaphore:
+                try:
+                    record = await self._fetch_unit(client, unit)
+                except Exception as e:
+                    record = {"unit": unit, "status": "failed", "key": self.manifest["units"][unit]["key"], "error": repr(e), "fetched_at": time.time()}  # type: ignore
+                    self._record(record)
+            event = {"event": "mirror", "dataflow": self.manifest["dataflow_id"], **{k: v for k, v in record.items() if k != "fetched_at"}}  # type: ignore
+            if "duration" in record:
+                event.update(name="mirror", start=record["fetched_at"] - record["duration"])
+            emit(event)
+            return record
+
+        records = await asyncio.gather(*(fetch(unit) for unit in pending))
+        failed = sum(record["status"] == "failed" for record in records)
+        return {"fetched": len(records), "done": total - len(pending) + len(records) - failed, "failed": failed, "total": total}
+
+    def status(self) -> pd.DataFrame:
+        """
+        Returns one row per unit, with the columns "Unit", "Key", "Series" (estimated), "Status" ("done", "failed" or "pending"),
+        "Bytes", "FetchedAt" and "Error".
+        """
+        progress = self.progress()
+        rows = [
+            {
+                "Unit": unit,
+                "Key": spec["key"],
+                "Series": spec["series"],
+                "Status": progress.get(unit, {}).get("status", "pending"),
+                "Bytes": progress.get(unit, {}).get("bytes"),
+                "FetchedAt": pd.Timestamp(progress[unit]["fetched_at"], unit="s") if unit in progress else pd.NaT,
+                "Error": progress.get(unit, {}).get("error"),
+            }
+            for unit, spec in enumerate((self.manifest or {}).get("units", []))
+        ]
+        return pd.DataFrame(rows, columns=["Unit", "Key", "Series", "Status", "Bytes", "FetchedAt", "Error"])
+
+    def paths(self) -> List[str]:
+        """
+        Returns the paths of the files of the units that are done, in unit order.
+        """
+        progress = self.progress()
+        return [os.path.join(self.directory, record["file"]) for _, record in sorted(progress.items()) if record["status"] == "done" and record["file"]]
+
+    def read(self, output: str = "long", value_dtype: str = "float64"):
+        """
+        Parses the unit files that are done into a single result in one of the `OUTPUT_FORMATS`.
+        """
+        if self.manifest is None:
+            return empty_output(output)
+        parse = functools.partial(process_queried_data, output=output, value_dtype=value_dtype)
+        results = []
+        for path in self.paths():
+            with open(path, "rb") as f:
+                results.append(parse_message(f.read(), self.manifest["data_format"], parse))
+        return combine_results(results, output) if results else empty_output(output)
+
+    def clear(self) -> None:
+        """
+        Deletes the plan, the progress journal and the unit files. Other files of the directory are left untouched.
+        """
+        paths = [self.manifest_path, self.progress_path]
+        if self.manifest is not None:
+            paths += [self.unit_path(unit) for unit in range(len(self.manifest["units"]))]
+        paths += self.paths()
+        # Files left by an interrupted write:
+        paths += [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".tmp") and name.startswith(("manifest.json.", "unit-"))]
+        for path in set(paths):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.manifest = None
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Mirrors all the data of a dataflow to a directory, resuming an interrupted mirror.")
+    parser.add_argument("dataflow_id")
+    parser.add_argument("--directory", help="Directory of the mirror. Defaults to the 'mirror/<dataflow>' directory of the cache")
+    parser.add_argument("--max-series", type=int, default=MAX_SERIES_PER_REQUEST, help="Maximum number of estimated series per unit")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Maximum number of units fetched at once")
+    parser.add_argument("--data-format", choices=list(FILE_EXTENSIONS), default="csv")
+    parser.add_argument("--start-period", help="First period mirrored (e.g. 2015, 2015-Q1)")
+    parser.add_argument("--end-period", help="Last period mirrored")
+    parser.add_argument("--restart", action="store_true", help="Deletes the mirror and starts it over")
+    parser.add_argument("--status", action="store_true", help="Prints the progress of the mirror without fetching")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        mirror = DataflowMirror(args.directory or default_directory("mirror", args.dataflow_id))
+        print(mirror.status()["Status"].value_counts().to_string())
+        return
+
+    from .main import IMFInstance
+
+    with IMFInstance() as imf_instance:
+        mirror = imf_instance.mirror(
+            args.dataflow_id,
+            directory=args.directory,
+            max_series=args.max_series,
+            max_concurrency=args.max_concurrency,
+            data_format=args.data_format,
+            restart=args.restart,
+            start_period=args.start_period,
+            end_period=args.end_period,
+        )
+    counts = mirror.status()["Status"].value_counts()
+    print(counts.to_string())
+    if counts.get("failed", 0):
+        print(f"{counts['failed']} units failed, run the mirror again to retry them")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .instrumentation import span
+from .utils import process_queried_data
+
+
+def free_threaded() -> bool:
+    """
+    Returns whether the interpreter runs without the GIL (free-threaded build of Python 3.13+ with the GIL disabled).
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def parse_message(body, data_format: str = "json", parse: Callable = process_queried_data):
+    """
+    Decodes the raw body of a data response (SDMX-JSON or SDMX-CSV bytes) and returns `parse` of the message.
+    This is the function run by the workers of a `ParsePool`.
+    """
+    if isinstance(body, bytes) and data_format == "json":
+        with span("json_decode", bytes=len(body)):
+            body = json.loads(body)
+    return parse(body)
+
+
+class ParsePool:
+    """
+    Pool of workers parsing data responses, so that parsing the responses of concurrent queries uses several cores.
+    The raw response body is sent to a worker, which decodes it and returns the query result (pivoted frames, long frame,
+    column arrays or Arrow table), made of contiguous column buffers that are pickled without per-value overhead.
+    Bodies smaller than `min_bytes` are parsed in the calling thread, where sending them would cost more than parsing them.
+    On a free-threaded interpreter, workers are threads, which parse in parallel without copying the body or the result.
+    Streamed queries (`stream=True`) are decoded in the calling process as their chunks arrive.
+    Usage:
+    >>> with ParsePool(max_workers=4) as pool, IMFInstance(parse_pool=pool) as imf_instance:
+    >>>     results = imf_instance.fetch_many(requests)  # Responses are parsed by 4 processes as they arrive
+    >>> frames = pool.map(bodies)  # Parses raw SDMX-JSON bodies
+
+    Worker processes are started on first use, with the "spawn" method by default: scripts using a pool must guard their
+    entry point with `if __name__ == "__main__":`. Each worker imports pandas once when it starts.
+    A custom `parse` function must be picklable (a module-level function or a `functools.partial` of one).
+
+    Parameters:
+    max_workers (int): Number of workers. Defaults to the number of CPUs.
+    min_bytes (int): Size of the smallest body sent to a worker, in bytes.
+    threads (bool): Whether the workers are threads rather than processes. Defaults to threads on free-threaded interpreters only.
+    mp_context (str): Start method of the worker processes ("spawn", "forkserver" or "fork").
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, min_bytes: int = 1_000_000, threads: Optional[bool] = None, mp_context: str = "spawn"):
+
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_bytes = min_bytes
+        self.threads = free_threaded() if threads is None else threads
+        self.mp_context = mp_context
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        """
+        Executor running the workers, created on first use.
+        """
+        with self._lock:
+            if self._executor is None:
+                if self.threads:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="imf-parse")
+                else:
+                    self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context(self.mp_context))
+            return self._executor
+
+    def offloaded(self, body) -> bool:
+        """
+        Returns whether a body is parsed by a worker rather than in the calling thread.
+        """
+        return isinstance(body, bytes) and len(body) >= self.min_bytes
+
+    def submit(self, body, data_format: str = "json", parse: Callable = process_queried_data) -> Future:
+        """
+        Sends a body to a worker and returns the future of its result, see `parse_message`.
+        """
+        return self.executor.submit(parse_message, body, data_format, parse)
+
+    def parse(self, body, data_format: str = "json", parse: Callable = process_queried_data):
+        """
+        Parses a body, in a worker if it is large enough, and waits for the result.
+        """
+        if not self.offloaded(body):
+            return parse_message(body, data_format, parse)
+        with span("parse_pool", bytes=len(body)):
+            return self.submit(body, data_format, parse).result()
+
+    async def aparse(self, body, data_format: str = "json", parse: Callable = process_queried_data):
+        """
+        Parses a body, in a worker if it is large enough, without blocking the event loop.
+        """
+        if not self.offloaded(body):
+            return parse_message(body, data_format, parse)
+        with span("parse_pool", bytes=len(body)):
+            return await asyncio.wrap_future(self.submit(body, data_format, parse))
+
+    def map(self, bodies, data_format: str = "json", parse: Callable = process_queried_data) -> list:
+        """
+        Parses several bodies in parallel and returns their results in order.
+        """
+        futures = [self.submit(body, data_format, parse) if self.offloaded(body) else None for body in bodies]
+        return [future.result() if future is not None else parse_message(body, data_format, parse) for body, future in zip(bodies, futures)]
+
+    def close(self) -> None:
+        """
+        Stops the workers, once the submitted bodies are parsed.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
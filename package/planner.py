@@ -0,0 +1,112 @@
+import math
+import numpy as np
+import pandas as pd
+from typing import List
+
+from .utils import output_size, pa
+
+MAX_SERIES_PER_REQUEST = 10_000
+"""
+Default maximum number of series (estimated from the availability cube) requested in a single data query.
+"""
+
+MAX_KEY_LENGTH = 2_000
+"""
+Default maximum length of the SDMX key in a data query URL.
+"""
+
+
+def key_selections(tokens: List[str], dimensions: List[str], available: dict) -> List[List[str]]:
+    """
+    Returns, for each dimension, the list of values selected by a key token.
+    A "*" token selects every available value of the dimension.
+    """
+    return [list(available.get(dim, [])) if token == "*" else token.split("+") for dim, token in zip(dimensions, tokens)]
+
+
+def estimate_series(tokens: List[str], dimensions: List[str], available: dict) -> int:
+    """
+    Estimates the number of series matched by a key as the product of the number of selected values in each dimension.
+    This is an upper bound: the availability cube does not say which combinations of values actually exist.
+    """
+    return math.prod(max(len(selection), 1) for selection in key_selections(tokens, dimensions, available))
+
+
+def plan_query(tokens: List[str], dimensions: List[str], available: dict, max_series: int = MAX_SERIES_PER_REQUEST, max_key_length: int = MAX_KEY_LENGTH) -> List[List[str]]:
+    """
+    Splits a key into sub-keys that each stay below `max_series` estimated series and `max_key_length` characters.
+    Oversized keys are split along the dimension with the most selected values (or, if only the key is too long,
+    the dimension with the longest token), and each part is planned again until it fits. Dimensions selecting a single value
+    cannot be split, so the next dimension in that order is used; a ValueError is raised if there is none.
+    Returns the list of sub-keys as lists of tokens; a key that fits is returned unchanged.
+    """
+    selections = key_selections(tokens, dimensions, available)
+    n_series = math.prod(max(len(selection), 1) for selection in selections)
+    key_length = len(".".join(tokens))
+
+    if n_series <= max_series and key_length <= max_key_length:
+        return [tokens]
+
+    if n_series > max_series:
+        candidates = sorted(range(len(selections)), key=lambda i: len(selections[i]), reverse=True)
+        n_parts = math.ceil(n_series / max_series)
+    else:
+        # Wildcards do not make the key long, and splitting one would spell out its values:
+        candidates = sorted((i for i, token in enumerate(tokens) if token != "*"), key=lambda i: len(tokens[i]), reverse=True)
+        n_parts = math.ceil(key_length / max_key_length) + 1
+
+    split_dim = next((i for i in candidates if len(selections[i]) > 1), None)
+    if split_dim is None:
+        raise ValueError(
+            f"The key '{'.'.join(tokens)}' ({n_series} series, {key_length} characters) cannot be split below {max_series} series "
+            f"and {max_key_length} characters: no dimension left selects more than one value."
+        )
+    values = selections[split_dim]
+
+    chunk_size = max(math.ceil(len(values) / n_parts), 1)
+    if chunk_size >= len(values):
+        chunk_size = math.ceil(len(values) / 2)
+
+    plan = []
+    for start in range(0, len(values), chunk_size):
+        sub_tokens = list(tokens)
+        sub_tokens[split_dim] = "+".join(values[start : start + chunk_size])
+        plan.extend(plan_query(sub_tokens, dimensions, available, max_series, max_key_length))
+    return plan
+
+
+def merge_results(results: List[dict]) -> dict:
+    """
+    Merges the dictionaries of DataFrames returned for the sub-keys of a split query.
+    Frames of the same indicator are combined on their dates and entities.
+    """
+    merged: dict = {}
+    for result in results:
+        for indicator, frame in result.items():
+            if indicator in merged:
+                combined = merged[indicator].combine_first(frame)
+                combined.columns.name = frame.columns.name
+                merged[indicator] = combined
+            else:
+                merged[indicator] = frame
+    return merged
+
+
+def combine_results(results: list, output: str = "pivot"):
+    """
+    Combines the results returned for the sub-keys of a split query, in one of the `OUTPUT_FORMATS`.
+    Pivoted results are merged with `merge_results`, the others are concatenated.
+    """
+    if output == "pivot":
+        return merge_results(results)
+
+    # Sub-keys without data give results without dimension columns:
+    results = [result for result in results if output_size(result)] or results[:1]
+    if output == "long":
+        combined = pd.concat(results, ignore_index=True)
+        for column in combined.columns.drop(["Date", "Value"]):
+            combined[column] = combined[column].astype("category")
+        return combined
+    if output == "numpy":
+        return {column: np.concatenate([result[column] for result in results]) for column in results[0]}
+    return pa.concat_tables(results)
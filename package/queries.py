@@ -1,20 +1,38 @@
-import nest_asyncio
-
-nest_asyncio.apply()
 import asyncio
 import httpx
+import importlib.util
 import re
+import time
+import weakref
 import pandas as pd
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from typing import Optional
 
 from .consts import *
+from .cache import StructureCache
+from .utils import CsvDataDecoder, StreamingDataDecoder, parse_time_period, parse_time_period_end, process_queried_data
+from .parsing import ParsePool
+from .instrumentation import RequestTrace, emit, instrumented, span
+from .retry import rate_control
+
+
+DATAFLOWS_URL = "/structure/dataflow/?structureType=dataflow&agencyID=%2A&resourceID=%2A&version=%2A&itemID=%2A&detail=full&references=none"
+
+
+def get_all_dataflows(cache: Optional[StructureCache] = None, client: Optional[httpx.Client] = None) -> pd.DataFrame:
+
+    return process_dataflows(query_structure(f"{BASE}{DATAFLOWS_URL}", cache, client))
 
 
-def get_all_dataflows() -> pd.DataFrame:
+async def get_all_dataflows_async(client, cache: Optional[StructureCache] = None) -> pd.DataFrame:
 
-    url = f"{BASE}/structure/dataflow/?structureType=dataflow&agencyID=%2A&resourceID=%2A&version=%2A&itemID=%2A&detail=full&references=none"
+    return process_dataflows(await query(client, f"{BASE}{DATAFLOWS_URL}", cache))
 
-    response = httpx.get(url, headers=HEADERS)
-    dataflows = response.json()["data"]["dataflows"]
+
+@instrumented("process_dataflows", size=len)
+def process_dataflows(dataflows_json: dict) -> pd.DataFrame:
+
+    dataflows = dataflows_json["data"]["dataflows"]
 
     results = []
     for flow in dataflows:
@@ -88,55 +106,566 @@ def associate_codelists(dims, detail_results) -> list[dict]:
     return dims
 
 
-async def query(client, url) -> dict:
+def lookup_structure(url, cache: Optional[StructureCache] = None) -> tuple[Optional[dict], Optional[dict], dict]:
+
+    if cache is None:
+        return None, None, {}
+    fresh = cache.lookup(url)
+    if fresh is not None:
+        emit({"event": "cache", "url": url, "result": "hit"})
+        return fresh["body"], fresh, {}
+    entry = cache.get(url)
+    emit({"event": "cache", "url": url, "result": "stale" if entry is not None else "miss"})
+    return None, entry, cache.conditional_headers(entry)
 
-    r = await client.get(url)
+
+def handle_structure_response(url, r, cache: Optional[StructureCache] = None, entry: Optional[dict] = None) -> dict:
+
+    if r.status_code == 304 and entry is not None and cache is not None:
+        emit({"event": "cache", "url": url, "result": "revalidated"})
+        cache.revalidated(url, entry, r.headers)
+        return entry["body"]
     if r.status_code == 200:
-        return r.json()
+        with span("json_decode", bytes=len(r.content)):
+            body = r.json()
+        if cache is not None:
+            cache.put(url, body, r.headers)
+        return body
     raise httpx.HTTPStatusError(f"GET {url} – {r.status_code}", request=r.request, response=r)
 
 
-async def queries(dataflow_dict) -> dict:
+@contextmanager
+def request(client: httpx.Client, url, stream: bool = False, **kwargs):
+    """
+    Sends a GET request and yields its response (with its body unread if `stream`), then closes it.
+    Failed attempts are retried according to the rate control of the client, a concurrency slot is held until the block exits,
+    and the request is reported to the instrumentation hooks with the number of retries it took.
+    """
+    control = rate_control(client)
+    trace = RequestTrace.start("GET", url)
+    if trace is not None:
+        kwargs["extensions"] = trace.extensions
+
+    attempt = 0
+    while True:
+        response, error = None, None
+        with control.slot() as outcome:
+            try:
+                response = outcome["response"] = client.send(client.build_request("GET", url, **kwargs), stream=stream)
+            except Exception as e:
+                error = e
+
+            delay = control.delay(attempt, response, error)
+            if delay is None:
+                if error is not None:
+                    if trace is not None:
+                        trace.finish(error=error, retries=attempt)
+                    raise error
+                try:
+                    yield response
+                except BaseException as e:
+                    response.close()
+                    if trace is not None:
+                        trace.finish(response, error=e, retries=attempt)
+                    raise
+                response.close()
+                if trace is not None:
+                    trace.finish(response, retries=attempt)
+                return
+
+            if response is not None:
+                response.close()
+        emit_retry(url, attempt, delay, response, error)
+        time.sleep(delay)
+        attempt += 1
+
+
+@asynccontextmanager
+async def arequest(client: httpx.AsyncClient, url, stream: bool = False, **kwargs):
+    """
+    Asynchronous version of `request`.
+    """
+    control = rate_control(client)
+    trace = RequestTrace.start("GET", url, asynchronous=True)
+    if trace is not None:
+        kwargs["extensions"] = trace.extensions
+
+    attempt = 0
+    while True:
+        response, error = None, None
+        async with control.aslot() as outcome:
+            try:
+                response = outcome["response"] = await client.send(client.build_request("GET", url, **kwargs), stream=stream)
+            except Exception as e:
+                error = e
+
+            delay = control.delay(attempt, response, error)
+            if delay is None:
+                if error is not None:
+                    if trace is not None:
+                        trace.finish(error=error, retries=attempt)
+                    raise error
+                try:
+                    yield response
+                except BaseException as e:
+                    await response.aclose()
+                    if trace is not None:
+                        trace.finish(response, error=e, retries=attempt)
+                    raise
+                await response.aclose()
+                if trace is not None:
+                    trace.finish(response, retries=attempt)
+                return
+
+            if response is not None:
+                await response.aclose()
+        emit_retry(url, attempt, delay, response, error)
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def emit_retry(url, attempt: int, delay: float, response: Optional[httpx.Response], error: Optional[Exception]) -> None:
+
+    event = {"event": "retry", "url": url, "attempt": attempt + 1, "delay": delay}
+    if response is not None:
+        event["status"] = response.status_code
+    if error is not None:
+        event["error"] = repr(error)
+    emit(event)
+
+
+def get(client: Optional[httpx.Client], url, **kwargs) -> httpx.Response:
+    """
+    Sends a GET request with `client` (or a one-off client if None), see `request`.
+    """
+    with nullcontext(client) if client is not None else httpx.Client() as c:
+        with request(c, url, **kwargs) as response:
+            return response
+
+
+async def aget(client: httpx.AsyncClient, url, **kwargs) -> httpx.Response:
+    """
+    Sends a GET request with an asynchronous client, see `request`.
+    """
+    async with arequest(client, url, **kwargs) as response:
+        return response
+
+
+@contextmanager
+def stream(client: Optional[httpx.Client], url, **kwargs):
+    """
+    Streams the response of a GET request with `client` (or a one-off client if None), like `httpx.Client.stream`, see `request`.
+    """
+    with nullcontext(client) if client is not None else httpx.Client() as c:
+        with request(c, url, stream=True, **kwargs) as response:
+            yield response
+
+
+def astream(client: httpx.AsyncClient, url, **kwargs):
+    """
+    Streams the response of a GET request with an asynchronous client, see `request`.
+    """
+    return arequest(client, url, stream=True, **kwargs)
+
+
+def query_structure(url, cache: Optional[StructureCache] = None, client: Optional[httpx.Client] = None) -> dict:
+
+    body, entry, headers = lookup_structure(url, cache)
+    if body is not None:
+        return body
+
+    r = get(client, url, headers={**HEADERS, **headers})
+    return handle_structure_response(url, r, cache, entry)
+
+
+IN_FLIGHT: "weakref.WeakKeyDictionary[httpx.AsyncClient, dict]" = weakref.WeakKeyDictionary()
+"""
+Structure requests in flight on each asynchronous client, keyed by URL.
+"""
+
+
+async def fetch_structure(client, url, cache: Optional[StructureCache] = None) -> dict:
+
+    body, entry, headers = lookup_structure(url, cache)
+    if body is not None:
+        return body
+
+    r = await aget(client, url, headers=headers)
+    return handle_structure_response(url, r, cache, entry)
+
+
+async def query(client, url, cache: Optional[StructureCache] = None) -> dict:
+
+    # Identical structure requests in flight on the same client share one request and its (read-only) response:
+    in_flight = IN_FLIGHT.setdefault(client, {})
+    task = in_flight.get(url)
+    if task is not None:
+        emit({"event": "coalesced", "url": url})
+    else:
+        task = in_flight[url] = asyncio.ensure_future(fetch_structure(client, url, cache))
+        task.add_done_callback(lambda _: in_flight.pop(url, None))
+    return await asyncio.shield(task)
+
+
+def accept_encoding() -> str:
+    """
+    Returns the Accept-Encoding header listing the content codings the client can decode, most compact first:
+    zstd (with the optional `zstandard` package) and br (with `brotli` or `brotlicffi`) when installed, then gzip and deflate.
+    """
+    available = [("zstd", ["zstandard"]), ("br", ["brotli", "brotlicffi"])]
+    encodings = [name for name, modules in available if any(importlib.util.find_spec(module) for module in modules)] + ["gzip", "deflate"]
+    return ", ".join(name if i == 0 else f"{name};q={1 - i / 10:.1f}" for i, name in enumerate(encodings))
+
+
+def client_settings(http2: bool = True, timeout: float = 30.0, max_connections: int = 20, max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0, proxy: Optional[str] = None) -> dict:
+
+    return {
+        "headers": {**HEADERS, "Accept-Encoding": accept_encoding()},
+        "http2": http2,
+        "timeout": timeout,
+        "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections, keepalive_expiry=keepalive_expiry),
+        "proxy": proxy,
+    }
+
+
+def make_client(**settings) -> httpx.Client:
+
+    return httpx.Client(**client_settings(**settings))
+
+
+def make_async_client(**settings) -> httpx.AsyncClient:
+
+    return httpx.AsyncClient(**client_settings(**settings))
+
+
+def missing_structure(error: BaseException) -> bool:
+    """
+    Returns whether an exception is a "404 Not Found" answer, i.e. the requested structure does not exist.
+    """
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 404
+
+
+def rejected_key(error: BaseException) -> bool:
+    """
+    Returns whether an exception is a client error answer other than throttling, i.e. the server rejected the request itself.
+    """
+    return isinstance(error, httpx.HTTPStatusError) and 400 <= error.response.status_code < 500 and error.response.status_code != 429
+
+
+def raise_failures(results: list) -> None:
+    """
+    Raises the first failure among the results of structure requests, other than a missing structure.
+    Throttled, unavailable and network failures have already been retried, so they are not turned into missing metadata.
+    """
+    for result in results:
+        if isinstance(result, BaseException) and not missing_structure(result):
+            raise result
+
+
+def index_structures(response: dict, kind: str) -> dict:
+    """
+    Returns the structures of a kind ("conceptSchemes", "codelists") included in a structure response, keyed by (agency ID, ID).
+    Each structure is wrapped as a standalone response of its own, so it is processed like a separately fetched one.
+    """
+    return {(s.get("agencyID"), s.get("id")): {"data": {kind: [s]}} for s in response.get("data", {}).get(kind, [])}
+
+
+async def query_dimensions(client, dataflow_dict, cache: Optional[StructureCache] = None) -> dict:
+
+    # Dimensions, with the concept schemes and codelists they reference:
+    dim_url = f"{BASE}/structure/datastructure/{dataflow_dict['StructureAgencyID']}/{dataflow_dict['StructureID']}/+?references=descendants&detail=full"
+    dims_json = await query(client, dim_url, cache)
+    dims = extract_dimensions(dims_json)
+
+    # Details, fetched separately only for the concept schemes missing from the datastructure response:
+    schemes = index_structures(dims_json, "conceptSchemes")
+    details = {f"detail_{d['ConceptID']}": schemes.get((d["ConceptAgencyID"], d["ConceptScheme"])) for d in dims}
+    detail_tasks = {f"detail_{d['ConceptID']}": query(client, f"{BASE}/structure/conceptscheme/{d['ConceptAgencyID']}/{d['ConceptScheme']}/+", cache) for d in dims if details[f"detail_{d['ConceptID']}"] is None}
+    detail_results = await asyncio.gather(*detail_tasks.values(), return_exceptions=True)
+    raise_failures(detail_results)
+    details.update(zip(detail_tasks, detail_results))
 
-    async with httpx.AsyncClient(headers=HEADERS, http2=True, timeout=30.0, limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)) as client:
+    return {"dimensions": dims_json, "dimension_details": details}
 
-        # Dimensions:
-        dim_url = f"{BASE}/structure/datastructure/{dataflow_dict['StructureAgencyID']}/{dataflow_dict['StructureID']}/+"
-        dims_json = await query(client, dim_url)
-        dims = extract_dimensions(dims_json)
 
-        # Details:
-        detail_tasks = {f"detail_{d['ConceptID']}": query(client, f"{BASE}/structure/conceptscheme/{d['ConceptAgencyID']}/{d['ConceptScheme']}/+") for d in dims}
-        detail_results = await asyncio.gather(*detail_tasks.values(), return_exceptions=True)
+def response_dimensions(response: dict) -> list[dict]:
+
+    dims = extract_dimensions(response["dimensions"])
+    return associate_codelists(dims, list(response["dimension_details"].values()))
+
+
+async def query_codelists(client, dims, cache: Optional[StructureCache] = None, structure: Optional[dict] = None) -> dict:
+
+    # Codelists included in the datastructure response are used as is, the others are fetched:
+    included = index_structures(structure, "codelists") if structure else {}
+    codelists = {f"codelist_{d['CodelistID']}": included.get((d["CodelistAgencyID"], d["CodelistID"])) for d in dims if d["CodelistID"]}
+    code_tasks = {f"codelist_{d['CodelistID']}": query(client, f"{BASE}/structure/codelist/{d['CodelistAgencyID']}/{d['CodelistID']}/+", cache) for d in dims if d["CodelistID"] and codelists[f"codelist_{d['CodelistID']}"] is None}
+    code_results = await asyncio.gather(*code_tasks.values(), return_exceptions=True)
+    raise_failures(code_results)
+    codelists.update(zip(code_tasks, code_results))
+
+    return {"codelists": codelists}
+
+
+async def query_availability(client, dataflow_dict, n_dims: Optional[int] = None, cache: Optional[StructureCache] = None) -> dict:
+
+    # Without the number of dimensions, the whole key is a single wildcard, so availability can be requested alongside the structure:
+    star_key = ".".join(["*"] * n_dims) if n_dims else "*"
+    avail_url = f"{BASE}/availability/dataflow/" f"{dataflow_dict['DataflowAgencyID']}/{dataflow_dict['DataflowID']}" f"/+/{star_key}/all?mode=available"
+    availability = await query(client, avail_url, cache)
+
+    return {"availability": availability}
+
+
+async def queries(dataflow_dict, cache: Optional[StructureCache] = None, client: Optional[httpx.AsyncClient] = None) -> dict:
+
+    if client is None:
+        async with make_async_client() as client:
+            return await queries(dataflow_dict, cache, client)
+
+    # Availability, in parallel with the structure:
+    availability = asyncio.ensure_future(query_availability(client, dataflow_dict, None, cache))
+
+    try:
+        # Dimensions and details:
+        output = await query_dimensions(client, dataflow_dict, cache)
 
         # Associate codelists:
-        dims = associate_codelists(dims, detail_results)
+        dims = response_dimensions(output)
 
         # Codelists:
-        code_tasks = {f"codelist_{d['CodelistID']}": query(client, f"{BASE}/structure/codelist/{d['CodelistAgencyID']}/{d['CodelistID']}/+") for d in dims if d["CodelistID"]}
-        code_results = await asyncio.gather(*code_tasks.values(), return_exceptions=True)
+        output.update(await query_codelists(client, dims, cache, output["dimensions"]))
+    except BaseException:
+        availability.cancel()
+        raise
+
+    try:
+        output.update(await availability)
+    except httpx.HTTPStatusError as e:
+        if not rejected_key(e):
+            raise
+        # The single wildcard key was rejected, retry with one wildcard per dimension:
+        output.update(await query_availability(client, dataflow_dict, len(dims), cache))
+
+    return output
+
+
+def data_headers(data_format: str = "json") -> dict:
+    """
+    Returns the request headers of a data query in one of the `DATA_FORMATS` ("json" for SDMX-JSON, "csv" for SDMX-CSV).
+    """
+    if data_format not in DATA_FORMATS:
+        raise ValueError(f"Unknown data format '{data_format}'. Expected one of {tuple(DATA_FORMATS)}.")
+    return {"Accept": DATA_FORMATS[data_format]}
 
-        # Availability:
-        star_key = ".".join(["*"] * len(dims))
-        avail_url = f"{BASE}/availability/dataflow/" f"{dataflow_dict['DataflowAgencyID']}/{dataflow_dict['DataflowID']}" f"/+/{star_key}/all?mode=available"
-        availability = await query(client, avail_url)
 
-        # Construct output:
-        output = {"dimensions": dims_json, "dimension_details": dict(zip(detail_tasks, detail_results)), "codelists": dict(zip(code_tasks, code_results)), "availability": availability}
+def decoded_body(response: httpx.Response, data_format: str = "json", raw: bool = False):
+    """
+    Returns the body of a data response: the decoded SDMX-JSON message, or the raw SDMX-CSV message (see `process_queried_data`).
+    With `raw`, the SDMX-JSON message is returned undecoded too, e.g. to be parsed by a `ParsePool`.
+    """
+    if data_format == "csv" or raw:
+        return response.content
+    with span("json_decode", bytes=len(response.content)):
+        return response.json()
 
-        return output
 
+def data_decoder(data_format: str = "json", on_chunk=None, chunk_series: int = 10_000):
+    """
+    Returns the incremental decoder of a data message format.
+    """
+    if data_format == "csv":
+        return CsvDataDecoder(on_chunk=on_chunk)
+    return StreamingDataDecoder(on_chunk=on_chunk, chunk_series=chunk_series)
 
-def query_data(agency_id, resource_id, key) -> dict:
+
+def query_data(agency_id, resource_id, key, client: Optional[httpx.Client] = None, data_format: str = "json", raw: bool = False, params: Optional[dict] = None):
 
     url = f"{BASE}/data/dataflow/{agency_id}/{resource_id}/+/{key}"
 
-    response = httpx.get(url, headers=HEADERS)
+    response = get(client, url, params=params, headers={**HEADERS, **data_headers(data_format)})
+    if response.status_code == 200:
+        return decoded_body(response, data_format, raw)
+    if params and response.status_code in NO_CHANGES:
+        return {}
+    raise httpx.HTTPStatusError(f"GET {url} – {response.status_code}", request=response.request, response=response)
+
 
-    if response.status_code != 200:
-        print(f"Error: {response.status_code} {response.reason_phrase}")
-        print(response.text)
+def query_data_stream(agency_id, resource_id, key, on_chunk=None, chunk_series: int = 10_000, client: Optional[httpx.Client] = None, data_format: str = "json", params: Optional[dict] = None) -> Optional[tuple]:
+
+    url = f"{BASE}/data/dataflow/{agency_id}/{resource_id}/+/{key}"
+
+    headers = {**HEADERS, **data_headers(data_format)}
+    decoder = data_decoder(data_format, on_chunk, chunk_series)
+
+    with stream(client, url, params=params, headers=headers) as response:
+
+        if params and response.status_code in NO_CHANGES:
+            return None
+
+        if response.status_code != 200:
+            response.read()
+            response.raise_for_status()
+
+        for chunk in response.iter_bytes():
+            decoder.feed(chunk)
+
+    return decoder.close()
+
+
+async def query_data_stream_async(client, agency_id, resource_id, key, on_chunk=None, chunk_series: int = 10_000, params: Optional[dict] = None, data_format: str = "json") -> Optional[tuple]:
+
+    url = f"{BASE}/data/dataflow/{agency_id}/{resource_id}/+/{key}"
+
+    headers = data_headers(data_format)
+    decoder = data_decoder(data_format, on_chunk, chunk_series)
+
+    async with astream(client, url, params=params, headers=headers) as response:
+
+        if params and response.status_code in NO_CHANGES:
+            return None
+
+        if response.status_code != 200:
+            await response.aread()
+            response.raise_for_status()
+
+        async for chunk in response.aiter_bytes():
+            decoder.feed(chunk)
+
+    return decoder.close()
+
+
+NO_CHANGES = (204, 404)
+"""
+Status codes of a delta or filtered query (see `delta_params` and `filter_params`) that found no observation.
+"""
+
+
+DELTA_MODES = ("updatedAfter", "startPeriod")
+"""
+Ways of restricting a data query to the observations changed since a previous fetch, see `delta_params`.
+"""
+
+
+def delta_params(fetched_at: float, last_period: Optional[pd.Timestamp] = None, delta: str = "updatedAfter") -> dict:
+    """
+    Returns the query parameters that restrict a data query to the observations changed since a previous fetch:
+    - "updatedAfter": observations added or revised since `fetched_at` (a POSIX timestamp),
+    - "startPeriod": observations of `last_period` and later, for dataflows that do not track update times.
+    """
+    if delta == "updatedAfter":
+        return {"updatedAfter": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(fetched_at))}
+    if delta == "startPeriod":
+        return {"c[TIME_PERIOD]": f"ge:{last_period:%Y-%m-%d}"} if last_period is not None else {}
+    raise ValueError(f"Unknown delta mode '{delta}'. Expected one of {DELTA_MODES}.")
+
+
+DETAILS = {
+    "full": ("dsd", "all"),
+    "dataonly": ("none", "all"),
+    "serieskeysonly": ("none", "none"),
+    "nodata": ("dsd", "none"),
+}
+"""
+SDMX 2.1 `detail` values, mapped to the `attributes` and `measures` parameters replacing them in SDMX 3.0.
+"""
+
+
+def filter_params(
+    start_period=None,
+    end_period=None,
+    first_n_observations: Optional[int] = None,
+    last_n_observations: Optional[int] = None,
+    attributes=None,
+    measures=None,
+    detail: Optional[str] = None,
+) -> dict:
+    """
+    Returns the SDMX 3.0 query parameters that make the server return only part of the data of a query:
+    - `start_period` / `end_period`: observations of the periods from `start_period` to `end_period`, included
+      (reporting periods such as "2020", "2020-Q1" or "2020-M03", dates or timestamps). The end period runs to its last day, so that
+      `end_period="2020"` includes December 2020.
+    - `first_n_observations` / `last_n_observations`: the first / last N observations of each series, within the period range.
+    - `attributes`: attributes returned, "all", "none", "dsd", "msd", "dataset", "series", "obs" or a list of attribute IDs.
+    - `measures`: measures returned, "all", "none" or a list of measure IDs.
+    - `detail`: shorthand for both, one of `DETAILS` ("dataonly" drops every attribute, "serieskeysonly" every observation).
+    """
+    params = {}
+
+    start = parse_time_period(str(start_period)) if start_period is not None else None
+    end = parse_time_period_end(str(end_period)) if end_period is not None else None
+    for name, value, bound in [("start_period", start_period, start), ("end_period", end_period, end)]:
+        if value is not None and pd.isna(bound):
+            raise ValueError(f"Invalid {name} '{value}'. Expected a reporting period (e.g. '2020', '2020-Q1', '2020-M03') or a date.")
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"start_period '{start_period}' is after end_period '{end_period}'.")
+    conditions = [f"ge:{start:%Y-%m-%d}" if start is not None else None, f"le:{end:%Y-%m-%d}" if end is not None else None]
+    if any(conditions):
+        params["c[TIME_PERIOD]"] = "+".join(condition for condition in conditions if condition)
+
+    for name, value, param in [("first_n_observations", first_n_observations, "firstNObservations"), ("last_n_observations", last_n_observations, "lastNObservations")]:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError(f"{name} must be a positive integer, got {value!r}.")
+        params[param] = str(value)
+
+    if detail is not None:
+        if detail not in DETAILS:
+            raise ValueError(f"Unknown detail '{detail}'. Expected one of {tuple(DETAILS)}.")
+        if attributes is not None or measures is not None:
+            raise ValueError("detail cannot be combined with attributes or measures.")
+        attributes, measures = DETAILS[detail]
+    for name, value in [("attributes", attributes), ("measures", measures)]:
+        if value is not None:
+            params[name] = value if isinstance(value, str) else ",".join(value)
+
+    return params
+
+
+def merge_params(*params: Optional[dict]) -> Optional[dict]:
+    """
+    Merges the query parameters of several restrictions of a data query (e.g. `filter_params` and `delta_params`).
+    Conditions on the same component ("c[...]") must all hold, other parameters of later dictionaries take precedence.
+    Returns None if there is no parameter.
+    """
+    merged: dict = {}
+    for p in params:
+        for name, value in (p or {}).items():
+            if name.startswith("c[") and name in merged:
+                merged[name] = f"{merged[name]}+{value}"
+            else:
+                merged[name] = value
+    return merged or None
+
+
+async def query_data_async(client, agency_id, resource_id, key, params: Optional[dict] = None, data_format: str = "json", raw: bool = False):
+
+    url = f"{BASE}/data/dataflow/{agency_id}/{resource_id}/+/{key}"
+
+    r = await aget(client, url, params=params, headers=data_headers(data_format))
+    if r.status_code == 200:
+        return decoded_body(r, data_format, raw)
+    if params and r.status_code in NO_CHANGES:
         return {}
+    raise httpx.HTTPStatusError(f"GET {url} – {r.status_code}", request=r.request, response=r)
+
+
+async def query_data_many(requests, max_concurrency: int = 8, parse=process_queried_data, client: Optional[httpx.AsyncClient] = None, params: Optional[dict] = None, data_format: str = "json", pool: Optional[ParsePool] = None) -> list:
+
+    if client is None:
+        async with make_async_client(max_connections=max_concurrency, max_keepalive_connections=max_concurrency) as client:
+            return await query_data_many(requests, max_concurrency, parse, client, params, data_format, pool)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(agency_id, resource_id, key):
+        async with semaphore:
+            data = await query_data_async(client, agency_id, resource_id, key, params, data_format, raw=pool is not None)
+        # Parse as soon as the response arrives, while other requests are in flight:
+        if pool is not None:
+            return await pool.aparse(data, data_format, parse)
+        return parse(data)
 
-    data = response.json()
-    return data
+    tasks = [fetch(agency_id, resource_id, key) for agency_id, resource_id, key in requests]
+    return await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,233 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+import httpx
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class RetryPolicy:
+    """
+    Retries of failed requests: throttled or unavailable responses (429, 502, 503, 504) and network errors are retried
+    after a jittered exponential backoff, or after the delay asked for by the server's `Retry-After` header.
+    Usage:
+    >>> imf_instance = IMFInstance(retry=RetryPolicy(max_retries=8, max_backoff=60.0))
+    >>> imf_instance = IMFInstance(retry=None)  # No retries
+
+    Parameters:
+    max_retries (int): Maximum number of retries of a request.
+    backoff (float): Base delay in seconds. The n-th retry waits a random delay between 0 and `backoff * 2 ** n` ("full jitter").
+    max_backoff (float): Maximum backoff delay, in seconds.
+    max_retry_after (float): Longest `Retry-After` delay honoured, in seconds. A response asking for a longer wait is not retried.
+    statuses (tuple): Response status codes that are retried.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_retry_after: float = 120.0,
+        statuses: tuple = (429, 502, 503, 504),
+    ):
+
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.statuses = statuses
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None, error: Optional[Exception] = None) -> Optional[float]:
+        """
+        Returns the number of seconds to wait before retrying a request after its `attempt`-th try (counted from 0)
+        returned `response` or raised `error`, or None if it is not retried.
+        """
+        if attempt >= self.max_retries:
+            return None
+        if error is not None and not isinstance(error, httpx.TransportError):
+            return None
+        if response is not None and response.status_code not in self.statuses:
+            return None
+
+        retry_after = parse_retry_after(response.headers.get("retry-after")) if response is not None else None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Returns the delay of a `Retry-After` header in seconds, given either as a number of seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveConcurrency:
+    """
+    Limit on the number of requests in flight, adapted to the server's pushback (AIMD, as in TCP congestion control):
+    each request completed without pushback raises the limit by `increase / limit` (about `increase` per round of requests),
+    and a throttled request (429 or 503) multiplies it by `decrease`. The limit is decreased at most once per window
+    (the requests started before the last decrease), since the requests of a window are throttled by the same burst.
+    Usage:
+    >>> imf_instance = IMFInstance(max_connections=50, adaptive_concurrency=True)
+    >>> imf_instance.concurrency.limit  # Current limit
+
+    Parameters:
+    maximum (int): Highest limit, which is also the initial one.
+    minimum (int): Lowest limit.
+    increase (float): Additive increase per round of requests.
+    decrease (float): Multiplicative decrease on pushback.
+    """
+
+    THROTTLED = (429, 503)
+    """
+    Status codes counted as pushback from the server.
+    """
+
+    def __init__(self, maximum: int = 20, minimum: int = 1, increase: float = 1.0, decrease: float = 0.5):
+
+        self.maximum = maximum
+        self.minimum = minimum
+        self.increase = increase
+        self.decrease = decrease
+
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._window = 0
+        self._condition = threading.Condition()
+        self._waiters: list = []
+
+    def _available(self) -> bool:
+        return self.in_flight < max(int(self.limit), self.minimum)
+
+    def acquire(self) -> int:
+        """
+        Waits for a free slot (blocking the thread), takes it and returns the window it was taken in.
+        """
+        with self._condition:
+            while not self._available():
+                self._condition.wait()
+            self.in_flight += 1
+            return self._window
+
+    async def aacquire(self) -> int:
+        """
+        Waits for a free slot (without blocking the event loop), takes it and returns the window it was taken in.
+        """
+        while True:
+            with self._condition:
+                if self._available():
+                    self.in_flight += 1
+                    return self._window
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+            await waiter
+
+    def release(self, window: int, throttled: bool) -> None:
+        """
+        Frees a slot taken in `window` and adapts the limit to the outcome of its request.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if not throttled:
+                self.limit = min(self.limit + self.increase / self.limit, float(self.maximum))
+            elif window == self._window:
+                self.limit = max(self.limit * self.decrease, float(self.minimum))
+                self._window += 1
+            self._condition.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class RateControl:
+    """
+    Retry policy and adaptive concurrency limit of a client, see `rate_control`.
+    """
+
+    def __init__(self, retry: Optional[RetryPolicy] = None, concurrency: Optional[AdaptiveConcurrency] = None):
+
+        self.retry = retry
+        self.concurrency = concurrency
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None, error: Optional[Exception] = None) -> Optional[float]:
+        return self.retry.delay(attempt, response, error) if self.retry is not None else None
+
+    @staticmethod
+    def throttled(response: Optional[httpx.Response]) -> bool:
+        return response is not None and response.status_code in AdaptiveConcurrency.THROTTLED
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds a concurrency slot for the duration of a block. The block sets the "response" of the yielded dictionary.
+        """
+        if self.concurrency is None:
+            yield {}
+            return
+        window, outcome = self.concurrency.acquire(), {}
+        try:
+            yield outcome
+        finally:
+            self.concurrency.release(window, self.throttled(outcome.get("response")))
+
+    @asynccontextmanager
+    async def aslot(self):
+        """
+        Asynchronous version of `slot`.
+        """
+        if self.concurrency is None:
+            yield {}
+            return
+        window, outcome = await self.concurrency.aacquire(), {}
+        try:
+            yield outcome
+        finally:
+            self.concurrency.release(window, self.throttled(outcome.get("response")))
+
+
+RATE_CONTROLS: "weakref.WeakKeyDictionary[httpx.Client | httpx.AsyncClient, RateControl]" = weakref.WeakKeyDictionary()
+"""
+Rate control registered for each client, see `rate_control`.
+"""
+
+
+DEFAULT_RETRY = RetryPolicy()
+"""
+Retry policy used by default.
+"""
+
+
+DEFAULT_RATE_CONTROL = RateControl(DEFAULT_RETRY)
+"""
+Rate control of the clients without a registered one: default retries, no concurrency limit.
+"""
+
+
+def rate_control(client) -> RateControl:
+    """
+    Returns the rate control of a client: the one registered with `set_rate_control`, or `DEFAULT_RATE_CONTROL`.
+    """
+    if client is None:
+        return DEFAULT_RATE_CONTROL
+    return RATE_CONTROLS.get(client, DEFAULT_RATE_CONTROL)
+
+
+def set_rate_control(client, control: RateControl) -> None:
+    """
+    Registers the rate control used by every request sent with a client.
+    """
+    RATE_CONTROLS[client] = control
@@ -0,0 +1,374 @@
+import asyncio
+import inspect
+import time
+import pandas as pd
+from typing import Callable, Optional
+
+from .instrumentation import emit
+
+
+class RefreshEntry:
+    """
+    State of a query or of the metadata of a dataflow registered with a refresh scheduler.
+    """
+
+    def __init__(self, dataflow_id: str, key: Optional[str], every: float, fetch: Callable):
+
+        self.dataflow_id = dataflow_id
+        self.key = key
+        """
+        SDMX key of the query, or None for the structure metadata of the dataflow.
+        """
+
+        self.every = every
+        """
+        Refresh cadence, in seconds. The result is stale once it is older than that.
+        """
+
+        self.fetch = fetch
+        self.result = None
+        """
+        Last good result, served while it is revalidated.
+        """
+
+        self.refreshed_at: Optional[float] = None
+        self.next_refresh = 0.0
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_duration: Optional[float] = None
+        self.task: Optional[asyncio.Future] = None
+
+    def age(self, now: float) -> Optional[float]:
+        """
+        Returns the number of seconds since the last good result, or None if there is none.
+        """
+        return now - self.refreshed_at if self.refreshed_at is not None else None
+
+    def stale(self, now: float) -> bool:
+        return self.refreshed_at is None or now - self.refreshed_at >= self.every
+
+
+class AsyncRefreshScheduler:
+    """
+    Keeps registered queries, and the structure metadata of their dataflows, warm by refreshing them in the background,
+    and serves the last good result instantly while it is revalidated (stale-while-revalidate). Returned by `AsyncIMFInstance.scheduler`.
+    Usage:
+    >>> async with imf_instance.scheduler(max_concurrency=4) as scheduler:  # Starts the background refresh task
+    >>>     key = await scheduler.register('CPI', query_params, every=3600)  # Refreshed every hour
+    >>>     await scheduler.register_metadata('CPI', every=24 * 3600)  # Dimensions, codelists and availability refreshed daily
+    >>>     data = await scheduler.get(key)  # Last good result, without waiting for the network once warm
+    >>>     scheduler.metrics()  # Staleness, refresh counts, failures and durations of every registered entry
+
+    Concurrent callers of an entry share one refresh, and at most `max_concurrency` refreshes run at once.
+    A failed refresh keeps the last good result, and is retried after `retry_after` seconds. Without the background task
+    (`start()`), `get` still fetches missing results and revalidates stale ones. Results are shared between callers, which
+    must not modify them.
+
+    Parameters:
+    instance (AsyncIMFInstance): Instance whose client and dataflow objects are used.
+    max_concurrency (int): Maximum number of refreshes running at once.
+    retry_after (float): Delay before retrying a failed refresh, in seconds (at most the cadence of the entry).
+    """
+
+    def __init__(self, instance, max_concurrency: int = 4, retry_after: float = 60.0):
+
+        self.instance = instance
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+
+        self.entries: dict = {}
+        """
+        Registered entries: (dataflow ID, SDMX key) for queries, (dataflow ID, None) for metadata -> `RefreshEntry`.
+        """
+
+        self.dataflows: dict = {}
+        """
+        Dataflow object of each dataflow with a registered entry, replaced by each refresh of its metadata.
+        """
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _dataflow(self, dataflow_id: str):
+        if dataflow_id not in self.dataflows:
+            dataflow = await self.instance.Dataflow(dataflow_id)
+            self.dataflows.setdefault(dataflow_id, dataflow)
+        return self.dataflows[dataflow_id]
+
+    def _add(self, entry: RefreshEntry) -> tuple:
+        key = (entry.dataflow_id, entry.key)
+        previous = self.entries.get(key)
+        if previous is not None and previous.task is not None:
+            previous.task.cancel()
+        self.entries[key] = entry
+        self._wake.set()
+        return key
+
+    async def register(self, dataflow_id: str, query_params, every: float = 3600.0, **query_options) -> tuple:
+        """
+        Registers a query, refreshed every `every` seconds, and returns its key: (dataflow ID, SDMX key).
+        `query_options` are passed to `DataflowObject.query` (e.g. `output="long"`, `last_n_observations=12`).
+        Registering the same key again replaces its cadence and options. The metadata of the dataflow is loaded if needed.
+        """
+        dataflow = await self._dataflow(dataflow_id)
+        # Invalid options fail now rather than at every refresh:
+        inspect.signature(dataflow.query).bind(query_params, **query_options)
+        key, _ = dataflow.query_key(query_params, validate=query_options.get("validate", True))
+
+        async def fetch():
+            return await self.dataflows[dataflow_id].query(query_params, **query_options)
+
+        return self._add(RefreshEntry(dataflow_id, key, every, fetch))
+
+    async def register_metadata(self, dataflow_id: str, every: float = 24 * 3600.0) -> tuple:
+        """
+        Registers the structure metadata of a dataflow (dimensions, codelists and availability), refreshed every `every` seconds,
+        and returns its key: (dataflow ID, None). Each refresh loads a new dataflow object (through the structure cache, if any)
+        and swaps it in for the registered queries of the dataflow once it is complete.
+        """
+        dataflow = await self._dataflow(dataflow_id)
+
+        async def fetch():
+            self.dataflows[dataflow_id] = await self.instance.Dataflow(dataflow_id)
+            return self.dataflows[dataflow_id]
+
+        entry = RefreshEntry(dataflow_id, None, every, fetch)
+        entry.result, entry.refreshed_at, entry.next_refresh = dataflow, time.time(), time.time() + every
+        return self._add(entry)
+
+    def unregister(self, key: tuple) -> None:
+        """
+        Removes a registered entry, cancelling its refresh if one is running.
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None and entry.task is not None:
+            entry.task.cancel()
+
+    def _entry(self, key: tuple) -> RefreshEntry:
+        try:
+            return self.entries[key]
+        except KeyError:
+            raise LookupError(f"{key} is not registered with the scheduler. Registered keys: {list(self.entries)}")
+
+    def _refresh(self, entry: RefreshEntry) -> asyncio.Future:
+        """
+        Starts refreshing an entry, unless a refresh is already running, and returns the task of the running refresh.
+        """
+        if entry.task is None:
+            entry.task = asyncio.ensure_future(self._revalidate(entry))
+            entry.task.add_done_callback(lambda task: self._refreshed(entry, task))
+        return entry.task
+
+    def _refreshed(self, entry: RefreshEntry, task: asyncio.Future) -> None:
+        if entry.task is task:
+            entry.task = None
+        # The error is recorded on the entry; retrieving it here avoids "exception was never retrieved" warnings:
+        if not task.cancelled():
+            task.exception()
+        self._wake.set()
+
+    async def _revalidate(self, entry: RefreshEntry):
+        async with self._semaphore:
+            start = time.time()
+            fields = {"event": "refresh", "name": "refresh", "dataflow": entry.dataflow_id, "key": entry.key, "age": entry.age(start), "start": start}
+            try:
+                result = await entry.fetch()
+            except Exception as e:
+                entry.failures += 1
+                entry.last_error = repr(e)
+                entry.next_refresh = time.time() + min(self.retry_after, entry.every)
+                emit({**fields, "duration": time.time() - start, "error": repr(e)})
+                raise
+            end = time.time()
+            entry.result, entry.refreshed_at, entry.next_refresh = result, end, start + entry.every
+            entry.refreshes += 1
+            entry.last_duration = end - start
+            entry.last_error = None
+            emit({**fields, "duration": end - start})
+            return result
+
+    async def get(self, key: tuple):
+        """
+        Returns the last good result of a registered entry (the query result, or the dataflow object for metadata).
+        A stale result is returned immediately and refreshed in the background. Without a result yet, waits for the refresh
+        (shared with the other callers), and raises its error if it fails.
+        """
+        entry = self._entry(key)
+        now = time.time()
+        if entry.refreshed_at is None:
+            emit({"event": "served", "dataflow": entry.dataflow_id, "key": entry.key, "result": "miss", "age": None})
+            return await asyncio.shield(self._refresh(entry))
+        if entry.task is None and now >= entry.next_refresh:
+            self._refresh(entry)
+        emit({"event": "served", "dataflow": entry.dataflow_id, "key": entry.key, "result": "stale" if entry.stale(now) else "fresh", "age": entry.age(now)})
+        return entry.result
+
+    async def refresh(self, key: tuple):
+        """
+        Refreshes a registered entry now, or joins its running refresh, and returns the new result.
+        """
+        return await asyncio.shield(self._refresh(self._entry(key)))
+
+    async def dataflow(self, dataflow_id: str):
+        """
+        Returns the current dataflow object of a dataflow with registered entries, revalidating its metadata if it is registered and stale.
+        """
+        if (dataflow_id, None) in self.entries:
+            return await self.get((dataflow_id, None))
+        if dataflow_id not in self.dataflows:
+            raise LookupError(f"Dataflow '{dataflow_id}' has no entry registered with the scheduler.")
+        return self.dataflows[dataflow_id]
+
+    def metrics(self) -> pd.DataFrame:
+        """
+        Returns one row per registered entry, with the columns "DataflowID", "Key" (None for metadata), "Every" (cadence),
+        "LastRefresh" (time of the last good result), "Staleness" (seconds since then), "Stale", "Refreshing", "Refreshes",
+        "Failures", "LastError" (error of the last refresh, if it failed) and "LastDuration" (seconds of the last good refresh).
+        """
+        now = time.time()
+        rows = [
+            {
+                "DataflowID": entry.dataflow_id,
+                "Key": entry.key,
+                "Every": entry.every,
+                "LastRefresh": pd.Timestamp(entry.refreshed_at, unit="s") if entry.refreshed_at is not None else pd.NaT,
+                "Staleness": entry.age(now),
+                "Stale": entry.stale(now),
+                "Refreshing": entry.task is not None,
+                "Refreshes": entry.refreshes,
+                "Failures": entry.failures,
+                "LastError": entry.last_error,
+                "LastDuration": entry.last_duration,
+            }
+            for entry in list(self.entries.values())
+        ]
+        columns = ["DataflowID", "Key", "Every", "LastRefresh", "Staleness", "Stale", "Refreshing", "Refreshes", "Failures", "LastError", "LastDuration"]
+        return pd.DataFrame(rows, columns=columns)
+
+    async def _run(self) -> None:
+        """
+        Background task starting the refresh of every entry that is due, then sleeping until the next one is.
+        """
+        while True:
+            self._wake.clear()
+            now = time.time()
+            for entry in list(self.entries.values()):
+                if entry.task is None and now >= entry.next_refresh:
+                    self._refresh(entry)
+            due = [entry.next_refresh for entry in self.entries.values() if entry.task is None]
+            # `asyncio.wait` rather than `wait_for`, which loses a cancellation arriving as the event is set (Python < 3.12),
+            # so that `stop()` could wait forever:
+            wake = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait([wake], timeout=max(min(due) - time.time(), 0.0) if due else None)
+            finally:
+                wake.cancel()
+
+    async def start(self) -> "AsyncRefreshScheduler":
+        """
+        Starts the background task refreshing the entries as they become due, on the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def stop(self) -> None:
+        """
+        Stops the background task and cancels the running refreshes. Results are kept.
+        """
+        tasks = [entry.task for entry in self.entries.values() if entry.task is not None]
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __aenter__(self) -> "AsyncRefreshScheduler":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+
+class RefreshScheduler:
+    """
+    Synchronous wrapper around `AsyncRefreshScheduler`, returned by `IMFInstance.scheduler`. Refreshes run on the event loop
+    of the instance, in the background of the calling thread.
+    Usage:
+    >>> with imf_instance.scheduler() as scheduler:
+    >>>     key = scheduler.register('CPI', query_params, every=3600)
+    >>>     data = scheduler.get(key)  # Served from memory once warm, revalidated in the background when stale
+    """
+
+    def __init__(self, instance, max_concurrency: int = 4, retry_after: float = 60.0):
+
+        self.instance = instance
+
+        self.aio: AsyncRefreshScheduler = instance.aio.scheduler(max_concurrency, retry_after)
+        """
+        Asynchronous scheduler wrapped by this one.
+        """
+
+    def __getattr__(self, name: str):
+        if name == "aio":
+            raise AttributeError(name)
+        return getattr(self.aio, name)
+
+    def register(self, dataflow_id: str, query_params, every: float = 3600.0, **query_options) -> tuple:
+        """
+        Registers a query, refreshed every `every` seconds, and returns its key. See `AsyncRefreshScheduler.register`.
+        """
+        return self.instance.run(self.aio.register(dataflow_id, query_params, every, **query_options))
+
+    def register_metadata(self, dataflow_id: str, every: float = 24 * 3600.0) -> tuple:
+        """
+        Registers the structure metadata of a dataflow, refreshed every `every` seconds. See `AsyncRefreshScheduler.register_metadata`.
+        """
+        return self.instance.run(self.aio.register_metadata(dataflow_id, every))
+
+    def unregister(self, key: tuple) -> None:
+        self.instance.run(self._call(self.aio.unregister, key))
+
+    def get(self, key: tuple):
+        """
+        Returns the last good result of a registered entry, refreshing it in the background if it is stale. See `AsyncRefreshScheduler.get`.
+        """
+        return self.instance.run(self.aio.get(key))
+
+    def refresh(self, key: tuple):
+        """
+        Refreshes a registered entry now and returns the new result.
+        """
+        return self.instance.run(self.aio.refresh(key))
+
+    def dataflow(self, dataflow_id: str):
+        """
+        Returns a synchronous dataflow object wrapping the current dataflow object of a dataflow with registered entries.
+        """
+        dataflow = self.instance.Dataflow(dataflow_id, lazy=True)
+        dataflow.aio = self.instance.run(self.aio.dataflow(dataflow_id))
+        return dataflow
+
+    def metrics(self) -> pd.DataFrame:
+        return self.instance.run(self._call(self.aio.metrics))
+
+    @staticmethod
+    async def _call(fn, *args):
+        # Runs a plain method on the event loop of the instance, which owns the state of the scheduler:
+        return fn(*args)
+
+    def start(self) -> "RefreshScheduler":
+        self.instance.run(self.aio.start())
+        return self
+
+    def stop(self) -> None:
+        self.instance.run(self.aio.stop())
+
+    def __enter__(self) -> "RefreshScheduler":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
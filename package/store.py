@@ -0,0 +1,200 @@
+import json
+import os
+import re
+import shutil
+import time
+import pandas as pd
+from typing import Optional, List
+
+from .cache import default_directory
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+SCHEMA = pa.schema([("Entity", pa.string()), ("Date", pa.timestamp("ns")), ("Value", pa.float64())]) if pa is not None else None
+"""
+Schema of the files of an indicator partition, one row per observation.
+"""
+
+
+class DataStore:
+    """
+    Local columnar store of query results, partitioned by dataflow and indicator.
+    Each indicator partition is a directory of Arrow IPC files with one row per observation ("Entity", "Date", "Value").
+    Writes append a new file to the partitions they touch; reads memory-map the files, so the Arrow tables they build are zero-copy views.
+    A manifest per dataflow records which sub-keys (one per entity, e.g. "USA.CPI._T.IX.M") are held and the indicators they produced,
+    so a query can be served from the store for the entities it holds and from the network for the others.
+    Requires the optional `pyarrow` package.
+    Usage:
+    >>> store = DataStore()
+    >>> imf_instance = IMFInstance(store=store)
+    >>> data = imf_instance.Dataflow('CPI').query(query_params)  # Fetched, then written to the store
+    >>> data = imf_instance.Dataflow('CPI').query(query_params)  # Read from the store
+    >>> table = store.read_table('CPI', 'CPI__T_IX_M')  # Zero-copy Arrow table of a partition
+
+    Parameters:
+    directory (str): Root directory of the store. Defaults to "$XDG_CACHE_HOME/imf_data_fetcher/store" (or "~/.cache/imf_data_fetcher/store").
+    offline (bool): Store-only mode. Queries are served from the store alone and a sub-key it does not hold raises a LookupError.
+    """
+
+    def __init__(self, directory: Optional[str] = None, offline: bool = False):
+
+        if pa is None:
+            raise ImportError("The data store requires the 'pyarrow' package: pip install pyarrow")
+
+        if directory is None:
+            directory = default_directory("store")
+
+        self.directory = directory
+        self.offline = offline
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def partition(self, dataflow_id: str, indicator: str) -> str:
+        """
+        Returns the directory of an indicator partition.
+        """
+        return os.path.join(self.directory, dataflow_id, re.sub(r"[^A-Za-z0-9._+-]+", "_", indicator))
+
+    def manifest_path(self, dataflow_id: str) -> str:
+        return os.path.join(self.directory, dataflow_id, "manifest.json")
+
+    def manifest(self, dataflow_id: str) -> dict:
+        """
+        Returns the manifest of a dataflow: the name of its entity dimension and, for each sub-key held, its fetch time and indicators.
+        """
+        try:
+            with open(self.manifest_path(dataflow_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"entity_dimension": None, "keys": {}}
+
+    def _write_manifest(self, dataflow_id: str, manifest: dict) -> None:
+        path = self.manifest_path(dataflow_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    def missing(self, dataflow_id: str, sub_keys: List[str]) -> List[str]:
+        """
+        Returns the sub-keys the store does not hold.
+        """
+        held = self.manifest(dataflow_id)["keys"]
+        return [sub_key for sub_key in sub_keys if sub_key not in held]
+
+    def write(self, dataflow_id: str, frames: dict, sub_keys: List[str]) -> None:
+        """
+        Appends the DataFrames of a query result (one per indicator, dates as rows and entities as columns) to the store,
+        and records the sub-keys it answers. Sub-keys whose entity has no data are recorded with no indicator,
+        and a sub-key whose entity is a wildcard ("*") answers every indicator of the result.
+        """
+        manifest = self.manifest(dataflow_id)
+
+        for indicator, frame in frames.items():
+            if manifest["entity_dimension"] is None:
+                manifest["entity_dimension"] = frame.columns.name
+
+            long = frame.rename_axis(index="Date", columns="Entity").stack().dropna().rename("Value").reset_index()
+            if long.empty:
+                continue
+            table = pa.table(
+                {
+                    "Entity": pa.array(long["Entity"].astype(str).to_numpy(), type=pa.string()),
+                    "Date": pa.array(long["Date"].to_numpy(dtype="datetime64[ns]"), type=pa.timestamp("ns")),
+                    "Value": pa.array(long["Value"].to_numpy(dtype="float64"), type=pa.float64()),
+                },
+                schema=SCHEMA,
+            )
+
+            self._write_part(self.partition(dataflow_id, indicator), table)
+
+        fetched_at = time.time()
+        for sub_key in sub_keys:
+            entity = sub_key.split(".")[0]
+            indicators = [indicator for indicator, frame in frames.items() if entity == "*" or entity in frame.columns]
+            manifest["keys"][sub_key] = {"fetched_at": fetched_at, "indicators": indicators}
+        self._write_manifest(dataflow_id, manifest)
+
+    def _write_part(self, directory: str, table: "pa.Table") -> None:
+        # Part files are named after their write time, so sorting their names gives the write order:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{time.time_ns():020d}.arrow")
+        with pa.OSFile(f"{path}.tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+
+    def read_table(self, dataflow_id: str, indicator: str, entities: Optional[List[str]] = None) -> "pa.Table":
+        """
+        Returns the observations of an indicator partition as an Arrow table, memory-mapped from its files,
+        optionally restricted to some entities. Files are concatenated in write order, so later rows of an observation supersede earlier ones.
+        """
+        directory = self.partition(dataflow_id, indicator)
+        tables = []
+        for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+            if name.endswith(".arrow"):
+                with pa.memory_map(os.path.join(directory, name), "r") as source:
+                    table = pa.ipc.open_file(source).read_all()
+                # Files compacted by earlier versions may hold large strings:
+                tables.append(table if table.schema.equals(SCHEMA) else table.cast(SCHEMA))
+        if not tables:
+            return SCHEMA.empty_table()
+
+        table = pa.concat_tables(tables)
+        if entities is not None:
+            table = table.filter(pc.is_in(table["Entity"], value_set=pa.array(entities, type=pa.string())))
+        return table
+
+    def read(self, dataflow_id: str, sub_keys: List[str]) -> dict:
+        """
+        Returns the dictionary of DataFrames (one per indicator, dates as rows and entities as columns) held for some sub-keys.
+        In offline mode, a sub-key the store does not hold raises a LookupError.
+        """
+        manifest = self.manifest(dataflow_id)
+
+        entities_by_indicator: dict = {}
+        for sub_key in sub_keys:
+            held = manifest["keys"].get(sub_key)
+            if held is None:
+                if self.offline:
+                    raise LookupError(f"'{dataflow_id}/{sub_key}' is not in the data store ({self.directory}) and the store is in offline mode.")
+                continue
+            for indicator in held["indicators"]:
+                entities_by_indicator.setdefault(indicator, []).append(sub_key.split(".")[0])
+
+        frames = {}
+        for indicator, entities in entities_by_indicator.items():
+            df = self.read_table(dataflow_id, indicator, None if "*" in entities else entities).to_pandas()
+            df = df.drop_duplicates(subset=["Entity", "Date"], keep="last")
+            frame = df.pivot(index="Date", columns="Entity", values="Value")
+            frame.index.name = "Date"
+            frame.columns.name = manifest["entity_dimension"]
+            frames[indicator] = frame
+        return frames
+
+    def compact(self, dataflow_id: str) -> None:
+        """
+        Rewrites each partition of a dataflow as a single file without superseded rows.
+        """
+        root = os.path.join(self.directory, dataflow_id)
+        for name in os.listdir(root) if os.path.isdir(root) else []:
+            directory = os.path.join(root, name)
+            if not os.path.isdir(directory):
+                continue
+            parts = sorted(part for part in os.listdir(directory) if part.endswith(".arrow"))
+            if len(parts) <= 1:
+                continue
+            df = self.read_table(dataflow_id, name).to_pandas().drop_duplicates(subset=["Entity", "Date"], keep="last")
+            self._write_part(directory, pa.Table.from_pandas(df.reset_index(drop=True), schema=SCHEMA, preserve_index=False))
+            for part in parts:
+                os.remove(os.path.join(directory, part))
+
+    def clear(self, dataflow_id: Optional[str] = None) -> None:
+        """
+        Removes a dataflow (or every dataflow) from the store.
+        """
+        for name in [dataflow_id] if dataflow_id is not None else os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
@@ -1,15 +1,78 @@
+import csv
+import io
+import numpy as np
 import pandas as pd
 import re
+import sys
+import weakref
+from array import array
+from collections.abc import Mapping
+from datetime import date, timedelta
+from typing import Optional
+
+from .instrumentation import instrumented
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+CONCEPT_URN = re.compile(r"Concept=(.*?):(.*?)\((.*?)\)\.(.*)")
+CODELIST_URN = re.compile(r"Codelist=(.*?):(.*?)\((.*?)\)")
+
+
+def english(value, default=None):
+    """
+    Returns the English text of an SDMX localised string, which is either a {"en": ...} dictionary or a plain string.
+    """
+    if isinstance(value, dict):
+        return value.get("en", default)
+    return value
+
+
+def dimension_concepts(details: dict) -> dict:
+    """
+    Returns a dictionary mapping each "detail_<ConceptID>" key of the concept scheme responses to the concept with that ID,
+    or None if the response failed or does not contain it. Each distinct response is indexed by concept ID once.
+    """
+    indexes, concepts = {}, {}
+    for key, res in details.items():
+        if isinstance(res, Exception) or not res or not res.get("data"):
+            concepts[key] = None
+            continue
+        index = indexes.get(id(res))
+        if index is None:
+            index = indexes[id(res)] = {c.get("id"): c for scheme in res["data"]["conceptSchemes"] for c in scheme["concepts"]}
+        concepts[key] = index.get(key[len("detail_") :])
+    return concepts
 
 
+@instrumented("process_dataflow_dimensions", size=len)
 def process_dataflow_dimensions(response) -> pd.DataFrame:
     dims_json = response["dimensions"]["data"]["dataStructures"][0]["dataStructureComponents"]["dimensionList"]["dimensions"]
-    rows = []
+    concepts = dimension_concepts(response["dimension_details"])
 
+    rows = []
     for dim in dims_json:
-        urn = dim.get("conceptIdentity", "")
-        m = re.search(r"Concept=(.*?):(.*?)\((.*?)\)\.(.*)", urn)
+        m = CONCEPT_URN.search(dim.get("conceptIdentity", ""))
         agency, scheme, version, cid = m.groups() if m else (None,) * 4
+
+        concept = concepts.get(f"detail_{cid}")
+        name, description, codelist = None, None, (None,) * 3
+        if concept is not None:
+            name = english(concept.get("name", cid))
+            description = english(concept.get("description", ""), "")
+            enum = concept.get("coreRepresentation", {}).get("enumeration")
+            m2 = CODELIST_URN.search(enum) if enum else None
+            if m2:
+                codelist = m2.groups()
+
         rows.append(
             {
                 "ConceptID": cid,
@@ -17,182 +80,804 @@ def process_dataflow_dimensions(response) -> pd.DataFrame:
                 "ConceptScheme": scheme,
                 "ConceptVersion": version,
                 "ConceptPosition": dim.get("position"),
-                "ConceptName": dim.get("name", {}).get("en", dim.get("id")),
+                "ConceptName": english(dim.get("name", {}), dim.get("id")),
+                "DimensionName": name,
+                "DimensionDescription": description,
+                "CodelistAgencyID": codelist[0],
+                "CodelistID": codelist[1],
+                "CodelistVersion": codelist[2],
             }
         )
 
-    df = pd.DataFrame(rows)
-
-    details = response["dimension_details"]
-    pattern = re.compile(r"Codelist=(.*?):(.*?)\((.*?)\)")
-
-    for i, row in df.iterrows():
-        key = f"detail_{row['ConceptID']}"
-        res = details.get(key, {})
-        if isinstance(res, Exception) or not res.get("data"):
-            df.at[i, "DimensionName"] = None
-            df.at[i, "DimensionDescription"] = None
-            df.at[i, "CodelistAgencyID"] = None
-            df.at[i, "CodelistID"] = None
-            df.at[i, "CodelistVersion"] = None
-            continue
-
-        concept = next(c for c in res["data"]["conceptSchemes"][0]["concepts"] if c.get("id") == row["ConceptID"])
-
-        nf = concept.get("name", row["ConceptID"])
-        df.at[i, "DimensionName"] = nf.get("en") if isinstance(nf, dict) else nf
-
-        df.at[i, "DimensionDescription"] = concept.get("description", {}).get("en", "") if isinstance(concept.get("description"), dict) else concept.get("description", "")
-
-        enum = concept.get("coreRepresentation", {}).get("enumeration")
-        if enum:
-            m2 = pattern.search(enum)
-            if m2:
-                df.at[i, "CodelistAgencyID"] = m2.group(1)
-                df.at[i, "CodelistID"] = m2.group(2)
-                df.at[i, "CodelistVersion"] = m2.group(3)
-            else:
-                df.at[i, "CodelistAgencyID"] = None
-                df.at[i, "CodelistID"] = None
-                df.at[i, "CodelistVersion"] = None
-        else:
-            df.at[i, "CodelistAgencyID"] = None
-            df.at[i, "CodelistID"] = None
-            df.at[i, "CodelistVersion"] = None
-
-    return df
+    return pd.DataFrame(rows)
 
 
+@instrumented("process_dimension_details", size=len)
 def process_dimension_details(response, dimensions_dataframe: pd.DataFrame) -> pd.DataFrame:
-    details = response["dimension_details"]
-    dimensions_dataframe["CodelistAgencyID"] = None
-    dimensions_dataframe["CodelistID"] = None
-
-    for idx, row in dimensions_dataframe.iterrows():
-        key = f"detail_{row['ConceptID']}"
-        res = details.get(key)
-        if isinstance(res, Exception):
-            continue
-        concepts = res["data"]["conceptSchemes"][0]["concepts"]
-        concept = next(c for c in concepts if c["id"] == row["ConceptID"])
-        enum = concept.get("coreRepresentation", {}).get("enumeration")
-        if not enum:
-            continue
-        m = re.search(r"Codelist=(.*?):(.*?)\(", enum)
-        if m:
-            dimensions_dataframe.at[idx, "CodelistAgencyID"] = m.group(1)
-            dimensions_dataframe.at[idx, "CodelistID"] = m.group(2)
+    concepts = dimension_concepts(response["dimension_details"])
+
+    agencies, ids = [], []
+    for cid in dimensions_dataframe["ConceptID"]:
+        concept = concepts.get(f"detail_{cid}")
+        enum = concept.get("coreRepresentation", {}).get("enumeration") if concept else None
+        m = CODELIST_URN.search(enum) if enum else None
+        agencies.append(m.group(1) if m else None)
+        ids.append(m.group(2) if m else None)
+
+    dimensions_dataframe["CodelistAgencyID"] = pd.Series(agencies, index=dimensions_dataframe.index, dtype=object)
+    dimensions_dataframe["CodelistID"] = pd.Series(ids, index=dimensions_dataframe.index, dtype=object)
     return dimensions_dataframe
 
 
-def process_codelists(response, dimensions_dataframe: pd.DataFrame) -> dict:
+class CodeTable:
+    """
+    Compact codelist: arrays of the IDs and names of its codes, whose strings are interned so that equal codes share one object.
+    Behaves as the list of {"ID": ..., "Name": ...} dictionaries it stands for (length, indexing, iteration), each built on access.
+    """
+
+    __slots__ = ("ids", "names", "_positions", "__weakref__")
+
+    def __init__(self, ids, names):
+        self.ids = np.array([sys.intern(code) if isinstance(code, str) else code for code in ids], dtype=object)
+        self.names = np.array([sys.intern(name) if isinstance(name, str) else name for name in names], dtype=object)
+        self._positions: Optional[dict] = None
+
+    @property
+    def positions(self) -> dict:
+        """
+        Dictionary mapping each code to its position in the table, built on first use.
+        """
+        if self._positions is None:
+            self._positions = {code: i for i, code in enumerate(self.ids)}
+        return self._positions
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [{"ID": code, "Name": name} for code, name in zip(self.ids[i], self.names[i])]
+        return {"ID": self.ids[i], "Name": self.names[i]}
+
+    def __iter__(self):
+        for code, name in zip(self.ids, self.names):
+            yield {"ID": code, "Name": name}
+
+    def __repr__(self) -> str:
+        return f"CodeTable({len(self)} codes)"
+
+    def take(self, indices: np.ndarray) -> "CodeTable":
+        """
+        Returns the table of the codes at some positions, sharing their strings.
+        """
+        table = CodeTable.__new__(CodeTable)
+        table.ids, table.names, table._positions = self.ids[indices], self.names[indices], None
+        return table
+
+
+CODE_TABLES: "weakref.WeakValueDictionary[tuple, CodeTable]" = weakref.WeakValueDictionary()
+"""
+Code tables in use, keyed by codelist (agency ID, codelist ID, version), so that the dataflow objects sharing a codelist share its table.
+"""
+
+
+def code_table(key: tuple, codes: list) -> CodeTable:
+    """
+    Returns the `CodeTable` of the codes of a codelist response, reusing the table of the same codelist if one is in use.
+    """
+    table = CODE_TABLES.get(key)
+    if table is None or len(table) != len(codes):
+        table = CodeTable([code["id"] for code in codes], [english(code.get("name", code["id"]), code["id"]) for code in codes])
+        CODE_TABLES[key] = table
+    return table
+
+
+class AvailableCodes(Mapping):
+    """
+    Available values of a dimension: the positions of the available codes in the `CodeTable` of the dimension (an int32 array,
+    in availability order), with a mask of the table for constant-time lookups.
+    Behaves as a read-only dictionary mapping each available code to its name.
+    """
+
+    __slots__ = ("table", "indices", "_mask")
+
+    def __init__(self, table: CodeTable, indices: np.ndarray):
+        self.table = table
+        self.indices = indices
+        self._mask = np.zeros(len(table), dtype=bool)
+        self._mask[indices] = True
+
+    def __contains__(self, code) -> bool:
+        position = self.table.positions.get(code)
+        return position is not None and bool(self._mask[position])
+
+    def __getitem__(self, code):
+        position = self.table.positions.get(code)
+        if position is None or not self._mask[position]:
+            raise KeyError(code)
+        return self.table.names[position]
+
+    def __iter__(self):
+        return iter(self.table.ids[self.indices])
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __repr__(self) -> str:
+        return f"AvailableCodes({len(self)} of {len(self.table)} codes)"
+
+    def records(self) -> CodeTable:
+        """
+        Returns the available values as a `CodeTable` (a list of {"ID": ..., "Name": ...} dictionaries).
+        """
+        return self.table.take(self.indices)
+
+
+@instrumented("process_codelists", size=lambda codelists: sum(map(len, codelists.values())))
+def process_codelists(response, dimensions_dataframe: pd.DataFrame, compact: bool = False) -> dict:
+    """
+    Returns a dictionary mapping each dimension to its codelist, a list of {"ID": ..., "Name": ...} dictionaries,
+    or with `compact` a `CodeTable` shared with the other dataflow objects using the same codelist.
+    """
     codelists = {}
-    for _, row in dimensions_dataframe.iterrows():
-        dim = row["ConceptID"]
-        cl_id = row["CodelistID"]
-        key = f"codelist_{cl_id}"
-        blob = response["codelists"].get(key)
+    # Plain column lists: building a frame of the four columns costs more than processing the codelists themselves:
+    n_dims = len(dimensions_dataframe)
+    columns = [dimensions_dataframe[column].tolist() if column in dimensions_dataframe else [None] * n_dims for column in ["ConceptID", "CodelistAgencyID", "CodelistID", "CodelistVersion"]]
+    for dim, cl_agency, cl_id, cl_version in zip(*columns):
+        blob = response["codelists"].get(f"codelist_{cl_id}")
         if not blob or isinstance(blob, Exception):
-            codelists[dim] = []
+            codelists[dim] = CodeTable([], []) if compact else []
             continue
 
         codes = blob["data"]["codelists"][0]["codes"]
-        values = []
-        for code in codes:
-            nf = code.get("name", code.get("id"))
-            if isinstance(nf, dict):
-                Name = nf.get("en", code["id"])
-            else:
-                Name = nf
-            values.append({"ID": code["id"], "Name": Name})
-        codelists[dim] = values
+        if compact:
+            codelists[dim] = code_table((cl_agency, cl_id, cl_version), codes)
+        else:
+            codelists[dim] = [{"ID": code["id"], "Name": english(code.get("name", code["id"]), code["id"])} for code in codes]
     return codelists
 
 
-def process_availability(response, codelists_dicts: dict) -> tuple[pd.DataFrame, dict]:
-    comp = response["availability"]["data"]["dataConstraints"][0]["cubeRegions"][0]["components"]
+@instrumented("process_availability", size=lambda result: len(result[0]))
+def process_availability(response, codelists_dicts: dict, compact: bool = False) -> tuple[pd.DataFrame, dict]:
+    """
+    Returns the available values of each dimension as a DataFrame ("DimensionID", "Value", "Name") and a dictionary mapping each
+    dimension to the list of its {"ID": ..., "Name": ...} values. With `compact`, the codelists are `CodeTable`s, the dictionary maps
+    each dimension to its `AvailableCodes` and the DataFrame columns reference the strings of the code tables.
+    """
+    # The time range of the cube is read by `availability_time_range`:
+    comp = [c for c in response["availability"]["data"]["dataConstraints"][0]["cubeRegions"][0]["components"] if "timeRange" not in c]
+    if compact:
+        return compact_availability(comp, codelists_dicts)
     df = pd.json_normalize(comp).rename(columns={"id": "DimensionID"})
     df = df.explode("values").reset_index(drop=True)
     df["Value"] = df["values"].apply(lambda x: x.get("value") if isinstance(x, dict) else None)
     df = df.drop(columns=["include", "removePrefix", "values"])
 
-    def lookup_name(row):
-        for item in codelists_dicts.get(row["DimensionID"], []):
-            if item["ID"] == row["Value"]:
-                return item["Name"]
-        return None
-
-    df["Name"] = df.apply(lookup_name, axis=1)  # type: ignore
+    # Code -> name index of each codelist, built once:
+    names = {dim: {item["ID"]: item["Name"] for item in items} for dim, items in codelists_dicts.items()}
+    df["Name"] = [names.get(dim, {}).get(value) for dim, value in zip(df["DimensionID"], df["Value"])]
 
     avail_dict = {dim: grp.rename(columns={"Value": "ID"})[["ID", "Name"]].to_dict("records") for dim, grp in df.groupby("DimensionID")}
     return df, avail_dict
 
 
-def process_queried_data(data) -> dict:
-    struct = data["data"]["structures"][0]
+def availability_time_range(response) -> Optional[tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Returns the first day of the first period and the last day of the last period with available data, from the time range
+    of the availability cube, or None if it has none. An open bound is NaT.
+    """
+    for component in response["availability"]["data"]["dataConstraints"][0]["cubeRegions"][0]["components"]:
+        time_range = component.get("timeRange")
+        if time_range is None:
+            continue
+        bounds = []
+        for name, parse in [("startPeriod", parse_time_period), ("endPeriod", parse_time_period_end)]:
+            bound = time_range.get(name)
+            period = bound.get("period") if isinstance(bound, dict) else bound
+            bounds.append(parse(period) if period else pd.NaT)
+        return bounds[0], bounds[1]
+    return None
+
+
+def compact_availability(components: list, code_tables: dict) -> tuple[pd.DataFrame, dict]:
+    """
+    Compact version of `process_availability`, taking the components of the availability cube and the code table of each dimension.
+    """
+    available = {}
+    for component in components:
+        dim = component["id"]
+        codes = [value.get("value") for value in component.get("values", []) if isinstance(value, dict)]
+        table = code_tables.get(dim)
+        if not isinstance(table, CodeTable):
+            table = CodeTable([], [])
+        # Codes missing from the codelist are appended to a copy of its table, without a name:
+        missing = list(dict.fromkeys(code for code in codes if code not in table.positions))
+        if missing:
+            table = CodeTable([*table.ids, *missing], [*table.names, *[None] * len(missing)])
+        positions = table.positions
+        available[dim] = AvailableCodes(table, np.fromiter((positions[code] for code in codes), dtype=np.int32, count=len(codes)))
+
+    dims, values = list(available), list(available.values())
+    df = pd.DataFrame(
+        {
+            "DimensionID": pd.Categorical.from_codes(np.repeat(np.arange(len(dims)), [len(v) for v in values]), categories=dims),
+            "Value": np.concatenate([v.table.ids[v.indices] for v in values]) if values else np.array([], dtype=object),
+            "Name": np.concatenate([v.table.names[v.indices] for v in values]) if values else np.array([], dtype=object),
+        }
+    )
+    return df, available
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """
+    Returns the number of bytes held by an object and the objects it references (containers, arrays, DataFrames, code tables).
+    Objects whose ID is in `seen` are not counted, and counted objects are added to it, so an object shared by several calls is counted once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        # An array owning its data counts it in its own size, a view does not:
+        size = sys.getsizeof(obj) + (obj.nbytes if obj.base is not None else 0)
+        if obj.dtype == object:
+            size += sum(deep_sizeof(item, seen) for item in obj.ravel())
+        return size
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(deep_sizeof(item, seen) for item in obj)
+    if isinstance(obj, (CodeTable, AvailableCodes)):
+        return sys.getsizeof(obj) + sum(deep_sizeof(getattr(obj, name), seen) for name in type(obj).__slots__ if name != "__weakref__")
+    return sys.getsizeof(obj)
+
+
+TIME_PERIOD_PATTERNS = [
+    (re.compile(r"(\d{4})(?:-A1?)?"), lambda y, _: date(y, 1, 1)),
+    (re.compile(r"(\d{4})-M?(\d{2})"), lambda y, m: date(y, m, 1)),
+    (re.compile(r"(\d{4})-Q([1-4])"), lambda y, q: date(y, 3 * (q - 1) + 1, 1)),
+    (re.compile(r"(\d{4})-S([12])"), lambda y, s: date(y, 6 * (s - 1) + 1, 1)),
+    (re.compile(r"(\d{4})-W(\d{2})"), lambda y, w: date.fromisocalendar(y, w, 1)),
+    (re.compile(r"(\d{4})-D(\d{3})"), lambda y, d: date(y, 1, 1) + timedelta(days=d - 1)),
+]
+
+
+def parse_time_period(period) -> pd.Timestamp:
+    """
+    Parses an SDMX reporting period ("2020", "2020-A1", "2020-M03", "2020-Q2", "2020-S1", "2020-W05", "2020-D032", "2020-03-15")
+    to the timestamp of its first day. Unknown formats fall back to `pd.to_datetime` and unparseable values give NaT.
+    """
+    if period is None:
+        return pd.NaT  # type: ignore
+    for pattern, start in TIME_PERIOD_PATTERNS:
+        m = pattern.fullmatch(period)
+        if m:
+            try:
+                return pd.Timestamp(start(int(m.group(1)), int(m.group(2)) if m.lastindex == 2 else 0))
+            except ValueError:
+                return pd.NaT  # type: ignore
+    return pd.to_datetime(period, errors="coerce")
+
+
+PERIOD_LENGTHS = [pd.DateOffset(years=1), pd.DateOffset(months=1), pd.DateOffset(months=3), pd.DateOffset(months=6), pd.DateOffset(weeks=1), pd.DateOffset(days=1)]
+"""
+Length of the reporting periods matched by each of `TIME_PERIOD_PATTERNS`.
+"""
+
+
+def parse_time_period_end(period) -> pd.Timestamp:
+    """
+    Parses an SDMX reporting period to the timestamp of its last day ("2020" -> 2020-12-31, "2020-Q2" -> 2020-06-30).
+    Dates and other formats give the day itself.
+    """
+    start = parse_time_period(period)
+    if period is None or pd.isna(start):
+        return start
+    for (pattern, _), length in zip(TIME_PERIOD_PATTERNS, PERIOD_LENGTHS):
+        if pattern.fullmatch(period):
+            return start + length - pd.Timedelta(days=1)
+    return start.normalize()
+
+
+def parse_time_periods(periods) -> np.ndarray:
+    """
+    Parses a sequence of distinct SDMX reporting periods to a datetime64[ns] array, one `parse_time_period` call per value.
+    """
+    return pd.DatetimeIndex([parse_time_period(p) for p in periods]).as_unit("ns").to_numpy()
+
+
+class CsvDataDecoder:
+    """
+    Incremental decoder for SDMX-CSV data messages, producing the same column arrays as `StreamingDataDecoder`.
+    Raw body chunks are fed as they arrive and parsed in batches of whole lines with the pandas C parser; each batch is
+    reduced to integer codes (series, periods) and float values, so only the column buffers grow with the message.
+    Dimension columns are the columns between the leading message columns (STRUCTURE, STRUCTURE_ID, ACTION...) and TIME_PERIOD.
+    Usage:
+    >>> decoder = CsvDataDecoder()
+    >>> for chunk in response.iter_bytes():
+    >>>     decoder.feed(chunk)
+    >>> struct, key_codes, series_pos, obs_idx, values = decoder.close()
+    >>> dfs = build_queried_frames(struct, key_codes, series_pos, obs_idx, values)
+
+    Parameters:
+    on_chunk (callable): Optional callback receiving `(key_codes, series_pos, obs_idx, values)` for each parsed batch.
+    When given, decoded batches are handed to the callback instead of being kept, and `series_pos` is relative to the batch.
+    chunk_rows (int): Number of lines parsed per batch.
+    """
+
+    MESSAGE_COLUMNS = {"DATAFLOW", "STRUCTURE", "STRUCTURE_ID", "STRUCTURE_NAME", "ACTION"}
+    """
+    Leading columns describing the message rather than the observations.
+    """
+
+    def __init__(self, on_chunk=None, chunk_rows: int = 500_000):
+
+        self.on_chunk = on_chunk
+        self.chunk_rows = chunk_rows
+
+        self._buffer = bytearray()
+        self._lines = 0
+        self.columns: Optional[list[str]] = None
+        self.dimensions: list[str] = []
+
+        # Code -> index of the values of each dimension, of the periods and of the series (tuples of dimension indices):
+        self._codes: list[dict] = []
+        self._periods: dict = {}
+        self._series: dict = {}
+
+        self._key_codes: list = []
+        self._series_pos: list = []
+        self._obs_idx: list = []
+        self._values: list = []
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        self._lines += chunk.count(b"\n")
+        if self.columns is None:
+            self._read_header()
+        if self._lines >= self.chunk_rows:
+            self._parse(final=False)
+
+    def _read_header(self) -> None:
+        end = self._buffer.find(b"\n")
+        if end < 0:
+            return
+        header = bytes(self._buffer[:end]).decode("utf-8-sig").strip()
+        del self._buffer[: end + 1]
+        self._lines -= 1
+
+        self.columns = next(csv.reader([header]))
+        first = next((i for i, column in enumerate(self.columns) if column not in self.MESSAGE_COLUMNS), len(self.columns))
+        last = self.columns.index("TIME_PERIOD") if "TIME_PERIOD" in self.columns else len(self.columns)
+        self.dimensions = self.columns[first:last]
+        self._codes = [{} for _ in self.dimensions]
+
+    def _parse(self, final: bool) -> None:
+        if self.columns is None:
+            return
+
+        # Complete lines only, and never inside a quoted field:
+        end = len(self._buffer) if final else self._buffer.rfind(b"\n") + 1
+        while not final and end > 0 and self._buffer.count(b'"', 0, end) % 2:
+            end = self._buffer.rfind(b"\n", 0, end - 1) + 1
+        if end <= 0:
+            return
+        data = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        self._lines = self._buffer.count(b"\n")
+
+        df = self._read_batch(data)
+        if "ACTION" in df:
+            df = df[df["ACTION"] != "D"]
+        if df.empty:
+            return
+
+        # Dimension codes of each row, numbered across batches:
+        codes = [self._number(df[dim], mapping) for dim, mapping in zip(self.dimensions, self._codes)]
+
+        # Series of each row, numbered in order of first appearance (pairwise factorization keeps the combined codes small):
+        n_rows = len(df)
+        batch_series = np.zeros(n_rows, dtype=np.int64)
+        for dim_codes in codes:
+            batch_series, _ = pd.factorize(batch_series * (int(dim_codes.max()) + 1) + dim_codes)
+        first_rows = np.unique(batch_series, return_index=True)[1]
+        series_codes = np.stack(codes, axis=1)[first_rows] if codes else np.zeros((len(first_rows), 0), dtype=np.int64)
+
+        obs_idx = self._number(df["TIME_PERIOD"], self._periods) if "TIME_PERIOD" in df else np.full(n_rows, self._periods.setdefault("", len(self._periods)), dtype=np.int64)
+
+        values = pd.to_numeric(df["OBS_VALUE"], errors="coerce").to_numpy(dtype=np.float64) if "OBS_VALUE" in df else np.full(n_rows, np.nan)
+
+        if self.on_chunk is not None:
+            self.on_chunk(series_codes, batch_series, obs_idx, values)
+            return
+
+        known = len(self._series)
+        remap = np.fromiter((self._series.setdefault(key, len(self._series)) for key in map(tuple, series_codes.tolist())), dtype=np.int64, count=len(series_codes))
+        self._key_codes.append(series_codes[remap >= known])
+        self._series_pos.append(remap[batch_series])
+        self._obs_idx.append(obs_idx)
+        self._values.append(values)
+
+    @staticmethod
+    def _number(column: pd.Series, mapping: dict) -> np.ndarray:
+        # Numbers the values of a categorical column across batches, new values in order of first appearance:
+        codes, categories = column.cat.codes.to_numpy(), column.cat.categories
+        remap = np.zeros(len(categories), dtype=np.int64)
+        for code in pd.unique(codes):
+            remap[code] = mapping.setdefault(categories[code], len(mapping))
+        return remap[codes]
+
+    def _read_batch(self, data: bytes) -> pd.DataFrame:
+        # Dimensions and periods are parsed to categoricals (integer codes and their distinct values) by the C parser:
+        usecols = [c for c in [*self.dimensions, "TIME_PERIOD", "OBS_VALUE", "ACTION"] if c in self.columns]  # type: ignore
+        dtype = {c: "category" for c in [*self.dimensions, "TIME_PERIOD"]}
+        options = dict(header=None, names=self.columns, usecols=usecols, keep_default_na=False, na_values={"OBS_VALUE": ["", "NaN", "NA"]})
+        try:
+            return pd.read_csv(io.BytesIO(data), dtype={**dtype, "OBS_VALUE": "float64", "ACTION": str}, **options)
+        except ValueError:
+            # Non-numeric observation values are read as text, then coerced to NaN:
+            return pd.read_csv(io.BytesIO(data), dtype={**dtype, "OBS_VALUE": str, "ACTION": str}, **options)
+
+    def close(self) -> tuple[Optional[dict], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finishes decoding and returns the structure of the message (rebuilt from the codes it contains) followed by the column arrays.
+        """
+        if self.columns is None:
+            self._buffer += b"\n"
+            self._read_header()
+        self._parse(final=True)
+        if self.columns is None:
+            return None, np.empty((0, 0), dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        struct = {
+            "dimensions": {
+                "series": [{"id": dim, "values": [{"id": code} for code in mapping]} for dim, mapping in zip(self.dimensions, self._codes)],
+                "observation": [{"id": "TIME_PERIOD", "values": [{"value": period} for period in self._periods]}],
+            }
+        }
+        n_dims = len(self.dimensions)
+        key_codes = np.concatenate(self._key_codes) if self._key_codes else np.empty((0, n_dims), dtype=np.int64)
+        columns = [np.concatenate(buffer) if buffer else np.empty(0, dtype=dtype) for buffer, dtype in [(self._series_pos, np.int64), (self._obs_idx, np.int64), (self._values, np.float64)]]
+        return (struct, key_codes, *columns)
+
+
+@instrumented("decode_csv", size=lambda decoded: len(decoded[4]))
+def decode_csv(data: bytes) -> tuple[Optional[dict], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodes a whole SDMX-CSV data message to its structure and column arrays, see `CsvDataDecoder`.
+    """
+    decoder = CsvDataDecoder(chunk_rows=2**62)
+    decoder.feed(data)
+    return decoder.close()
+
+
+@instrumented("decode_series", size=lambda columns: len(columns[3]))
+def decode_series(series_data: dict, n_dims: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodes the "series" object of an SDMX-JSON dataset to columnar arrays:
+    - key_codes: (n_series, n_dims) array of dimension value indices, one row per series,
+    - series_pos: series row of each observation,
+    - obs_idx: observation dimension (time period) index of each observation,
+    - values: observation values as float64, NaN when missing.
+    """
+    n_series = len(series_data)
+    key_codes = np.fromiter((int(i) for key in series_data for i in key.split(":")), dtype=np.int64, count=n_series * n_dims).reshape(n_series, n_dims)
+
+    counts = np.empty(n_series, dtype=np.int64)
+    obs_keys, obs_values = [], []
+    for i, series_obj in enumerate(series_data.values()):
+        observations = series_obj.get("observations", {})
+        counts[i] = len(observations)
+        obs_keys.extend(observations.keys())
+        obs_values.extend(obs[0] if obs else None for obs in observations.values())
+
+    series_pos = np.repeat(np.arange(n_series, dtype=np.int64), counts)
+    obs_idx = np.fromiter(map(int, obs_keys), dtype=np.int64, count=len(obs_keys))
+    values = pd.to_numeric(pd.Series(obs_values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+
+    return key_codes, series_pos, obs_idx, values
+
+
+def observation_value(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+SERIES_PREFIX = "data.dataSets.item.series"
+"""
+Prefix of the parser events of the series of the datasets of an SDMX-JSON data message, keyed by series key.
+"""
+
+STRUCTURES_PREFIX = "data.structures.item"
+"""
+Prefix of the parser events of each structure of an SDMX-JSON data message.
+"""
+
+
+class StreamingDataDecoder:
+    """
+    Incremental decoder for SDMX-JSON data messages.
+    Raw body chunks are fed as they arrive and each series is decoded into compact column buffers
+    (the same arrays as `decode_series`) as soon as it is complete, so the full JSON tree is never held in memory.
+    Requires the optional `ijson` package.
+    Usage:
+    >>> decoder = StreamingDataDecoder()
+    >>> for chunk in response.iter_bytes():
+    >>>     decoder.feed(chunk)
+    >>> struct, key_codes, series_pos, obs_idx, values = decoder.close()
+    >>> dfs = build_queried_frames(struct, key_codes, series_pos, obs_idx, values)
+
+    Parameters:
+    on_chunk (callable): Optional callback receiving `(key_codes, series_pos, obs_idx, values)` every `chunk_series` series.
+    When given, decoded series are handed to the callback instead of being kept, and `series_pos` is relative to the chunk.
+    chunk_series (int): Number of series per callback chunk.
+    """
+
+    def __init__(self, on_chunk=None, chunk_series: int = 10_000):
+
+        if ijson is None:
+            raise ImportError("Streaming decoding requires the 'ijson' package: pip install ijson")
+
+        self.on_chunk = on_chunk
+        self.chunk_series = chunk_series
+
+        # A single tokenizer pass: its events are dispatched on their prefix to the series or the structure being decoded:
+        self._events = ijson.sendable_list()
+        self._parser = ijson.parse_coro(self._events)
+        self._structures: list = []
+        self._structure = None
+        self._observations_prefix = None
+        self._value_pending = False
+
+        self.n_dims = 0
+        self.n_series = 0
+        self._reset_buffers()
+
+    def _reset_buffers(self) -> None:
+        self._key_codes = array("q")
+        self._series_pos = array("q")
+        self._obs_idx = array("q")
+        self._values = array("d")
+        self._chunk_start = self.n_series
+
+    def feed(self, chunk: bytes) -> None:
+        self._parser.send(chunk)
+        self._consume()
+
+    def _consume(self) -> None:
+        for prefix, event, value in self._events:
+            if self._value_pending:
+                # The value of an observation is the first item of its array, the others are attribute indices:
+                if event == "start_array":
+                    continue
+                self._values.append(np.nan if event == "end_array" else observation_value(value))
+                self._value_pending = False
+            elif prefix == self._observations_prefix:
+                if event == "map_key":
+                    self._series_pos.append(self.n_series - 1 - self._chunk_start)
+                    self._obs_idx.append(int(value))
+                    self._value_pending = True
+            elif self._structure is not None:
+                self._structure.event(event, value)
+                if prefix == STRUCTURES_PREFIX and event == "end_map":
+                    self._structures.append(self._structure.value)
+                    self._structure = None
+            elif prefix == SERIES_PREFIX:
+                if event == "map_key":
+                    self._start_series(value)
+            elif prefix == STRUCTURES_PREFIX and event == "start_map":
+                self._structure = ijson.ObjectBuilder()
+                self._structure.event(event, value)
+        del self._events[:]
+
+    def _start_series(self, series_key: str) -> None:
+        # The previous series is complete, so a chunk can be handed over before this one starts:
+        if self.on_chunk is not None and self.n_series - self._chunk_start >= self.chunk_series:
+            self._flush()
+        codes = series_key.split(":")
+        self.n_dims = len(codes)
+        self._key_codes.extend(map(int, codes))
+        self._observations_prefix = f"{SERIES_PREFIX}.{series_key}.observations"
+        self.n_series += 1
+
+    def _columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        key_codes = np.frombuffer(self._key_codes, dtype=np.int64).reshape(-1, self.n_dims) if self.n_dims else np.empty((0, 0), dtype=np.int64)
+        return key_codes, np.frombuffer(self._series_pos, dtype=np.int64), np.frombuffer(self._obs_idx, dtype=np.int64), np.frombuffer(self._values, dtype=np.float64)
+
+    def _flush(self) -> None:
+        if self.n_series > self._chunk_start:
+            self.on_chunk(*self._columns())  # type: ignore
+        self._reset_buffers()
+
+    def close(self) -> tuple[Optional[dict], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finishes decoding and returns the structure of the message followed by the column arrays.
+        """
+        self._parser.close()
+        self._consume()
+        if self.on_chunk is not None:
+            self._flush()
+
+        struct = self._structures[0] if self._structures else None
+        return (struct, *self._columns())
+
+
+OUTPUT_FORMATS = ("pivot", "long", "numpy", "arrow")
+"""
+Formats of a query result:
+- "pivot": dictionary of DataFrames, one per indicator, with dates as rows and entities as columns,
+- "long": a single tidy DataFrame with one row per observation, a categorical column per series dimension, "Date" and "Value",
+- "numpy": dictionary of NumPy arrays with the same columns as "long", dimension columns holding value IDs,
+- "arrow": Arrow table with the same columns as "long", dimension columns dictionary-encoded (requires `pyarrow`).
+"""
+
+
+VALUE_DTYPES = ("float64", "float32")
+"""
+Data types of the observation values of a query result. "float32" halves their memory, with about 7 significant digits.
+"""
+
+
+def check_output(output: str, value_dtype: str = "float64") -> None:
+    """
+    Raises if a query result format or value data type is unknown, or needs a missing optional package.
+    """
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output}'. Expected one of {OUTPUT_FORMATS}.")
+    if value_dtype not in VALUE_DTYPES:
+        raise ValueError(f"Unknown value data type '{value_dtype}'. Expected one of {VALUE_DTYPES}.")
+    if output == "arrow" and pa is None:
+        raise ImportError("The 'arrow' output requires the 'pyarrow' package: pip install pyarrow")
+
+
+def output_size(result) -> int:
+    """
+    Returns the number of observations in a query result of any format.
+    """
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if pa is not None and isinstance(result, pa.Table):
+        return result.num_rows
+    if "Value" in result and isinstance(result["Value"], np.ndarray):
+        return len(result["Value"])
+    return sum(int(frame.count().sum()) for frame in result.values())
+
+
+def queried_labels(struct: dict, obs_idx: np.ndarray) -> tuple[list[str], list[np.ndarray], np.ndarray]:
+    """
+    Returns the IDs of the series dimensions, the array of value IDs of each, and the date of each observation.
+    Dates are parsed once per distinct period; out-of-range period indices give NaT.
+    """
     dim_series = struct["dimensions"]["series"]
     series_dims = [d["id"] for d in dim_series]
-    series_values = {d["id"]: [v["id"] for v in d["values"]] for d in dim_series}
+    series_values = [np.array([v["id"] for v in d["values"]], dtype=object) for d in dim_series]
 
-    entity_dim = series_dims[0]
-    indicator_dims = series_dims[1:]
+    time_values = [v["value"] for v in struct["dimensions"]["observation"][0]["values"]]
+    dates = np.append(parse_time_periods(time_values), np.datetime64("NaT", "ns"))
+    obs_idx = np.where((obs_idx >= 0) & (obs_idx < len(time_values)), obs_idx, len(time_values))
 
-    dim_obs = struct["dimensions"]["observation"][0]
-    time_values = [v["value"] for v in dim_obs["values"]]
+    return series_dims, series_values, dates[obs_idx]
 
-    series_data = data["data"]["dataSets"][0]["series"]
-    records = []
 
-    for series_key, series_obj in series_data.items():
-        idxs = list(map(int, series_key.split(":")))
-        entry = {series_dims[i]: series_values[series_dims[i]][idxs[i]] for i in range(len(idxs))}
+@instrumented("build_queried_frames", size=output_size)
+def build_queried_frames(struct: dict, key_codes: np.ndarray, series_pos: np.ndarray, obs_idx: np.ndarray, values: np.ndarray) -> dict:
+    """
+    Builds the dictionary of pivoted DataFrames (one per indicator, dates as rows and entities as columns)
+    from the columnar arrays returned by `decode_series` and the structure of the data message.
+    """
+    if len(values) == 0:
+        return {}
 
-        entity = entry[entity_dim]
-        if indicator_dims:
-            indic_parts = [entry[dim] for dim in indicator_dims]
-            Indicator = "_".join(indic_parts)
-        else:
-            Indicator = entity_dim
-
-        for obs_idx, obs_vals in series_obj["observations"].items():
-            obs_idx = int(obs_idx)
-            val = obs_vals[0]
-
-            if obs_idx < len(time_values):
-                date_str = time_values[obs_idx]
-            else:
-                date_str = None
-
-            if date_str is None:
-                date = pd.NaT
-            elif re.fullmatch(r"\d{4}", date_str):
-                date = pd.to_datetime(date_str, format="%Y")
-            elif re.fullmatch(r"\d{4}-M\d{2}", date_str):
-                date = pd.to_datetime(date_str.replace("M", ""), format="%Y-%m")
-            elif re.fullmatch(r"\d{4}-Q[1-4]", date_str):
-                year, q = date_str.split("-Q")
-                mois_par_quarter = {"1": "01", "2": "04", "3": "07", "4": "10"}
-                month = mois_par_quarter[q]
-                date = pd.to_datetime(f"{year}-{month}", format="%Y-%m")
-            else:
-                date = pd.to_datetime(date_str, errors="coerce")
-
-            records.append(
-                {
-                    entity_dim: entity,
-                    "Indicator": Indicator,
-                    "Date": date,
-                    "Value": float(val) if val is not None else None,
-                }
-            )
-
-    df_all = pd.DataFrame(records)
+    series_dims, series_values, dates = queried_labels(struct, obs_idx)
+    entity_dim = series_dims[0]
 
+    # Entity and indicator labels, resolved once per series:
+    series_entities = series_values[0][key_codes[:, 0]]
+    if len(series_dims) > 1:
+        parts = [series_values[i][key_codes[:, i]] for i in range(1, len(series_dims))]
+        series_indicators = np.array(["_".join(p) for p in zip(*parts)], dtype=object)
+    else:
+        series_indicators = np.full(len(key_codes), entity_dim, dtype=object)
+
+    # Indicator codes, numbered in order of first appearance, so the groups below come out in that order:
+    indicator_codes, indicators = pd.factorize(series_indicators)
+
+    df_all = pd.DataFrame({entity_dim: series_entities[series_pos], "Date": dates, "Value": values})
+
+    # One split of the observations by indicator:
     dfs = {}
-    for indic in df_all["Indicator"].unique():
-        df_ind = df_all[df_all["Indicator"] == indic].copy()
+    for code, df_ind in df_all.groupby(indicator_codes[series_pos], sort=True):
         df_pivot = df_ind.pivot(index="Date", columns=entity_dim, values="Value")
         df_pivot.index.name = "Date"
-        dfs[indic] = df_pivot
+        dfs[indicators[code]] = df_pivot
 
     return dfs
+
+
+@instrumented("build_queried_long", size=output_size)
+def build_queried_long(struct: dict, key_codes: np.ndarray, series_pos: np.ndarray, obs_idx: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    """
+    Builds a tidy DataFrame with one row per observation from the columnar arrays returned by `decode_series`.
+    Each series dimension is a categorical column sharing the value IDs of the structure, so its rows only hold integer codes.
+    """
+    series_dims, series_values, dates = queried_labels(struct, obs_idx)
+    columns = {dim: pd.Categorical.from_codes(key_codes[series_pos, i], categories=labels) for i, (dim, labels) in enumerate(zip(series_dims, series_values))}
+    return pd.DataFrame({**columns, "Date": dates, "Value": values})
+
+
+@instrumented("build_queried_arrays", size=output_size)
+def build_queried_arrays(struct: dict, key_codes: np.ndarray, series_pos: np.ndarray, obs_idx: np.ndarray, values: np.ndarray) -> dict:
+    """
+    Builds a dictionary of NumPy arrays with one entry per observation from the columnar arrays returned by `decode_series`:
+    the value ID of each series dimension, "Date" and "Value".
+    """
+    series_dims, series_values, dates = queried_labels(struct, obs_idx)
+    columns = {dim: labels[key_codes[series_pos, i]] for i, (dim, labels) in enumerate(zip(series_dims, series_values))}
+    return {**columns, "Date": dates, "Value": values}
+
+
+@instrumented("build_queried_table", size=output_size)
+def build_queried_table(struct: dict, key_codes: np.ndarray, series_pos: np.ndarray, obs_idx: np.ndarray, values: np.ndarray) -> "pa.Table":
+    """
+    Builds an Arrow table with one row per observation from the columnar arrays returned by `decode_series`.
+    Each series dimension is a dictionary-encoded column: integer codes indexing the value IDs of the structure.
+    """
+    series_dims, series_values, dates = queried_labels(struct, obs_idx)
+    columns = {
+        dim: pa.DictionaryArray.from_arrays(pa.array(key_codes[series_pos, i], type=pa.int32()), pa.array(labels, type=pa.string()))
+        for i, (dim, labels) in enumerate(zip(series_dims, series_values))
+    }
+    return pa.table({**columns, "Date": pa.array(dates, type=pa.timestamp("ns")), "Value": pa.array(values)})
+
+
+BUILDERS = {"pivot": build_queried_frames, "long": build_queried_long, "numpy": build_queried_arrays, "arrow": build_queried_table}
+"""
+Builder of each query result format, taking the structure of a data message and the columnar arrays returned by `decode_series`.
+"""
+
+
+def empty_output(output: str = "pivot"):
+    """
+    Returns the result of a query without data, in a result format.
+    """
+    if output == "pivot":
+        return {}
+    empty = (np.zeros((0, 0), dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+    return BUILDERS[output]({"dimensions": {"series": [], "observation": [{"values": []}]}}, *empty)
+
+
+def build_queried_output(struct: Optional[dict], key_codes: np.ndarray, series_pos: np.ndarray, obs_idx: np.ndarray, values: np.ndarray, output: str = "pivot", value_dtype: str = "float64"):
+    """
+    Builds a query result in one of `OUTPUT_FORMATS` from the structure of a data message and its columnar arrays,
+    with values of one of `VALUE_DTYPES`.
+    """
+    if struct is None:
+        return empty_output(output)
+    return BUILDERS[output](struct, key_codes, series_pos, obs_idx, values.astype(value_dtype, copy=False))
+
+
+@instrumented("process_queried_data", size=output_size)
+def process_queried_data(data, output: str = "pivot", value_dtype: str = "float64"):
+    """
+    Returns the result of a data query in one of `OUTPUT_FORMATS`, from its SDMX-JSON message (a dictionary) or SDMX-CSV message (bytes),
+    with values of one of `VALUE_DTYPES`.
+    """
+    if not data:
+        return empty_output(output)
+    if isinstance(data, bytes):
+        return build_queried_output(*decode_csv(data), output=output, value_dtype=value_dtype)
+
+    struct = data["data"]["structures"][0]
+    n_dims = len(struct["dimensions"]["series"])
+    series_data = data["data"]["dataSets"][0]["series"]
+
+    key_codes, series_pos, obs_idx, values = decode_series(series_data, n_dims)
+    return build_queried_output(struct, key_codes, series_pos, obs_idx, values, output, value_dtype)
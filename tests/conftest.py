@@ -0,0 +1,119 @@
+import itertools
+import httpx
+import pytest
+
+import package as imf
+
+DIMENSIONS = ["COUNTRY", "INDEX_TYPE", "FREQUENCY"]
+CODES = {
+    "COUNTRY": [("USA", "United States"), ("CAN", "Canada"), ("GBR", "United Kingdom")],
+    "INDEX_TYPE": [("CPI", "Consumer Price Index"), ("HICP", "Harmonised Index")],
+    "FREQUENCY": [("A", "Annual"), ("M", "Monthly")],
+}
+PERIODS = ["2020", "2021", "2022"]
+QUERY = {"COUNTRY": ["USA", "CAN"], "INDEX_TYPE": "CPI", "FREQUENCY": "A"}
+
+
+class MockAPI:
+    """
+    Stand-in for the SDMX 3.0 API of the IMF serving one dataflow, "CPI", with three dimensions and annual observations.
+    Records the URL of every request. `fail` holds key fragments whose data requests are answered with a 500,
+    `empty` those answered with a 404, and `time_range` the time range of the availability cube, if any.
+    Delta requests (`updatedAfter`) get a revised last period and a new one.
+    """
+
+    def __init__(self):
+
+        self.calls: list = []
+        self.fail: set = set()
+        self.empty: set = set()
+        self.time_range = None
+
+    def catalog(self) -> dict:
+        structure = "urn:sdmx:org.sdmx.infomodel.datastructure.DataStructure=IMF.STA:DSD_CPI(3.0+.0)"
+        return {"data": {"dataflows": [{"id": "CPI", "name": "Consumer Price Index (CPI)", "version": "3.0.1", "agencyID": "IMF.STA", "structure": structure}]}}
+
+    def structure(self) -> dict:
+        dimensions = [
+            {"id": dim, "position": i, "conceptIdentity": f"urn:sdmx:org.sdmx.infomodel.conceptscheme.Concept=IMF:CS_{dim}(1.0+.0).{dim}"}
+            for i, dim in enumerate(DIMENSIONS)
+        ]
+        concept_schemes = [
+            {
+                "agencyID": "IMF",
+                "id": f"CS_{dim}",
+                "concepts": [
+                    {
+                        "id": dim,
+                        "name": {"en": dim.title()},
+                        "description": {"en": dim.title()},
+                        "coreRepresentation": {"enumeration": f"urn:sdmx:org.sdmx.infomodel.codelist.Codelist=IMF:CL_{dim}(1.0+.0)"},
+                    }
+                ],
+            }
+            for dim in DIMENSIONS
+        ]
+        codelists = [{"agencyID": "IMF", "id": f"CL_{dim}", "codes": [{"id": code, "name": {"en": name}} for code, name in CODES[dim]]} for dim in DIMENSIONS]
+        return {"data": {"dataStructures": [{"dataStructureComponents": {"dimensionList": {"dimensions": dimensions}}}], "conceptSchemes": concept_schemes, "codelists": codelists}}
+
+    def availability(self) -> dict:
+        components = [{"id": dim, "include": True, "removePrefix": False, "values": [{"value": code} for code, _ in CODES[dim]]} for dim in DIMENSIONS]
+        if self.time_range is not None:
+            components.append({"id": "TIME_PERIOD", "include": True, "timeRange": self.time_range})
+        return {"data": {"dataConstraints": [{"cubeRegions": [{"components": components}]}]}}
+
+    def data(self, key: str, delta: bool = False) -> dict:
+        values = [[code for code, _ in CODES[dim]] for dim in DIMENSIONS]
+        selections = [values[i] if token == "*" else token.split("+") for i, token in enumerate(key.split("."))]
+        series = {}
+        for combination in itertools.product(*selections):
+            position = ":".join(str(values[i].index(code)) for i, code in enumerate(combination))
+            series[position] = {"observations": {str(j): [str(100 + j)] for j in range(len(PERIODS))}}
+            if delta:
+                series[position]["observations"] = {str(len(PERIODS) - 1): ["999"], str(len(PERIODS)): ["1000"]}
+        periods = PERIODS + ["2023"] if delta else PERIODS
+        structure = {
+            "dimensions": {
+                "series": [{"id": dim, "values": [{"id": code} for code in values[i]]} for i, dim in enumerate(DIMENSIONS)],
+                "observation": [{"id": "TIME_PERIOD", "values": [{"value": period} for period in periods]}],
+            }
+        }
+        return {"data": {"dataSets": [{"series": series}], "structures": [structure]}}
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(str(request.url))
+        path = request.url.path.split("/sdmx/3.0")[1]
+        if path.startswith("/structure/dataflow"):
+            return httpx.Response(200, json=self.catalog())
+        if path.startswith("/structure/datastructure"):
+            return httpx.Response(200, json=self.structure())
+        if path.startswith("/availability"):
+            return httpx.Response(200, json=self.availability())
+        if path.startswith("/data/"):
+            key = path.split("/")[-1]
+            if any(fragment in key for fragment in self.fail):
+                return httpx.Response(500, text="Internal error")
+            if any(fragment in key for fragment in self.empty):
+                return httpx.Response(404, text="NoResultsFound")
+            return httpx.Response(200, json=self.data(key, delta="updatedAfter" in request.url.params))
+        return httpx.Response(404)
+
+    def data_calls(self) -> list:
+        return [call for call in self.calls if "/data/" in call]
+
+    def async_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+    def client(self) -> httpx.Client:
+        return httpx.Client(transport=httpx.MockTransport(self.handler))
+
+
+@pytest.fixture
+def api():
+    return MockAPI()
+
+
+@pytest.fixture
+def instance(api):
+    with imf.IMFInstance(async_client=api.async_client(), retry=None) as instance:
+        yield instance
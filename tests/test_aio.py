@@ -0,0 +1,39 @@
+import asyncio
+
+import package as imf
+from package.aio import AsyncIMFInstance
+
+from conftest import QUERY
+
+
+def test_async_instance_queries_on_the_callers_loop(api):
+    async def main():
+        async with AsyncIMFInstance(client=api.async_client(), retry=None) as instance:
+            dataflow = await instance.Dataflow("CPI")
+            return await dataflow.query(QUERY)
+
+    result = asyncio.run(main())
+
+    assert result["USA"].tolist() == [100.0, 101.0, 102.0]
+    assert result["CAN"].tolist() == [100.0, 101.0, 102.0]
+
+
+def test_queries_run_concurrently_on_one_loop(api):
+    async def main():
+        async with AsyncIMFInstance(client=api.async_client(), retry=None) as instance:
+            dataflow = await instance.Dataflow("CPI")
+            return await asyncio.gather(*(dataflow.query({**QUERY, "COUNTRY": country}) for country in ["USA", "CAN", "GBR"]))
+
+    results = asyncio.run(main())
+
+    assert [list(result.columns) for result in results] == [["USA"], ["CAN"], ["GBR"]]
+    assert len(api.data_calls()) == 3
+
+
+def test_sync_instance_works_inside_a_running_loop(api):
+    async def main():
+        # No event loop patching: the synchronous wrapper runs its own loop in a background thread
+        with imf.IMFInstance(async_client=api.async_client(), retry=None) as instance:
+            return instance.Dataflow("CPI").query(QUERY)
+
+    assert asyncio.run(main())["USA"].tolist() == [100.0, 101.0, 102.0]
@@ -0,0 +1,59 @@
+import httpx
+import pandas as pd
+
+from conftest import QUERY
+
+
+def test_query_many_keeps_going_after_failures(api, instance):
+    api.fail.add("GBR")
+    dataflow = instance.Dataflow("CPI")
+
+    results = dataflow.query_many([QUERY, {**QUERY, "COUNTRY": "GBR"}, {**QUERY, "COUNTRY": "XXX"}, {"COUNTRY": "USA"}])
+
+    assert isinstance(results["USA+CAN.CPI.A"], pd.DataFrame)
+    assert results["USA+CAN.CPI.A"].name == "United States, Canada, Consumer Price Index, Annual"
+    assert isinstance(results["GBR.CPI.A"], httpx.HTTPStatusError)
+    assert isinstance(results[2], ValueError)
+    assert isinstance(results[3], ValueError)
+
+
+def test_query_many_requests_each_key_once(api, instance):
+    dataflow = instance.Dataflow("CPI")
+
+    results = dataflow.query_many([{**QUERY, "COUNTRY": country} for country in ["USA", "CAN", "GBR"]], max_concurrency=2, output="long")
+
+    assert sorted(results) == ["CAN.CPI.A", "GBR.CPI.A", "USA.CPI.A"]
+    assert all(len(result) == 3 for result in results.values())
+    assert len(api.data_calls()) == 3
+
+
+def test_fetch_many_across_dataflows(api, instance):
+    results = instance.fetch_many([("CPI", QUERY), ("CPI", "GBR.CPI.A"), ("NOPE", QUERY)])
+
+    assert results[("CPI", "USA+CAN.CPI.A")]["USA"].tolist() == [100.0, 101.0, 102.0]
+    assert isinstance(results[("CPI", "GBR.CPI.A")], pd.DataFrame)
+    assert isinstance(results[("NOPE", 2)], Exception)
+
+
+def test_requests_building_the_same_key_are_sent_once(api, instance):
+    dataflow = instance.Dataflow("CPI")
+
+    results = dataflow.query_many([{**QUERY, "COUNTRY": "usa"}, {**QUERY, "COUNTRY": ["USA"]}, {**QUERY, "COUNTRY": "CAN"}])
+
+    assert sorted(results) == ["CAN.CPI.A", "USA.CPI.A"]
+    assert len(api.data_calls()) == 2
+
+
+def test_fetch_many_sends_a_shared_key_once(api, instance):
+    results = instance.fetch_many([("CPI", QUERY), ("CPI", "USA+CAN.CPI.A")])
+
+    assert list(results) == [("CPI", "USA+CAN.CPI.A")]
+    assert len(api.data_calls()) == 1
+
+
+def test_batches_do_not_print(instance, capsys, caplog):
+    with caplog.at_level("DEBUG", logger="package.aio"):
+        instance.Dataflow("CPI").query_many([QUERY])
+
+    assert capsys.readouterr().out == ""
+    assert "Querying 1 keys of CPI" in caplog.text
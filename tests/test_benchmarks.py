@@ -0,0 +1,47 @@
+import functools
+import httpx
+import pytest
+
+import package as imf
+from benchmarks.compare import comparisons, structure_response
+from benchmarks.fixtures import DATAFLOW, Fixtures
+from benchmarks.run import measure
+from benchmarks.server import StandInServer
+from package.parsing import parse_message
+from package.utils import process_queried_data
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    return Fixtures("small")
+
+
+@pytest.fixture(scope="module")
+def response(fixtures):
+    return structure_response(fixtures)
+
+
+@pytest.mark.parametrize("index", range(4))
+def test_optimized_parsers_match_the_reference(fixtures, response, index):
+    _, old, new, check, _, _ = comparisons(fixtures, response)[index]
+
+    check(old(), new())
+
+
+def test_stand_in_server_serves_a_dataflow(fixtures):
+    with StandInServer(fixtures.route) as server:
+        with imf.IMFInstance(async_client=httpx.AsyncClient(transport=server.async_transport()), retry=None) as instance:
+            dataflow = instance.Dataflow(DATAFLOW)
+            long = dataflow.query(".".join(["*"] * len(dataflow.dimensions_ordered)), output="long", max_series=None)
+            csv = dataflow.query(".".join(["*"] * len(dataflow.dimensions_ordered)), output="long", max_series=None, data_format="csv")
+
+    assert len(long) == len(csv) == fixtures.n_observations
+    assert len(parse_message(fixtures.data_body(last_n=12), parse=functools.partial(process_queried_data, output="long"))) == fixtures.params["n_series"] * 12
+
+
+def test_measure():
+    result = measure("noop", lambda: None, units=10, unit="calls", repeat=3)
+
+    assert result["repeat"] == 3
+    assert result["p50_ms"] <= result["p90_ms"] <= result["p99_ms"]
+    assert result["unit"] == "calls/s"
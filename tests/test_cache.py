@@ -0,0 +1,110 @@
+import os
+import time
+import httpx
+import pandas as pd
+import pytest
+
+from package.cache import DataCache, StructureCache
+from package.consts import BASE
+from package.queries import query_structure
+
+URL = f"{BASE}/structure/codelist/IMF/CL_FREQ/+"
+BODY = {"data": {"codelists": [{"id": "CL_FREQ", "codes": [{"id": "A"}]}]}}
+
+
+class ConditionalServer:
+    """
+    Serves BODY with an ETag, and "304 Not Modified" to requests carrying that ETag.
+    """
+
+    def __init__(self):
+        self.requests: list = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json=BODY, headers={"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"})
+
+
+@pytest.fixture
+def server():
+    return ConditionalServer()
+
+
+def test_put_and_lookup(tmp_path):
+    cache = StructureCache(str(tmp_path), ttl=60)
+    cache.put(URL, BODY, {"etag": '"v1"'})
+
+    entry = cache.lookup(URL)
+
+    assert entry["body"] == BODY
+    assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"'}
+    assert cache.lookup(f"{URL}?detail=full") is None
+
+
+def test_stale_entries_are_not_served(tmp_path):
+    cache = StructureCache(str(tmp_path), ttl=0)
+    cache.put(URL, BODY)
+
+    assert cache.lookup(URL) is None
+    assert cache.get(URL)["body"] == BODY
+
+
+def test_fresh_entry_saves_the_request(tmp_path, server):
+    cache = StructureCache(str(tmp_path), ttl=60)
+    with httpx.Client(transport=httpx.MockTransport(server.handler)) as client:
+        assert query_structure(URL, cache, client) == BODY
+        assert query_structure(URL, cache, client) == BODY
+
+    assert len(server.requests) == 1
+
+
+def test_stale_entry_is_revalidated(tmp_path, server):
+    cache = StructureCache(str(tmp_path), ttl=0)
+    with httpx.Client(transport=httpx.MockTransport(server.handler)) as client:
+        query_structure(URL, cache, client)
+        fetched_at = cache.get(URL)["fetched_at"]
+        time.sleep(0.01)
+
+        assert query_structure(URL, cache, client) == BODY
+
+    assert server.requests[1].headers["If-None-Match"] == '"v1"'
+    assert server.requests[1].headers["If-Modified-Since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+    assert cache.get(URL)["fetched_at"] > fetched_at
+
+
+def test_offline_mode(tmp_path):
+    StructureCache(str(tmp_path), ttl=0).put(URL, BODY)
+    cache = StructureCache(str(tmp_path), ttl=0, offline=True)
+
+    assert cache.lookup(URL)["body"] == BODY
+    with pytest.raises(LookupError):
+        cache.lookup(f"{BASE}/structure/codelist/IMF/CL_AREA/+")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = StructureCache(str(tmp_path))
+    urls = [f"{URL}?n={i}" for i in range(3)]
+    for i, url in enumerate(urls):
+        cache.put(url, BODY)
+        os.utime(cache.path(url), (1000 + i, 1000 + i))
+    cache.get(urls[0])  # Reading an entry makes it the most recently used
+
+    cache.max_size = cache.size() - 1
+    cache.evict()
+
+    assert [cache.get(url) is not None for url in urls] == [True, False, True]
+
+
+def test_data_cache(tmp_path):
+    cache = DataCache(str(tmp_path))
+    frames = {"CPI": pd.DataFrame({"USA": [1.0, 2.0]}, index=pd.to_datetime(["2020-01-01", "2021-01-01"]))}
+
+    cache.put("url", frames, fetched_at=1000.0)
+    entry = cache.get("url")
+
+    assert entry["fetched_at"] == 1000.0
+    assert entry["last_period"] == pd.Timestamp("2021-01-01")
+    pd.testing.assert_frame_equal(entry["frames"]["CPI"], frames["CPI"])
+    assert cache.get("other") is None
@@ -0,0 +1,115 @@
+import httpx
+import pickle
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+
+import package as imf
+from package.catalog import CatalogIndex
+
+from conftest import MockAPI
+
+
+def dataflow(dataflow_id: str, name: str, countries: dict, version: str = "1.0.0"):
+    return SimpleNamespace(
+        dataflow_id=dataflow_id,
+        dataflow_name=name,
+        dataflow_version=version,
+        dataflow_agency_id="IMF.STA",
+        dimensions=pd.DataFrame({"ConceptName": ["COUNTRY", "FREQUENCY"], "DimensionName": ["Country", "Frequency"]}),
+        available_values_index={"COUNTRY": countries, "FREQUENCY": {"A": "Annual", "M": "Monthly"}},
+    )
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = CatalogIndex(str(tmp_path))
+    index.add(dataflow("CPI", "Consumer Price Index", {"ARG": "Argentina", "BRA": "Brazil"}))
+    index.add(dataflow("GDP", "Gross Domestic Product", {"ARG": "Argentina", "CHL": "Chile"}))
+    return index
+
+
+def test_search_values(index):
+    result = index.search("argen")
+
+    assert result[["DataflowID", "Code"]].values.tolist() == [["CPI", "ARG"], ["GDP", "ARG"]]
+    assert index.search("monthly", dataflows=["GDP"])["DataflowID"].tolist() == ["GDP"]
+
+
+def test_flows(index):
+    assert index.flows("consumer")["DataflowID"].tolist() == ["CPI"]
+    assert index.flows(COUNTRY="chl")["DataflowID"].tolist() == ["GDP"]
+    assert index.flows("chile")["DataflowID"].tolist() == ["GDP"]
+
+
+def test_remove_keeps_shared_values(index):
+    index.remove("GDP")
+
+    assert "GDP" not in index and "GDP" not in index.flow_terms
+    assert ("COUNTRY", "CHL") not in index.codes
+    assert "chile" not in index.postings
+    assert "gross" not in index.flow_postings
+    assert index.codes[("COUNTRY", "ARG")]["Flows"] == {"CPI"}
+    assert index.search("argentina")["DataflowID"].tolist() == ["CPI"]
+
+
+def test_re_adding_replaces_the_entries(index):
+    index.add(dataflow("GDP", "Gross Domestic Product", {"URY": "Uruguay"}, version="2.0.0"))
+
+    assert index.flows(COUNTRY="ARG")["DataflowID"].tolist() == ["CPI"]
+    assert index.flows(COUNTRY="URY")["DataflowID"].tolist() == ["GDP"]
+    assert index.dataflows["GDP"]["DataflowVersion"] == "2.0.0"
+
+
+def test_save_and_load(index, tmp_path):
+    index.save()
+
+    loaded = CatalogIndex(str(tmp_path))
+
+    assert loaded.flow_terms == index.flow_terms
+    assert loaded.search("brazil")["DataflowID"].tolist() == ["CPI"]
+    assert loaded.outdated(pd.DataFrame({"DataflowID": ["CPI", "GDP", "BOP"], "DataflowVersion": ["1.0.0", "2.0.0", "1.0.0"]})) == ["GDP", "BOP"]
+
+
+def test_load_index_saved_without_flow_terms(index, tmp_path):
+    state = {"dataflows": index.dataflows, "codes": index.codes, "postings": index.postings, "flow_postings": index.flow_postings}
+    with open(index.path, "wb") as f:
+        pickle.dump(state, f)
+
+    loaded = CatalogIndex(str(tmp_path))
+    assert loaded.flow_terms == index.flow_terms
+
+    loaded.remove("CPI")
+    assert "consumer" not in loaded.flow_postings
+    assert "brazil" not in loaded.postings
+    assert loaded.flows("argentina")["DataflowID"].tolist() == ["GDP"]
+
+
+def test_index_catalog(instance, tmp_path):
+    index = instance.index_catalog(CatalogIndex(str(tmp_path)))
+
+    assert list(index.dataflows) == ["CPI"]
+    assert index.failures == {}
+    assert index.search("canada")["Code"].tolist() == ["CAN"]
+
+
+class UnavailableAPI(MockAPI):
+    """
+    Stand-in for a server failing every availability request.
+    """
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if "/availability" in request.url.path:
+            return httpx.Response(500, text="Internal error")
+        return super().handler(request)
+
+
+def test_index_catalog_reports_failed_dataflows(tmp_path, capsys, caplog):
+    with imf.IMFInstance(async_client=UnavailableAPI().async_client(), retry=None) as instance:
+        with caplog.at_level("WARNING"):
+            index = instance.index_catalog(CatalogIndex(str(tmp_path)))
+
+    assert len(index) == 0
+    assert isinstance(index.failures["CPI"], httpx.HTTPStatusError)
+    assert "Dataflow 'CPI' is not indexed" in caplog.text
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import pytest
+
+import package as imf
+from package.aio import AsyncIMFInstance
+from package.cache import StructureCache
+from package.queries import accept_encoding, client_settings
+
+from conftest import QUERY
+
+
+def test_client_settings():
+    settings = client_settings(http2=False, timeout=5.0, max_connections=4, max_keepalive_connections=2, keepalive_expiry=10.0)
+
+    assert settings["http2"] is False
+    assert settings["limits"].max_connections == 4
+    assert settings["limits"].max_keepalive_connections == 2
+    assert settings["headers"]["Accept-Encoding"] == accept_encoding()
+    assert accept_encoding().startswith("gzip")
+
+
+def test_dataflow_objects_share_the_instance_client(api):
+    client = api.async_client()
+    with imf.IMFInstance(async_client=client, retry=None) as instance:
+        first, second = instance.Dataflow("CPI"), instance.Dataflow("CPI")
+        first.query(QUERY)
+        second.query(QUERY)
+
+        assert instance.async_client is client
+        assert first.aio.instance.client is second.aio.instance.client is client
+        assert len(api.data_calls()) == 2
+
+    # A client passed to the instance belongs to the caller:
+    assert not client.is_closed
+
+
+def test_failed_open_releases_the_client_and_the_loop(api, tmp_path, monkeypatch):
+    clients = []
+    monkeypatch.setattr("package.aio.make_async_client", lambda **settings: clients.append(api.async_client()) or clients[-1])
+    threads = threading.active_count()
+
+    # An offline cache without the catalog fails before any request:
+    with pytest.raises(LookupError):
+        imf.IMFInstance(cache=StructureCache(str(tmp_path), offline=True), retry=None)
+
+    assert clients[0].is_closed
+    assert threading.active_count() == threads
+
+
+def test_failed_async_enter_closes_the_client(tmp_path):
+    instance = AsyncIMFInstance(cache=StructureCache(str(tmp_path), offline=True), retry=None)
+
+    async def main():
+        async with instance:
+            pass
+
+    with pytest.raises(LookupError):
+        asyncio.run(main())
+
+    assert instance.client.is_closed
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import package as imf
+from package.utils import AvailableCodes, CodeTable, code_table
+
+from conftest import CODES, QUERY
+
+
+@pytest.fixture
+def compact_instance(api):
+    with imf.IMFInstance(async_client=api.async_client(), retry=None, compact=True) as instance:
+        yield instance
+
+
+def test_code_table_behaves_as_a_list_of_codes():
+    table = CodeTable(["USA", "CAN"], ["United States", None])
+
+    assert len(table) == 2
+    assert table[0] == {"ID": "USA", "Name": "United States"}
+    assert list(table) == [{"ID": "USA", "Name": "United States"}, {"ID": "CAN", "Name": None}]
+    assert table.positions == {"USA": 0, "CAN": 1}
+
+
+def test_code_tables_are_shared():
+    codes = [{"id": "USA", "name": {"en": "United States"}}]
+
+    table = code_table(("IMF", "CL_TEST", "1.0"), codes)
+
+    assert code_table(("IMF", "CL_TEST", "1.0"), codes) is table
+    assert code_table(("IMF", "CL_OTHER", "1.0"), codes) is not table
+
+
+def test_available_codes_behave_as_a_dictionary():
+    table = CodeTable(["USA", "CAN", "GBR"], ["United States", "Canada", "United Kingdom"])
+
+    available = AvailableCodes(table, np.array([2, 0], dtype=np.int32))
+
+    assert dict(available) == {"GBR": "United Kingdom", "USA": "United States"}
+    assert "CAN" not in available and "XXX" not in available
+    with pytest.raises(KeyError):
+        available["CAN"]
+
+
+def test_compact_dataflow_objects(api, compact_instance, instance):
+    compact, other = compact_instance.Dataflow("CPI"), compact_instance.Dataflow("CPI")
+    regular = instance.Dataflow("CPI")
+
+    assert isinstance(compact.dimensions_codelists["COUNTRY"], CodeTable)
+    assert compact.dimensions_codelists["COUNTRY"] is other.dimensions_codelists["COUNTRY"]
+    assert dict(compact.available_values_index["COUNTRY"]) == dict(CODES["COUNTRY"])
+    assert compact.queries_response == {}
+    assert compact.query_key(QUERY) == regular.query_key(QUERY)
+    assert compact.memory_usage().sum() < regular.memory_usage().sum()
+
+
+@pytest.mark.parametrize("output", ["pivot", "long", "numpy", "arrow"])
+def test_float32_results(instance, output):
+    result = instance.Dataflow("CPI").query(QUERY, output=output, value_dtype="float32")
+
+    if output == "pivot":
+        assert (result.dtypes == np.float32).all()
+    elif output == "arrow":
+        assert str(result.schema.field("Value").type) == "float"
+    else:
+        assert result["Value"].dtype == np.float32
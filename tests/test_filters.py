@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from package.queries import filter_params, merge_params
+from package.utils import availability_time_range, parse_time_period, parse_time_period_end
+
+from conftest import QUERY
+
+
+@pytest.mark.parametrize(
+    "period, start, end",
+    [
+        ("2020", "2020-01-01", "2020-12-31"),
+        ("2020-Q2", "2020-04-01", "2020-06-30"),
+        ("2020-M02", "2020-02-01", "2020-02-29"),
+        ("2020-S2", "2020-07-01", "2020-12-31"),
+        ("2020-03-15", "2020-03-15", "2020-03-15"),
+    ],
+)
+def test_parse_time_period_bounds(period, start, end):
+    assert parse_time_period(period) == pd.Timestamp(start)
+    assert parse_time_period_end(period) == pd.Timestamp(end)
+
+
+def test_filter_params_period_condition():
+    params = filter_params(start_period="2020", end_period="2021-Q2", last_n_observations=3, detail="dataonly")
+
+    assert params == {"c[TIME_PERIOD]": "ge:2020-01-01+le:2021-06-30", "lastNObservations": "3", "attributes": "none", "measures": "all"}
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"start_period": "not a period"},
+        {"start_period": "2022", "end_period": "2021"},
+        {"first_n_observations": 0},
+        {"last_n_observations": True},
+        {"detail": "everything"},
+        {"detail": "dataonly", "attributes": "none"},
+    ],
+)
+def test_filter_params_rejects_invalid_filters(kwargs):
+    with pytest.raises(ValueError):
+        filter_params(**kwargs)
+
+
+def test_merge_params_joins_conditions_on_the_same_component():
+    merged = merge_params({"c[TIME_PERIOD]": "ge:2020-01-01", "attributes": "all"}, None, {"c[TIME_PERIOD]": "le:2021-12-31", "attributes": "none"})
+
+    assert merged == {"c[TIME_PERIOD]": "ge:2020-01-01+le:2021-12-31", "attributes": "none"}
+    assert merge_params(None, {}) is None
+
+
+def test_availability_time_range_with_open_end():
+    response = {"availability": {"data": {"dataConstraints": [{"cubeRegions": [{"components": [{"id": "TIME_PERIOD", "timeRange": {"startPeriod": {"period": "2020"}}}]}]}]}}}
+
+    start, end = availability_time_range(response)  # type: ignore
+
+    assert start == pd.Timestamp("2020-01-01")
+    assert pd.isna(end)
+
+
+def test_period_range_outside_half_open_availability(api, instance):
+    api.time_range = {"startPeriod": {"period": "2020"}}
+    dataflow = instance.Dataflow("CPI")
+
+    with pytest.raises(ValueError, match="available from 2020-01-01 to the end"):
+        dataflow.query(QUERY, end_period="2019")
+    assert api.data_calls() == []
+
+
+def test_query_sends_period_filters(api, instance):
+    dataflow = instance.Dataflow("CPI")
+
+    dataflow.query(QUERY, start_period="2021", last_n_observations=1)
+
+    assert "c%5BTIME_PERIOD%5D=ge%3A2021-01-01" in api.data_calls()[0]
+    assert "lastNObservations=1" in api.data_calls()[0]
@@ -0,0 +1,73 @@
+import httpx
+import pandas as pd
+import pytest
+
+from package.queries import data_headers, query_data
+from package.utils import CsvDataDecoder, decode_csv, process_queried_data
+
+from conftest import MockAPI
+
+
+def csv_message(message: dict) -> bytes:
+    """
+    Returns the SDMX-CSV message holding the observations of an SDMX-JSON data message.
+    """
+    struct = message["data"]["structures"][0]["dimensions"]
+    dims = struct["series"]
+    periods = [value["value"] for value in struct["observation"][0]["values"]]
+    lines = [",".join(["STRUCTURE", "STRUCTURE_ID", "ACTION", *(dim["id"] for dim in dims), "TIME_PERIOD", "OBS_VALUE"])]
+    for key, series in message["data"]["dataSets"][0]["series"].items():
+        codes = [dim["values"][int(i)]["id"] for dim, i in zip(dims, key.split(":"))]
+        for i, obs in series["observations"].items():
+            lines.append(",".join(["dataflow", "IMF.STA:CPI(3.0.1)", "I", *codes, periods[int(i)], obs[0]]))
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.mark.parametrize("output", ["pivot", "long"])
+def test_csv_and_json_give_the_same_result(output):
+    message = MockAPI().data("USA+CAN.CPI+HICP.A")
+
+    from_json = process_queried_data(message, output=output)
+    from_csv = process_queried_data(csv_message(message), output=output)
+
+    if output == "pivot":
+        assert from_json.keys() == from_csv.keys()
+        for indicator in from_json:
+            pd.testing.assert_frame_equal(from_csv[indicator].sort_index(axis=1), from_json[indicator].sort_index(axis=1))
+    else:
+        columns = ["COUNTRY", "INDEX_TYPE", "FREQUENCY", "Date"]
+        sort = lambda df: df.astype({column: str for column in columns[:3]}).sort_values(columns).reset_index(drop=True)
+        pd.testing.assert_frame_equal(sort(from_csv), sort(from_json))
+
+
+def test_csv_decoder_handles_lines_split_across_chunks():
+    body = csv_message(MockAPI().data("*.*.*"))
+    decoder = CsvDataDecoder()
+    for i in range(0, len(body), 10):
+        decoder.feed(body[i : i + 10])
+
+    struct, key_codes, series_pos, obs_idx, values = decoder.close()
+    expected = decode_csv(body)
+
+    assert struct == expected[0]
+    assert len(key_codes) == 12
+    for column, expected_column in zip((key_codes, series_pos, obs_idx, values), expected[1:]):
+        assert (column == expected_column).all()
+
+
+def test_data_headers():
+    assert data_headers("csv")["Accept"].startswith("application/vnd.sdmx.data+csv")
+    with pytest.raises(ValueError):
+        data_headers("xml")
+
+
+def test_query_data_raises_on_errors(api):
+    api.fail.add("CAN")
+    api.empty.add("GBR")
+
+    with api.client() as client:
+        assert query_data("IMF.STA", "CPI", "USA.CPI.A", client=client)["data"]["dataSets"]
+        assert query_data("IMF.STA", "CPI", "GBR.CPI.A", client=client, params={"lastNObservations": "1"}) == {}
+        for key in ["CAN.CPI.A", "GBR.CPI.A"]:
+            with pytest.raises(httpx.HTTPStatusError):
+                query_data("IMF.STA", "CPI", key, client=client)
@@ -0,0 +1,63 @@
+import httpx
+import pandas as pd
+import pytest
+
+import package as imf
+from package.cache import DataCache
+from package.queries import delta_params
+
+from conftest import QUERY
+
+
+@pytest.fixture
+def cached_instance(api, tmp_path):
+    with imf.IMFInstance(async_client=api.async_client(), retry=None, data_cache=DataCache(str(tmp_path))) as instance:
+        yield instance
+
+
+def test_delta_params():
+    assert delta_params(0.0) == {"updatedAfter": "1970-01-01T00:00:00Z"}
+    assert delta_params(0.0, pd.Timestamp("2022-01-01"), "startPeriod") == {"c[TIME_PERIOD]": "ge:2022-01-01"}
+    assert delta_params(0.0, None, "startPeriod") == {}
+    with pytest.raises(ValueError):
+        delta_params(0.0, delta="lastUpdate")
+
+
+def test_deltas_are_merged_into_the_stored_result(api, cached_instance):
+    dataflow = cached_instance.Dataflow("CPI")
+
+    first = dataflow.query(QUERY, incremental=True)
+    second = dataflow.query(QUERY, incremental=True)
+
+    calls = api.data_calls()
+    assert "updatedAfter" not in httpx.URL(calls[0]).params
+    assert "updatedAfter" in httpx.URL(calls[1]).params
+    assert first["USA"].tolist() == [100.0, 101.0, 102.0]
+    # The revised 2022 value replaces the stored one, and 2023 is appended:
+    assert second["USA"].tolist() == [100.0, 101.0, 999.0, 1000.0]
+    assert second.index.year.tolist() == [2020, 2021, 2022, 2023]
+
+
+def test_delta_without_changes_keeps_the_stored_result(api, cached_instance):
+    dataflow = cached_instance.Dataflow("CPI")
+    first = dataflow.query(QUERY, incremental=True)
+
+    api.empty.add("USA")
+    second = dataflow.query(QUERY, incremental=True)
+
+    pd.testing.assert_frame_equal(second, first, check_freq=False)
+
+
+def test_incremental_queries_need_a_data_cache(instance):
+    with pytest.raises(ValueError):
+        instance.Dataflow("CPI").query(QUERY, incremental=True)
+
+
+def test_delta_queries_only_print_the_query_line(cached_instance, capsys):
+    dataflow = cached_instance.Dataflow("CPI")
+    dataflow.query(QUERY, incremental=True)
+    capsys.readouterr()
+
+    dataflow.query(QUERY, incremental=True)
+
+    assert capsys.readouterr().out.splitlines() == ["Querying: United States, Canada, Consumer Price Index, Annual"]
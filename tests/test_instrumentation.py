@@ -0,0 +1,66 @@
+import logging
+
+from package.instrumentation import HOOKS, EventRecorder, LoggingHook, add_hook, emit, instrument, instrumented, remove_hook, span
+
+from conftest import QUERY
+
+
+def test_span_is_free_without_hooks():
+    with span("parse") as event:
+        event["size"] = 3
+
+    assert HOOKS == []
+    assert event == {"size": 3}
+
+
+def test_span_and_instrumented_emit_stage_events():
+    @instrumented("double", size=len)
+    def double(values):
+        return values * 2
+
+    with instrument(recorder := EventRecorder()):
+        with span("parse", bytes=10) as event:
+            event["size"] = 3
+        double([1, 2])
+
+    assert [(e["name"], e["size"]) for e in recorder.events] == [("parse", 3), ("double", 4)]
+    assert recorder.events[0]["bytes"] == 10
+    assert all(e["duration"] >= 0 for e in recorder.events)
+    assert HOOKS == []
+
+
+def test_failing_hook_does_not_interrupt(caplog):
+    def broken(event):
+        raise RuntimeError("broken")
+
+    recorder = EventRecorder()
+    add_hook(broken)
+    add_hook(recorder)
+    try:
+        with caplog.at_level(logging.ERROR):
+            emit({"event": "cache", "url": "u", "result": "hit"})
+    finally:
+        remove_hook(broken)
+        remove_hook(recorder)
+
+    assert recorder.summary()["cache"] == {"hit": 1}
+    assert "failed" in caplog.text
+
+
+def test_query_events(instance):
+    with instrument(recorder := EventRecorder()):
+        instance.Dataflow("CPI").query(QUERY)
+
+    summary = recorder.summary()
+    requests = [event for event in recorder.events if event["event"] == "request"]
+    assert summary["requests"] == len(requests) == 3
+    assert all(event["status"] == 200 and event["method"] == "GET" for event in requests)
+    assert all("bytes" in event and "phases" in event for event in requests)
+    assert summary["stages"]
+
+
+def test_logging_hook(caplog):
+    with caplog.at_level(logging.DEBUG, logger="imf_data_fetcher"):
+        LoggingHook()({"event": "stage", "name": "parse", "duration": 0.002, "size": 5})
+
+    assert "parse: 2.0ms {'size': 5}" in caplog.text
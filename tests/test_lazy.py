@@ -0,0 +1,43 @@
+from conftest import DIMENSIONS, QUERY
+
+
+def structure_calls(api) -> list:
+    return [call for call in api.calls if "/structure/datastructure" in call or "/availability" in call]
+
+
+def test_lazy_dataflow_loads_nothing_up_front(api, instance):
+    dataflow = instance.Dataflow("CPI", lazy=True)
+
+    assert dataflow.dataflow_name == "Consumer Price Index (CPI)"
+    assert structure_calls(api) == []
+
+
+def test_string_key_needs_no_metadata(api, instance):
+    dataflow = instance.Dataflow("CPI", lazy=True)
+
+    result = dataflow.query("USA.CPI.A")
+
+    assert result["USA"].tolist() == [100.0, 101.0, 102.0]
+    assert structure_calls(api) == []
+
+
+def test_stages_are_loaded_on_first_access(api, instance):
+    dataflow = instance.Dataflow("CPI", lazy=True)
+
+    assert dataflow.dimensions_ordered == DIMENSIONS
+    assert not any("/availability" in call for call in api.calls)
+
+    dataflow.query(QUERY)
+    dataflow.query(QUERY)
+
+    assert sum("/availability" in call for call in api.calls) == 1
+    assert sum("/structure/datastructure" in call for call in api.calls) == 1
+
+
+def test_unvalidated_query_loads_dimensions_only(api, instance):
+    dataflow = instance.Dataflow("CPI", lazy=True)
+
+    dataflow.query({**QUERY, "COUNTRY": "GBR"}, validate=False)
+
+    assert not any("/availability" in call for call in api.calls)
+    assert api.data_calls()[0].endswith("/GBR.CPI.A")
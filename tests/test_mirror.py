@@ -0,0 +1,97 @@
+import asyncio
+import os
+import pytest
+
+from package.mirror import DataflowMirror
+
+
+def mirror(instance, directory, **options):
+    return instance.mirror("CPI", directory=str(directory), max_series=4, data_format="json", **options)
+
+
+def test_plan_partitions_the_availability_cube(instance, tmp_path):
+    result = mirror(instance, tmp_path)
+
+    units = result.manifest["units"]
+    assert [unit["key"] for unit in units] == ["USA.*.*", "CAN.*.*", "GBR.*.*"]
+    assert all(unit["series"] == 4 for unit in units)
+    assert (result.status()["Status"] == "done").all()
+    assert len(result.read(output="long")) == 12 * 3
+
+
+def test_failed_units_are_retried_on_the_next_run(api, instance, tmp_path):
+    api.fail.add("CAN")
+    first = mirror(instance, tmp_path)
+
+    assert first.status()["Status"].tolist() == ["done", "failed", "done"]
+    assert "500" in first.status()["Error"][1]
+
+    api.fail.clear()
+    api.calls.clear()
+    second = mirror(instance, tmp_path)
+
+    assert [call.rsplit("/", 1)[1] for call in api.data_calls()] == ["CAN.*.*"]
+    assert (second.status()["Status"] == "done").all()
+    assert sorted(second.read(output="long")["COUNTRY"].unique()) == ["CAN", "GBR", "USA"]
+
+
+def test_unit_without_data_is_done_without_a_file(api, instance, tmp_path):
+    api.empty.add("GBR")
+
+    result = mirror(instance, tmp_path)
+
+    assert (result.status()["Status"] == "done").all()
+    assert len(result.paths()) == 2
+
+
+def test_interrupted_journal_line_is_ignored(instance, tmp_path):
+    mirror(instance, tmp_path)
+    with open(os.path.join(tmp_path, "progress.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"unit": 1, "status": "fai')
+
+    assert DataflowMirror(str(tmp_path)).pending() == []
+
+
+def test_plan_with_other_settings(api, instance, tmp_path):
+    mirror(instance, tmp_path)
+
+    with pytest.raises(ValueError, match="params"):
+        mirror(instance, tmp_path, start_period="2021")
+
+    api.calls.clear()
+    restarted = mirror(instance, tmp_path, start_period="2021", restart=True)
+
+    assert len(api.data_calls()) == 3
+    assert restarted.manifest["params"] != {}
+
+
+def test_restart_only_deletes_the_files_of_the_mirror(instance, tmp_path):
+    (tmp_path / "notes.txt").write_text("kept")
+    (tmp_path / "unit-000001.json.tmp").write_text("partial")
+    mirror(instance, tmp_path)
+
+    mirror(instance, tmp_path, start_period="2021", restart=True)
+
+    assert (tmp_path / "notes.txt").read_text() == "kept"
+    assert not (tmp_path / "unit-000001.json.tmp").exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["manifest.json", "notes.txt", "progress.jsonl", "unit-000000.json", "unit-000001.json", "unit-000002.json"]
+
+    DataflowMirror(str(tmp_path)).clear()
+
+    assert [path.name for path in tmp_path.iterdir()] == ["notes.txt"]
+
+
+async def rerun(mirror: DataflowMirror, api) -> dict:
+    async with api.async_client() as client:
+        return await mirror.run(client)
+
+
+def test_run_returns_its_counts_without_printing(api, instance, tmp_path, capsys):
+    api.fail.add("CAN")
+    result = mirror(instance, tmp_path)
+    capsys.readouterr()
+
+    counts = asyncio.run(rerun(result, api))
+
+    assert counts == {"fetched": 1, "done": 2, "failed": 1, "total": 3}
+    assert capsys.readouterr().out == ""
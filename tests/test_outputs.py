@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from package.utils import empty_output, process_queried_data
+
+from conftest import DIMENSIONS, QUERY, MockAPI
+
+KEY = "USA+CAN.CPI+HICP.A"
+
+
+def test_long_output():
+    result = process_queried_data(MockAPI().data(KEY), output="long")
+
+    assert list(result.columns) == [*DIMENSIONS, "Date", "Value"]
+    assert len(result) == 12
+    assert all(result[dim].dtype == "category" for dim in DIMENSIONS)
+    # Categories are the value IDs of the structure, whatever the rows use:
+    assert list(result["COUNTRY"].cat.categories) == ["USA", "CAN", "GBR"]
+    usa_cpi = result[(result["COUNTRY"] == "USA") & (result["INDEX_TYPE"] == "CPI")]
+    assert usa_cpi["Value"].tolist() == [100.0, 101.0, 102.0]
+
+
+def test_all_formats_hold_the_same_observations():
+    data = MockAPI().data(KEY)
+
+    long = process_queried_data(data, output="long")
+    arrays = process_queried_data(data, output="numpy")
+    table = process_queried_data(data, output="arrow")
+
+    assert isinstance(arrays["COUNTRY"], np.ndarray)
+    assert isinstance(table.schema.field("COUNTRY").type, pa.DictionaryType)
+    for dim in DIMENSIONS:
+        assert arrays[dim].tolist() == long[dim].tolist() == table.column(dim).to_pylist()
+    assert arrays["Value"].tolist() == long["Value"].tolist() == table.column("Value").to_pylist()
+    assert pd.DatetimeIndex(arrays["Date"]).equals(pd.DatetimeIndex(long["Date"]))
+
+
+def test_pivot_matches_long():
+    data = MockAPI().data(KEY)
+
+    pivot = process_queried_data(data)
+    long = process_queried_data(data, output="long")
+
+    for (index_type, frequency, country), group in long.groupby(["INDEX_TYPE", "FREQUENCY", "COUNTRY"], observed=True):
+        column = pivot[f"{index_type}_{frequency}"][country]
+        assert column.index.tolist() == group["Date"].tolist()
+        assert column.tolist() == group["Value"].tolist()
+
+
+@pytest.mark.parametrize("output", ["long", "numpy", "arrow"])
+def test_empty_outputs(output):
+    result = empty_output(output)
+
+    assert len(result["Value"]) == 0
+    assert process_queried_data({}, output=output).__class__ is result.__class__
+
+
+def test_query_outputs(instance):
+    dataflow = instance.Dataflow("CPI")
+
+    long = dataflow.query(QUERY, output="long")
+    table = dataflow.query(QUERY, output="arrow")
+
+    assert sorted(long["COUNTRY"].unique()) == ["CAN", "USA"]
+    assert table.num_rows == len(long) == 6
@@ -0,0 +1,57 @@
+import functools
+import json
+import pandas as pd
+import pytest
+
+import package as imf
+from package.parsing import ParsePool, parse_message
+from package.utils import process_queried_data
+
+from conftest import QUERY, MockAPI
+
+BODIES = [json.dumps(MockAPI().data(key)).encode() for key in ["USA.CPI.A", "USA+CAN.CPI+HICP.A", "*.*.*"]]
+
+
+def assert_same_results(results: list, expected: list) -> None:
+    assert len(results) == len(expected)
+    for result, frames in zip(results, expected):
+        assert sorted(result) == sorted(frames)
+        for name in frames:
+            pd.testing.assert_frame_equal(result[name], frames[name])
+
+
+def test_parse_message():
+    message = MockAPI().data("USA.CPI.A")
+
+    assert_same_results([parse_message(BODIES[0])], [process_queried_data(message)])
+    assert parse_message(BODIES[0], parse=functools.partial(process_queried_data, output="long"))["Value"].tolist() == [100.0, 101.0, 102.0]
+
+
+def test_small_bodies_are_parsed_in_the_calling_thread():
+    pool = ParsePool(max_workers=2)
+
+    pool.map(BODIES)
+
+    assert not any(pool.offloaded(body) for body in BODIES)
+    assert pool._executor is None
+
+
+@pytest.mark.parametrize("threads", [True, False])
+def test_workers_parse_like_the_calling_thread(threads):
+    expected = [process_queried_data(json.loads(body)) for body in BODIES]
+
+    with ParsePool(max_workers=2, min_bytes=0, threads=threads) as pool:
+        results = pool.map(BODIES)
+        single = pool.parse(BODIES[1])
+
+    assert_same_results(results, expected)
+    assert_same_results([single], expected[1:2])
+    assert pool._executor is None
+
+
+def test_queries_parsed_by_a_pool(api):
+    with ParsePool(max_workers=2, min_bytes=0, threads=True) as pool:
+        with imf.IMFInstance(async_client=api.async_client(), retry=None, parse_pool=pool) as instance:
+            result = instance.Dataflow("CPI").query(QUERY)
+
+    assert result["CAN"].tolist() == [100.0, 101.0, 102.0]
@@ -0,0 +1,86 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+
+from package.planner import combine_results, estimate_series, key_selections, merge_results, plan_query
+
+DIMENSIONS = ["COUNTRY", "INDICATOR", "FREQUENCY"]
+AVAILABLE = {
+    "COUNTRY": [f"C{i:03d}" for i in range(100)],
+    "INDICATOR": ["CPI", "PPI", "GDP", "UNR"],
+    "FREQUENCY": ["A", "Q", "M"],
+}
+
+
+def series_of(plan: list) -> set:
+    return {series for tokens in plan for series in itertools.product(*key_selections(tokens, DIMENSIONS, AVAILABLE))}
+
+
+def test_key_that_fits_is_unchanged():
+    assert plan_query(["*", "CPI", "A"], DIMENSIONS, AVAILABLE) == [["*", "CPI", "A"]]
+    assert estimate_series(["*", "CPI+PPI", "*"], DIMENSIONS, AVAILABLE) == 600
+
+
+def test_split_on_series():
+    plan = plan_query(["*", "*", "*"], DIMENSIONS, AVAILABLE, max_series=250)
+
+    assert all(estimate_series(tokens, DIMENSIONS, AVAILABLE) <= 250 for tokens in plan)
+    assert series_of(plan) == {(c, i, f) for c in AVAILABLE["COUNTRY"] for i in AVAILABLE["INDICATOR"] for f in AVAILABLE["FREQUENCY"]}
+    assert all(tokens[0] != "*" for tokens in plan)
+
+
+def test_split_on_key_length():
+    countries = "+".join(AVAILABLE["COUNTRY"])
+
+    plan = plan_query([countries, "CPI", "*"], DIMENSIONS, AVAILABLE, max_key_length=100)
+
+    assert all(len(".".join(tokens)) <= 100 for tokens in plan)
+    assert all(tokens[2] == "*" for tokens in plan)
+    assert series_of(plan) == {(c, "CPI", f) for c in AVAILABLE["COUNTRY"] for f in AVAILABLE["FREQUENCY"]}
+
+
+def test_long_single_value_falls_back_to_the_next_dimension():
+    available = {**AVAILABLE, "INDICATOR": ["X" * 80]}
+
+    plan = plan_query(["C000+C001+C002+C003", "X" * 80, "A"], DIMENSIONS, available, max_key_length=95)
+
+    assert [tokens[0] for tokens in plan] == ["C000+C001", "C002+C003"]
+    assert all(tokens[1] == "X" * 80 for tokens in plan)
+
+
+def test_unsplittable_key_raises():
+    with pytest.raises(ValueError, match="cannot be split"):
+        plan_query(["C000", "X" * 80, "A"], DIMENSIONS, AVAILABLE, max_key_length=50)
+
+
+def test_merge_results_combines_frames_of_the_same_indicator():
+    index = pd.to_datetime(["2020-01-01", "2021-01-01"])
+    first = {"CPI": pd.DataFrame({"USA": [1.0, 2.0]}, index=index).rename_axis(columns="COUNTRY")}
+    second = {"CPI": pd.DataFrame({"CAN": [3.0, np.nan]}, index=index).rename_axis(columns="COUNTRY"), "GDP": pd.DataFrame({"CAN": [5.0]}, index=index[:1])}
+
+    merged = merge_results([first, second])
+
+    assert sorted(merged) == ["CPI", "GDP"]
+    assert merged["CPI"].columns.name == "COUNTRY"
+    assert merged["CPI"].loc["2020-01-01"].to_dict() == {"CAN": 3.0, "USA": 1.0}
+
+
+def test_combine_long_results_skips_empty_parts():
+    part = pd.DataFrame({"COUNTRY": pd.Categorical(["USA"]), "Date": pd.to_datetime(["2020-01-01"]), "Value": [1.0]})
+    empty = pd.DataFrame({"Date": pd.to_datetime([]), "Value": []})
+
+    combined = combine_results([part, empty, part.assign(COUNTRY=pd.Categorical(["CAN"]))], output="long")
+
+    assert combined["COUNTRY"].tolist() == ["USA", "CAN"]
+    assert combined["COUNTRY"].dtype == "category"
+
+
+def test_split_query_merges_its_parts(api, instance, capsys):
+    query = {"COUNTRY": ["USA", "CAN"], "INDEX_TYPE": "CPI", "FREQUENCY": "A"}
+
+    result = instance.Dataflow("CPI").query(query, max_series=1)
+
+    assert sorted(call.rsplit("/", 1)[1] for call in api.data_calls()) == ["CAN.CPI.A", "USA.CPI.A"]
+    assert sorted(result.columns) == ["CAN", "USA"]
+    assert capsys.readouterr().out.splitlines() == ["Querying: United States, Canada, Consumer Price Index, Annual"]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from package.utils import process_queried_data
+
+from conftest import MockAPI
+
+
+def message(periods: list, series: dict) -> dict:
+    structure = {
+        "dimensions": {
+            "series": [{"id": "COUNTRY", "values": [{"id": "USA"}, {"id": "CAN"}]}, {"id": "INDICATOR", "values": [{"id": "CPI"}, {"id": "GDP"}]}],
+            "observation": [{"id": "TIME_PERIOD", "values": [{"value": period} for period in periods]}],
+        }
+    }
+    return {"data": {"dataSets": [{"series": series}], "structures": [structure]}}
+
+
+def test_one_frame_per_indicator():
+    data = MockAPI().data("USA+CAN.CPI+HICP.A")
+
+    result = process_queried_data(data)
+
+    assert sorted(result) == ["CPI_A", "HICP_A"]
+    frame = result["CPI_A"]
+    assert frame.columns.name == "COUNTRY"
+    assert sorted(frame.columns) == ["CAN", "USA"]
+    assert frame.index.name == "Date"
+    assert list(frame.index) == list(pd.to_datetime(["2020-01-01", "2021-01-01", "2022-01-01"]))
+    assert frame["USA"].tolist() == [100.0, 101.0, 102.0]
+
+
+def test_periods_and_missing_values():
+    data = message(["2020-Q1", "2020-M05", "2020-W02", "2021"], {"0:0": {"observations": {"0": ["1.5"], "1": [None], "2": ["NaN"], "3": []}}, "1:1": {"observations": {"3": [7]}}})
+
+    result = process_queried_data(data)
+
+    cpi = result["CPI"]["USA"]
+    assert list(cpi.index) == list(pd.to_datetime(["2020-01-01", "2020-01-06", "2020-05-01", "2021-01-01"]))
+    assert cpi.iloc[0] == 1.5
+    assert cpi.iloc[1:].isna().all()
+    assert result["GDP"]["CAN"].tolist() == [7.0]
+
+
+def test_empty_responses():
+    assert process_queried_data({}) == {}
+    assert process_queried_data(message(["2020"], {})) == {}
+    assert np.isnan(process_queried_data(message(["2020"], {"0:0": {"observations": {"0": ["x"]}}}))["CPI"].iloc[0, 0])
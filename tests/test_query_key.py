@@ -0,0 +1,35 @@
+import pytest
+
+from conftest import CODES, QUERY
+
+
+@pytest.fixture
+def dataflow(instance):
+    return instance.Dataflow("CPI")
+
+
+def test_available_values_index(dataflow):
+    assert dataflow.available_values_index["COUNTRY"] == dict(CODES["COUNTRY"])
+    assert dataflow.available_codes() == {dim: [code for code, _ in codes] for dim, codes in CODES.items()}
+
+
+def test_key_and_name(dataflow):
+    assert dataflow.query_key(QUERY) == ("USA+CAN.CPI.A", "United States, Canada, Consumer Price Index, Annual")
+    assert dataflow.query_key({**QUERY, "COUNTRY": "*", "FREQUENCY": ["a", "m"]}) == ("*.CPI.A+M", "Consumer Price Index, Annual, Monthly")
+    assert dataflow.query_key("USA.CPI.A") == ("USA.CPI.A", "USA.CPI.A")
+
+
+def test_values_are_checked_within_their_dimension(dataflow):
+    with pytest.raises(ValueError, match="'CPI' for dimension 'COUNTRY'"):
+        dataflow.query_key({**QUERY, "COUNTRY": "CPI"})
+
+    assert dataflow.query_key({**QUERY, "COUNTRY": "CPI"}, validate=False) == ("CPI.CPI.A", "CPI.CPI.A")
+
+
+def test_keys_must_match_the_template(dataflow):
+    with pytest.raises(ValueError, match="missing"):
+        dataflow.query_key({"COUNTRY": "USA"})
+    with pytest.raises(ValueError, match="unexpected"):
+        dataflow.query_key({**QUERY, "UNIT": "IX"})
+    with pytest.raises(TypeError):
+        dataflow.query_key(["USA", "CPI", "A"])
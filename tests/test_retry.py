@@ -0,0 +1,116 @@
+import asyncio
+import time
+import httpx
+import pytest
+from email.utils import formatdate
+
+from package.instrumentation import EventRecorder, instrument
+from package.queries import aget, get
+from package.retry import AdaptiveConcurrency, RateControl, RetryPolicy, parse_retry_after, set_rate_control
+
+URL = "https://example.org/data"
+
+
+class FlakyServer:
+    """
+    Answers the first `failures` requests with `status` (and a `Retry-After: 0` header), then with a 200.
+    """
+
+    def __init__(self, failures: int, status: int = 429):
+        self.failures = failures
+        self.status = status
+        self.requests = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.requests <= self.failures:
+            return httpx.Response(self.status, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"ok": True})
+
+
+def test_retry_after_header():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 8 <= parse_retry_after(formatdate(usegmt=True, timeval=time.time() + 10)) <= 10
+
+
+def test_retry_delays():
+    policy = RetryPolicy(max_retries=2, backoff=1.0, max_backoff=1.5, max_retry_after=5.0)
+    throttled = httpx.Response(429)
+
+    assert all(0 <= policy.delay(1, throttled) <= 1.5 for _ in range(20))  # 2 seconds, capped by max_backoff
+    assert policy.delay(2, throttled) is None
+    assert policy.delay(0, httpx.Response(500)) is None
+    assert policy.delay(0, httpx.Response(503, headers={"Retry-After": "4"})) == 4.0
+    assert policy.delay(0, httpx.Response(503, headers={"Retry-After": "6"})) is None
+    assert policy.delay(0, error=httpx.ConnectError("refused")) is not None
+    assert policy.delay(0, error=ValueError()) is None
+
+
+def test_throttled_requests_are_retried():
+    server = FlakyServer(failures=2)
+    with httpx.Client(transport=httpx.MockTransport(server.handler)) as client:
+        with instrument(recorder := EventRecorder()):
+            response = get(client, URL)
+
+    assert response.status_code == 200
+    assert server.requests == 3
+    assert [event["attempt"] for event in recorder.events if event["event"] == "retry"] == [1, 2]
+    assert [event["retries"] for event in recorder.events if event["event"] == "request"] == [2]
+
+
+def test_retries_follow_the_client_policy():
+    server = FlakyServer(failures=5, status=503)
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server.handler)) as client:
+            set_rate_control(client, RateControl(RetryPolicy(max_retries=1)))
+            return await aget(client, URL)
+
+    assert asyncio.run(main()).status_code == 503
+    assert server.requests == 2
+
+
+def test_concurrency_is_decreased_once_per_window():
+    concurrency = AdaptiveConcurrency(maximum=8)
+    windows = [concurrency.acquire() for _ in range(4)]
+
+    for window in windows:
+        concurrency.release(window, throttled=True)
+
+    assert concurrency.limit == 4.0
+    assert concurrency.in_flight == 0
+
+
+def test_concurrency_grows_back_to_the_maximum():
+    concurrency = AdaptiveConcurrency(maximum=4, minimum=1)
+    concurrency.release(concurrency.acquire(), throttled=True)
+    concurrency.release(concurrency.acquire(), throttled=True)
+    assert concurrency.limit == 1.0
+
+    for _ in range(20):
+        concurrency.release(concurrency.acquire(), throttled=False)
+
+    assert concurrency.limit == 4.0
+
+
+def test_requests_wait_for_a_free_slot():
+    concurrency = AdaptiveConcurrency(maximum=2)
+    control = RateControl(concurrency=concurrency)
+    peak = 0
+
+    async def hold():
+        nonlocal peak
+        async with control.aslot():
+            peak = max(peak, concurrency.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(hold() for _ in range(6)))
+
+    asyncio.run(main())
+
+    assert peak == 2
+    assert concurrency.in_flight == 0
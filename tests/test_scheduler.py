@@ -0,0 +1,75 @@
+import time
+import pytest
+
+from package.instrumentation import EventRecorder, instrument
+
+from conftest import QUERY
+
+
+def test_warm_results_are_served_from_memory(api, instance):
+    scheduler = instance.scheduler()
+    key = scheduler.register("CPI", QUERY, every=3600)
+
+    with instrument(recorder := EventRecorder()):
+        first = scheduler.get(key)
+        second = scheduler.get(key)
+
+    assert key == ("CPI", "USA+CAN.CPI.A")
+    assert second is first
+    assert len(api.data_calls()) == 1
+    assert [event["result"] for event in recorder.events if event["event"] == "served"] == ["miss", "fresh"]
+
+
+def test_stale_result_is_served_while_revalidated(api, instance):
+    scheduler = instance.scheduler()
+    key = scheduler.register("CPI", QUERY, every=0.2)
+    first = scheduler.get(key)
+    time.sleep(0.2)
+
+    stale = scheduler.get(key)
+    deadline = time.time() + 5
+    while scheduler.metrics().iloc[0]["Refreshes"] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert stale is first
+    assert scheduler.get(key) is not first
+    assert len(api.data_calls()) == 2
+
+
+def test_failed_refresh_keeps_the_last_good_result(api, instance):
+    scheduler = instance.scheduler()
+    key = scheduler.register("CPI", QUERY, every=3600)
+    first = scheduler.get(key)
+
+    api.fail.add("USA")
+    with pytest.raises(Exception):
+        scheduler.refresh(key)
+
+    assert scheduler.get(key) is first
+    metrics = scheduler.metrics().iloc[0]
+    assert (metrics["Refreshes"], metrics["Failures"]) == (1, 1)
+    assert "500" in metrics["LastError"]
+
+
+def test_registration_errors(instance):
+    scheduler = instance.scheduler()
+
+    with pytest.raises(TypeError):
+        scheduler.register("CPI", QUERY, outptu="long")
+    with pytest.raises(ValueError):
+        scheduler.register("CPI", {**QUERY, "COUNTRY": "XXX"})
+    with pytest.raises(LookupError):
+        scheduler.get(("CPI", "USA.CPI.A"))
+
+
+def test_background_refresh(api, instance):
+    with instance.scheduler() as scheduler:
+        key = scheduler.register("CPI", QUERY, every=0.05)
+        metadata = scheduler.register_metadata("CPI", every=3600)
+        time.sleep(0.3)
+
+        metrics = scheduler.metrics().set_index("Key")
+
+    assert metrics.loc[key[1], "Refreshes"] >= 2
+    assert metrics.loc[None, "Refreshes"] == 0
+    assert scheduler.get(metadata).dataflow_id == "CPI"
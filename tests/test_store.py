@@ -0,0 +1,116 @@
+import json
+import os
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import package as imf
+from package.instrumentation import EventRecorder, instrument
+from package.store import SCHEMA, DataStore
+
+
+def frames(value: float, entities=("USA", "CAN")) -> dict:
+    index = pd.to_datetime(["2020-01-01", "2021-01-01"])
+    frame = pd.DataFrame({entity: [value, value + 1] for entity in entities}, index=index).rename_axis(columns="COUNTRY")
+    return {"CPI": frame}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DataStore(str(tmp_path))
+
+
+def test_round_trip(store):
+    store.write("CPI", frames(1.0), ["USA.CPI", "CAN.CPI"])
+
+    result = store.read("CPI", ["USA.CPI", "CAN.CPI"])
+
+    assert list(result) == ["CPI"]
+    assert result["CPI"].columns.name == "COUNTRY"
+    assert result["CPI"].loc["2021-01-01", "USA"] == 2.0
+    assert store.missing("CPI", ["USA.CPI", "GBR.CPI"]) == ["GBR.CPI"]
+
+
+def test_later_writes_supersede_earlier_ones(store):
+    store.write("CPI", frames(1.0), ["USA.CPI", "CAN.CPI"])
+    store.write("CPI", frames(5.0, ["USA"]), ["USA.CPI"])
+
+    result = store.read("CPI", ["USA.CPI", "CAN.CPI"])["CPI"]
+
+    assert result.loc["2020-01-01", "USA"] == 5.0
+    assert result.loc["2020-01-01", "CAN"] == 1.0
+
+
+def test_read_restricts_to_requested_entities(store):
+    store.write("CPI", frames(1.0), ["USA.CPI", "CAN.CPI"])
+
+    assert list(store.read("CPI", ["CAN.CPI"])["CPI"].columns) == ["CAN"]
+
+
+def test_write_compact_write_read(store):
+    store.write("CPI", frames(1.0), ["USA.CPI", "CAN.CPI"])
+    store.write("CPI", frames(2.0), ["USA.CPI", "CAN.CPI"])
+    store.compact("CPI")
+    store.write("CPI", frames(3.0, ["USA"]), ["USA.CPI"])
+
+    directory = store.partition("CPI", "CPI")
+    assert len([name for name in os.listdir(directory) if name.endswith(".arrow")]) == 2
+    assert store.read_table("CPI", "CPI").schema.equals(SCHEMA)
+    result = store.read("CPI", ["USA.CPI", "CAN.CPI"])["CPI"]
+    assert result.loc["2020-01-01", "USA"] == 3.0
+    assert result.loc["2020-01-01", "CAN"] == 2.0
+
+
+def test_compact_keeps_one_file_without_superseded_rows(store):
+    store.write("CPI", frames(1.0), ["USA.CPI", "CAN.CPI"])
+    store.write("CPI", frames(2.0), ["USA.CPI", "CAN.CPI"])
+    store.compact("CPI")
+
+    table = store.read_table("CPI", "CPI")
+    assert table.num_rows == 4
+    assert table.schema.equals(SCHEMA)
+
+
+def test_reads_partitions_written_with_large_strings(store):
+    store.write("CPI", frames(1.0), ["USA.CPI", "CAN.CPI"])
+    directory = store.partition("CPI", "CPI")
+    large = pa.table({"Entity": pa.array(["USA"], pa.large_string()), "Date": pa.array([pd.Timestamp("2020-01-01")], pa.timestamp("ns")), "Value": [9.0]})
+    store._write_part(directory, large)
+
+    assert store.read("CPI", ["USA.CPI"])["CPI"].loc["2020-01-01", "USA"] == 9.0
+
+
+def test_offline_store_raises_for_missing_sub_keys(tmp_path):
+    store = DataStore(str(tmp_path), offline=True)
+    store.write("CPI", frames(1.0), ["USA.CPI"])
+
+    with pytest.raises(LookupError):
+        store.read("CPI", ["USA.CPI", "GBR.CPI"])
+
+
+def test_manifest_records_indicators_per_sub_key(store):
+    store.write("CPI", frames(1.0), ["USA.CPI", "GBR.CPI"])
+
+    with open(store.manifest_path("CPI"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["entity_dimension"] == "COUNTRY"
+    assert manifest["keys"]["USA.CPI"]["indicators"] == ["CPI"]
+    assert manifest["keys"]["GBR.CPI"]["indicators"] == []
+    assert store.read("CPI", ["GBR.CPI"]) == {}
+
+
+def test_queries_through_the_store(api, store, capsys):
+    query = {"COUNTRY": ["USA", "CAN"], "INDEX_TYPE": "CPI", "FREQUENCY": "A"}
+    with imf.IMFInstance(async_client=api.async_client(), retry=None, store=store) as instance:
+        dataflow = instance.Dataflow("CPI")
+        dataflow.query({**query, "COUNTRY": "USA"})
+        capsys.readouterr()
+
+        with instrument(recorder := EventRecorder()):
+            result = dataflow.query(query)
+
+    assert [(e["held"], e["missing"]) for e in recorder.events if e["event"] == "store"] == [(1, 1)]
+    assert api.data_calls()[-1].endswith("/CAN.CPI.A")
+    assert result["USA"].tolist() == [100.0, 101.0, 102.0]
+    assert capsys.readouterr().out.splitlines() == ["Querying: United States, Canada, Consumer Price Index, Annual"]
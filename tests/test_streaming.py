@@ -0,0 +1,109 @@
+import json
+import httpx
+import numpy as np
+import pytest
+
+pytest.importorskip("ijson")
+
+from package.queries import query_data_stream
+from package.utils import StreamingDataDecoder, decode_series
+
+from conftest import QUERY, MockAPI
+
+MESSAGE = {
+    "data": {
+        "structures": [{"dimensions": {"series": [{"id": "COUNTRY", "values": [{"id": "USA"}, {"id": "CAN"}]}], "observation": [{"id": "TIME_PERIOD", "values": [{"value": "2020"}, {"value": "2021"}]}]}}],
+        "dataSets": [
+            {
+                "series": {
+                    "0": {"attributes": [0, None], "observations": {"0": ["1.5", 0, 1], "1": []}},
+                    "1": {"observations": {"1": [2.5]}},
+                }
+            }
+        ],
+    }
+}
+
+
+def decode(body: bytes, chunk_size: int, **kwargs) -> tuple:
+    decoder = StreamingDataDecoder(**kwargs)
+    for i in range(0, len(body), chunk_size):
+        decoder.feed(body[i : i + chunk_size])
+    return decoder.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_decoder_matches_decode_series(chunk_size):
+    body = json.dumps(MockAPI().data("*.*.*")).encode()
+
+    struct, *columns = decode(body, chunk_size)
+
+    expected = decode_series(json.loads(body)["data"]["dataSets"][0]["series"], 3)
+    assert struct == json.loads(body)["data"]["structures"][0]
+    for column, expected_column in zip(columns, expected):
+        assert np.array_equal(column, expected_column)
+
+
+def test_decoder_reads_observation_values_only():
+    struct, key_codes, series_pos, obs_idx, values = decode(json.dumps(MESSAGE).encode(), 5)
+
+    assert struct["dimensions"]["series"][0]["id"] == "COUNTRY"
+    assert key_codes.tolist() == [[0], [1]]
+    assert series_pos.tolist() == [0, 0, 1]
+    assert obs_idx.tolist() == [0, 1, 1]
+    assert np.array_equal(values, [1.5, np.nan, 2.5], equal_nan=True)
+
+
+def test_decoder_hands_over_chunks():
+    body = json.dumps(MockAPI().data("*.*.*")).encode()
+    chunks = []
+
+    struct, key_codes, *_ = decode(body, 64, on_chunk=lambda *columns: chunks.append(columns), chunk_series=5)
+
+    assert [len(chunk[0]) for chunk in chunks] == [5, 5, 2]
+    assert all(chunk[1].max() < 5 for chunk in chunks)
+    assert len(key_codes) == 0
+    assert sum(len(chunk[3]) for chunk in chunks) == 12 * 3
+
+
+def test_streamed_query_matches_buffered_query(instance):
+    dataflow = instance.Dataflow("CPI")
+
+    streamed = dataflow.query(QUERY, stream=True)
+
+    assert streamed.equals(dataflow.query(QUERY))
+
+
+def test_streamed_query_raises_on_server_error(api, instance):
+    api.fail.add("CAN")
+    dataflow = instance.Dataflow("CPI")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        dataflow.query(QUERY, stream=True)
+
+
+def test_streamed_query_raises_on_missing_data_without_filters(api, instance):
+    api.empty.add("CAN")
+    dataflow = instance.Dataflow("CPI")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        dataflow.query(QUERY, stream=True)
+
+
+def test_streamed_filtered_query_without_observations_is_empty(api, instance):
+    api.empty.add("CAN")
+    dataflow = instance.Dataflow("CPI")
+
+    assert dataflow.query(QUERY, stream=True, start_period="2030") == {}
+
+
+def test_sync_stream(api):
+    with api.client() as client:
+        struct, key_codes, series_pos, obs_idx, values = query_data_stream("IMF.STA", "CPI", "USA+CAN.CPI.A", client=client)  # type: ignore
+        assert len(key_codes) == 2
+        assert len(values) == 6
+
+        api.empty.add("GBR")
+        assert query_data_stream("IMF.STA", "CPI", "GBR.CPI.A", client=client, params={"lastNObservations": "1"}) is None
+        with pytest.raises(httpx.HTTPStatusError):
+            query_data_stream("IMF.STA", "CPI", "GBR.CPI.A", client=client)
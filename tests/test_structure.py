@@ -0,0 +1,48 @@
+import asyncio
+import pandas as pd
+import pytest
+
+from package import queries, utils
+
+from conftest import CODES, DIMENSIONS
+
+
+@pytest.fixture
+def response(api):
+    async def gather():
+        async with api.async_client() as client:
+            dataflows = await queries.get_all_dataflows_async(client)
+            return await queries.queries(dataflows.iloc[0].to_dict(), client=client)
+
+    return asyncio.run(gather())
+
+
+def test_dimensions(response):
+    dimensions = utils.process_dataflow_dimensions(response)
+
+    assert dimensions["ConceptID"].tolist() == DIMENSIONS
+    assert dimensions["ConceptPosition"].tolist() == [0, 1, 2]
+    assert dimensions["DimensionName"].tolist() == ["Country", "Index_Type", "Frequency"]
+    assert dimensions["CodelistID"].tolist() == [f"CL_{dim}" for dim in DIMENSIONS]
+    assert set(dimensions["CodelistAgencyID"]) == {"IMF"}
+
+
+def test_dimensions_without_concept_scheme(response):
+    response["dimension_details"]["detail_COUNTRY"] = None
+
+    dimensions = utils.process_dimension_details(response, utils.process_dataflow_dimensions(response))
+
+    assert pd.isna(dimensions["DimensionName"].iloc[0])
+    assert dimensions["CodelistID"].tolist() == [None, "CL_INDEX_TYPE", "CL_FREQUENCY"]
+    assert utils.process_codelists(response, dimensions)["COUNTRY"] == []
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_codelists(response, compact):
+    dimensions = utils.process_dataflow_dimensions(response)
+
+    codelists = utils.process_codelists(response, dimensions, compact=compact)
+
+    assert list(codelists) == DIMENSIONS
+    for dim in DIMENSIONS:
+        assert [(code["ID"], code["Name"]) for code in codelists[dim]] == CODES[dim]
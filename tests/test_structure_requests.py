@@ -0,0 +1,58 @@
+import asyncio
+import httpx
+
+import package as imf
+from package.consts import BASE
+from package.instrumentation import EventRecorder, instrument
+from package.queries import query
+
+from conftest import MockAPI
+
+
+def structure_calls(api) -> list:
+    return [call for call in api.calls if "/data/" not in call and "/structure/dataflow" not in call]
+
+
+def test_structure_and_availability_in_two_requests(api, instance):
+    instance.Dataflow("CPI")
+
+    calls = structure_calls(api)
+    assert len(calls) == 2
+    assert any("/structure/datastructure/" in call and "references=descendants" in call for call in calls)
+    assert any(httpx.URL(call).path.endswith("/availability/dataflow/IMF.STA/CPI/+/*/all") for call in calls)
+
+
+class WildcardRejectingAPI(MockAPI):
+    """
+    Stand-in for a server rejecting the single wildcard availability key.
+    """
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/+/*/all"):
+            self.calls.append(str(request.url))
+            return httpx.Response(400, text="Invalid key")
+        return super().handler(request)
+
+
+def test_rejected_wildcard_key_is_retried_per_dimension():
+    api = WildcardRejectingAPI()
+    with imf.IMFInstance(async_client=api.async_client(), retry=None) as instance:
+        dataflow = instance.Dataflow("CPI")
+
+    assert dataflow.available_codes()["COUNTRY"] == ["USA", "CAN", "GBR"]
+    assert httpx.URL(api.calls[-1]).path.endswith("/+/*.*.*/all")
+
+
+def test_identical_requests_in_flight_are_coalesced(api):
+    url = f"{BASE}/structure/datastructure/IMF.STA/DSD_CPI/+?references=descendants&detail=full"
+
+    async def main():
+        async with api.async_client() as client:
+            return await asyncio.gather(query(client, url), query(client, url), query(client, url))
+
+    with instrument(recorder := EventRecorder()):
+        results = asyncio.run(main())
+
+    assert len(api.calls) == 1
+    assert results[0] is results[1] is results[2]
+    assert sum(event["event"] == "coalesced" for event in recorder.events) == 2